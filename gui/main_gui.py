@@ -7,47 +7,112 @@ from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QWidget, QStackedWidget,
     QHBoxLayout, QSlider, QLabel, QPushButton, QLineEdit, QTextEdit,
     QProgressBar, QSplitter, QSystemTrayIcon, QFileDialog, QStatusBar,
-    QTabWidget, QMessageBox, QCheckBox, QComboBox
+    QTabWidget, QMessageBox, QCheckBox, QComboBox, QListWidget, QListWidgetItem
 )
 from PyQt6.QtCore import Qt, QUrl, QTimer, QSize, QSettings, pyqtSignal, QObject, QThread, pyqtSlot
 from PyQt6.QtGui import QIcon, QAction
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PyQt6.QtMultimediaWidgets import QVideoWidget
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip, vfx
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+
+# The GUI runs as a script; make the repository's src package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.download import DownloadManager
+from processing import ProcessingPool, trim_job, filter_job, volume_job, subtitles_job, generate_job, text_overlay_job
 
 # Setting up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class WorkerSignals(QObject):
     progress = pyqtSignal(int)
+    bandwidth = pyqtSignal(float)
     finished = pyqtSignal(bool, str)
 
-class DownloadWorker(QThread):
-    signals = WorkerSignals()
+_download_manager = None
+
+def get_download_manager():
+    # One manager for the whole GUI, so every download shares its connection limit
+    global _download_manager
+    if _download_manager is None:
+        _download_manager = DownloadManager(max_connections=8, connections_per_file=4)
+    return _download_manager
+
+class ProcessingQueue(QObject):
+    # Qt front end for ProcessingPool: edits run in worker processes and a timer
+    # on the GUI thread turns their progress into signals
+    job_progress = pyqtSignal(int, int, float)
+    job_finished = pyqtSignal(int, bool, str)
+
+    def __init__(self, max_workers=None, parent=None):
+        super().__init__(parent)
+        self.pool = ProcessingPool(max_workers)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.poll)
+
+    def submit(self, name, func, *args):
+        job_id = self.pool.submit(name, func, *args)
+        self.timer.start(200)
+        return job_id
+
+    def cancel(self, job_id):
+        return self.pool.cancel(job_id)
 
-    def __init__(self, url, download_path, quality):
+    def pending(self):
+        return self.pool.pending()
+
+    def poll(self):
+        for event in self.pool.poll():
+            if event[0] == "progress":
+                self.job_progress.emit(*event[1:])
+            else:
+                self.job_finished.emit(*event[1:])
+        if not self.pool.pending():
+            self.timer.stop()
+
+    def shutdown(self):
+        self.timer.stop()
+        self.pool.shutdown()
+
+class DownloadWorker(QThread):
+    def __init__(self, urls, download_path, quality):
         super().__init__()
-        self.url = url
+        # Each worker needs its own signals; a class attribute would be shared by all of them
+        self.signals = WorkerSignals()
+        self.urls = urls
         self.download_path = download_path
         self.quality = quality
         self.file_path = ""
+        self.file_paths = []
+        self.progress = {}
 
     def run(self):
         try:
             from pytube import YouTube  # Import here to avoid blocking the UI at the start
-            yt = YouTube(self.url, on_progress_callback=self.progress_callback)
-            stream = yt.streams.filter(res=self.quality, progressive=True, file_extension='mp4').first()
-            self.file_path = stream.download(output_path=self.download_path)
-            self.signals.finished.emit(True, "Download complete!")
+            downloads = []
+            for url in self.urls:
+                yt = YouTube(url)
+                stream = yt.streams.filter(res=self.quality, progressive=True, file_extension='mp4').first()
+                downloads.append((stream.url, os.path.join(self.download_path, stream.default_filename)))
+                self.progress[stream.url] = (0, stream.filesize)
+
+            results = get_download_manager().download_all(downloads, progress_callback=self.progress_callback)
+            failed = [url for url, result in results.items() if isinstance(result, Exception)]
+            self.file_paths = [result for result in results.values() if not isinstance(result, Exception)]
+            self.file_path = self.file_paths[0] if self.file_paths else ""
+            if failed:
+                self.signals.finished.emit(False, f"{len(failed)} of {len(downloads)} downloads failed: {results[failed[0]]}")
+            else:
+                self.signals.finished.emit(True, "Download complete!")
         except Exception as e:
             logging.error(f"Error during download: {e}")
             self.signals.finished.emit(False, str(e))
 
-    def progress_callback(self, stream, chunk, bytes_remaining):
-        percent = int((stream.filesize - bytes_remaining) / stream.filesize * 100)
-        self.signals.progress.emit(percent)
+    def progress_callback(self, url, downloaded, total, bytes_per_second):
+        self.progress[url] = (downloaded, total or self.progress[url][1])
+        done = sum(downloaded for downloaded, _ in self.progress.values())
+        size = sum(total or 0 for _, total in self.progress.values())
+        if size:
+            self.signals.progress.emit(int(done / size * 100))
+        self.signals.bandwidth.emit(bytes_per_second)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -58,7 +123,12 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(QIcon("gui/assets/icon.png"))
 
         self.settings = QSettings("MyCompany", "YouTubeVideoTool")
+        # Edits run in a bounded pool of worker processes so the window stays responsive
+        self.processing_queue = ProcessingQueue(int(self.settings.value("processing_workers", 0)) or None, self)
+        self.job_items = {}
         self.init_ui()
+        self.processing_queue.job_progress.connect(self.update_job_progress)
+        self.processing_queue.job_finished.connect(self.job_finished)
 
     def init_ui(self):
         # Set up central widget and layout
@@ -96,6 +166,7 @@ class MainWindow(QMainWindow):
         self.tab_widget.addTab(self.analyze_page, QIcon("gui/assets/analyze.png"), "Analyze")
         self.tab_widget.addTab(self.generate_page, QIcon("gui/assets/generate.png"), "Generate")
         self.tab_widget.addTab(self.settings_page, QIcon("gui/assets/settings.png"), "Settings")
+        self.tab_widget.currentChanged.connect(self.preload_editing_backend)
 
         # Status bar
         self.status_bar = QStatusBar()
@@ -116,6 +187,13 @@ class MainWindow(QMainWindow):
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_video_position)
 
+    def preload_editing_backend(self, index):
+        # moviepy takes seconds to import; the worker processes load it the first
+        # time an editing page is opened instead of at startup
+        if index in (self.tab_widget.indexOf(self.process_page), self.tab_widget.indexOf(self.generate_page)):
+            self.tab_widget.currentChanged.disconnect(self.preload_editing_backend)
+            self.processing_queue.pool.warm_up()
+
     # Pages creation methods
     def create_download_page(self):
         page = QWidget()
@@ -203,6 +281,14 @@ class MainWindow(QMainWindow):
         self.process_tabs.addTab(self.audio_tab, "Audio")
         self.process_tabs.addTab(self.subtitles_tab, "Subtitles")
 
+        layout.addWidget(QLabel("Jobs"))
+        self.job_list = QListWidget()
+        layout.addWidget(self.job_list)
+
+        cancel_button = QPushButton("Cancel Selected Job")
+        cancel_button.clicked.connect(self.cancel_selected_job)
+        layout.addWidget(cancel_button)
+
         layout.addStretch()
         return page
 
@@ -414,8 +500,10 @@ class MainWindow(QMainWindow):
             self.download_status.setText("Downloading video...")
             download_path = QFileDialog.getExistingDirectory(self, "Select Download Directory")
             if download_path:
-                self.download_thread = DownloadWorker(url, download_path, self.quality_select.currentText())
+                # Several URLs separated by spaces are downloaded together
+                self.download_thread = DownloadWorker(url.split(), download_path, self.quality_select.currentText())
                 self.download_thread.signals.progress.connect(self.update_progress)
+                self.download_thread.signals.bandwidth.connect(self.update_bandwidth)
                 self.download_thread.signals.finished.connect(self.download_finished)
                 self.download_thread.start()
             else:
@@ -427,6 +515,10 @@ class MainWindow(QMainWindow):
     def update_progress(self, percent):
         self.progress_bar.setValue(percent)
 
+    @pyqtSlot(float)
+    def update_bandwidth(self, bytes_per_second):
+        self.download_status.setText(f"Downloading video... {bytes_per_second / 1024 ** 2:.1f} MB/s")
+
     @pyqtSlot(bool, str)
     def download_finished(self, success, message):
         self.download_status.setText(message)
@@ -443,61 +535,27 @@ class MainWindow(QMainWindow):
         video_path = self.download_thread.file_path
         output_path = os.path.join("processed", "trimmed_video.mp4")
         os.makedirs("processed", exist_ok=True)
-        try:
-            clip = VideoFileClip(video_path).subclip(start_time, end_time)
-            clip.write_videofile(output_path, codec="libx264")
-            self.process_text.append("Video trimmed successfully!")
-        except Exception as e:
-            self.process_text.append(f"Error: {str(e)}")
-            logging.error(f"Error trimming video: {e}")
+        self.submit_job("Trim", trim_job, video_path, output_path, start_time, end_time)
 
     def apply_filter(self):
         video_path = self.download_thread.file_path
         filter_type = self.filter_select.currentText()
         output_path = os.path.join("processed", f"{filter_type}_video.mp4")
         os.makedirs("processed", exist_ok=True)
-        try:
-            clip = VideoFileClip(video_path)
-            if filter_type == "Grayscale":
-                clip = clip.fx(vfx.blackwhite)
-            elif filter_type == "Negative":
-                clip = clip.fx(vfx.invert_colors)
-            elif filter_type == "Blur":
-                clip = clip.fx(vfx.blur, 2)
-            clip.write_videofile(output_path, codec="libx264")
-            self.process_text.append(f"{filter_type} filter applied successfully!")
-        except Exception as e:
-            self.process_text.append(f"Error: {str(e)}")
-            logging.error(f"Error applying filter: {e}")
+        self.submit_job(f"{filter_type} filter", filter_job, video_path, output_path, filter_type)
 
     def adjust_audio(self, volume_level):
         video_path = self.download_thread.file_path
         output_path = os.path.join("processed", "adjusted_audio_video.mp4")
         os.makedirs("processed", exist_ok=True)
-        try:
-            clip = VideoFileClip(video_path)
-            clip = clip.volumex(volume_level / 100.0)
-            clip.write_videofile(output_path, codec="libx264")
-            self.process_text.append("Audio adjusted successfully!")
-        except Exception as e:
-            self.process_text.append(f"Error: {str(e)}")
-            logging.error(f"Error adjusting audio: {e}")
+        self.submit_job("Audio", volume_job, video_path, output_path, volume_level)
 
     def add_subtitles(self):
         video_path = self.download_thread.file_path
         output_path = os.path.join("processed", "subtitled_video.mp4")
         os.makedirs("processed", exist_ok=True)
         subtitles = self.subtitle_input.toPlainText()
-        try:
-            clip = VideoFileClip(video_path)
-            subtitle_clip = TextClip(subtitles, fontsize=24, color='white')
-            subtitle_clip = subtitle_clip.set_position(('bottom')).set_duration(clip.duration)
-            video = CompositeVideoClip([clip, subtitle_clip])
-            video.write_videofile(output_path, codec="libx264")
-            self.process_text.append("Subtitles added successfully!")
-        except Exception as e:
-            self.process_text.append(f"Error: {str(e)}")
-            logging.error(f"Error adding subtitles: {e}")
+        self.submit_job("Subtitles", subtitles_job, video_path, output_path, subtitles)
 
     def analyze_channel(self):
         channel_url = self.channel_input.text()
@@ -513,31 +571,48 @@ class MainWindow(QMainWindow):
         script_content = self.script_input.toPlainText()
         output_path = os.path.join("generated", "generated_video.mp4")
         os.makedirs("generated", exist_ok=True)
-        try:
-            # Example: Simple text video generation
-            clip = TextClip(script_content, fontsize=24, color='white', size=(1280, 720), bg_color='black', duration=10)
-            clip.write_videofile(output_path, codec="libx264")
-            self.status_bar.showMessage("Video generated successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Generation Error", f"Error: {str(e)}")
-            logging.error(f"Error generating video: {e}")
+        # Example: Simple text video generation
+        self.submit_job("Generate", generate_job, script_content, output_path)
 
     def add_text_overlay(self, video_path):
         output_path = os.path.join("processed", "watermarked_video.mp4")
         os.makedirs("processed", exist_ok=True)
         watermark_text = self.watermark_input.text()
-        try:
-            clip = VideoFileClip(video_path)
-            txt_clip = TextClip(watermark_text, fontsize=70, color='white')
-            txt_clip = txt_clip.set_position('center').set_duration(10)
-            video = CompositeVideoClip([clip, txt_clip])
-            video.write_videofile(output_path, codec="libx264")
-            self.process_text.append("Watermark added successfully!")
-        except Exception as e:
-            self.process_text.append(f"Error: {str(e)}")
-            logging.error(f"Error adding watermark: {e}")
+        self.submit_job("Watermark", text_overlay_job, video_path, output_path, watermark_text)
+
+    # Background processing jobs
+    def submit_job(self, name, func, *args):
+        job_id = self.processing_queue.submit(name, func, *args)
+        item = QListWidgetItem(f"#{job_id} {name}: queued")
+        item.setData(Qt.ItemDataRole.UserRole, job_id)
+        self.job_list.addItem(item)
+        self.job_items[job_id] = (name, item)
+        self.status_bar.showMessage(f"{name} queued ({self.processing_queue.pending()} jobs pending)")
+
+    def update_job_progress(self, job_id, percent, eta):
+        if job_id in self.job_items:
+            name, item = self.job_items[job_id]
+            eta_text = self.format_time(int(eta * 1000)) if eta >= 0 else "--:--"
+            item.setText(f"#{job_id} {name}: {percent}% (ETA {eta_text})")
+
+    def job_finished(self, job_id, success, message):
+        name, item = self.job_items.pop(job_id, (None, None))
+        if item is not None:
+            self.job_list.takeItem(self.job_list.row(item))
+        self.process_text.append(message if success else f"Error: {message}")
+        self.status_bar.showMessage(message)
+
+    def cancel_selected_job(self):
+        for item in self.job_list.selectedItems():
+            self.processing_queue.cancel(item.data(Qt.ItemDataRole.UserRole))
+
+    def closeEvent(self, event):
+        self.processing_queue.shutdown()
+        super().closeEvent(event)
 
     def encrypt_file(self, file_path, password):
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes  # Import here to keep startup fast
+        from cryptography.hazmat.backends import default_backend
         key = hashlib.sha256(password.encode()).digest()
         with open(file_path, 'rb') as f:
             data = f.read()
@@ -0,0 +1,192 @@
+import os
+import time
+import logging
+import importlib
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+class JobCancelled(Exception):
+    pass
+
+class JobReporter:
+    # Lives in the worker process. Jobs call update() with their completed
+    # fraction; it forwards throttled updates to the GUI process and raises
+    # JobCancelled once the job has been cancelled. Both go through the
+    # manager process, so cancellation is checked on the same throttle.
+    def __init__(self, job_id, updates, cancelled, interval=0.25):
+        self.job_id = job_id
+        self.updates = updates
+        self.cancelled = cancelled
+        self.interval = interval
+        self.last_update = 0.0
+
+    def check(self):
+        if self.cancelled.get(self.job_id):
+            raise JobCancelled()
+
+    def update(self, fraction):
+        now = time.monotonic()
+        if now - self.last_update >= self.interval or fraction >= 1.0:
+            self.last_update = now
+            self.check()
+            self.updates.put((self.job_id, min(max(fraction, 0.0), 1.0)))
+
+def moviepy_logger(reporter):
+    # proglog logger for write_videofile that reports frame progress to the reporter
+    from proglog import ProgressBarLogger
+
+    class ReporterLogger(ProgressBarLogger):
+        def bars_callback(self, bar, attr, value, old_value=None):
+            if bar == "t" and attr == "index" and self.bars[bar]["total"]:
+                reporter.update(value / self.bars[bar]["total"])
+
+    return ReporterLogger()
+
+def _run_job(func, job_id, updates, cancelled, args, kwargs):
+    reporter = JobReporter(job_id, updates, cancelled)
+    reporter.check()
+    updates.put((job_id, 0.0))
+    return func(*args, reporter=reporter, **kwargs)
+
+class ProcessingPool:
+    # Bounded pool of worker processes for long edits. Jobs queue up behind the
+    # running ones; poll() returns ("progress", job_id, percent, eta_seconds)
+    # and ("finished", job_id, success, message) events for the caller to
+    # dispatch, so it can be driven from a GUI timer without blocking.
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.executor = None
+        self.manager = None
+        self.updates = None
+        self.cancelled = None
+        self.jobs = {}
+        self.ids = itertools.count(1)
+
+    def _start(self):
+        # The pool and its manager process are only started for the first job
+        if self.executor is None:
+            # Forking a multithreaded Qt process is unsafe; the manager and workers start fresh
+            context = multiprocessing.get_context("spawn")
+            self.manager = context.Manager()
+            self.updates = self.manager.Queue()
+            self.cancelled = self.manager.dict()
+            self.executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+
+    def warm_up(self, modules=("moviepy.editor",)):
+        # Start the workers and have them import the editing backend ahead of the first job
+        self._start()
+        for _ in range(self.max_workers):
+            for module in modules:
+                self.executor.submit(importlib.import_module, module)
+
+    def submit(self, name, func, *args, **kwargs):
+        self._start()
+        job_id = next(self.ids)
+        future = self.executor.submit(_run_job, func, job_id, self.updates, self.cancelled, args, kwargs)
+        self.jobs[job_id] = {"name": name, "future": future, "started": None}
+        return job_id
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        # Queued jobs are dropped outright; running ones stop at their next progress update
+        if not job["future"].cancel():
+            self.cancelled[job_id] = True
+        return True
+
+    def pending(self):
+        return len(self.jobs)
+
+    def poll(self):
+        events = []
+        while self.updates is not None and not self.updates.empty():
+            job_id, fraction = self.updates.get_nowait()
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            now = time.monotonic()
+            if job["started"] is None:
+                job["started"] = now
+            elapsed = now - job["started"]
+            eta = elapsed * (1 - fraction) / fraction if fraction > 0 else -1.0
+            events.append(("progress", job_id, int(fraction * 100), eta))
+
+        for job_id, job in list(self.jobs.items()):
+            future = job["future"]
+            if not future.done():
+                continue
+            del self.jobs[job_id]
+            self.cancelled.pop(job_id, None)
+            if future.cancelled():
+                events.append(("finished", job_id, False, f"{job['name']} cancelled"))
+                continue
+            error = future.exception()
+            if isinstance(error, JobCancelled):
+                events.append(("finished", job_id, False, f"{job['name']} cancelled"))
+            elif error is not None:
+                logging.error(f"Error in {job['name']}: {error}")
+                events.append(("finished", job_id, False, f"{job['name']} failed: {error}"))
+            else:
+                events.append(("finished", job_id, True, future.result() or f"{job['name']} finished"))
+        return events
+
+    def shutdown(self):
+        if self.executor is not None:
+            for job_id in list(self.jobs):
+                self.cancel(job_id)
+            self.executor.shutdown(wait=True)
+            self.manager.shutdown()
+            self.executor = None
+
+# Editing jobs. They run in worker processes, so they are module-level and
+# take plain arguments; each reports progress through `reporter`.
+
+def trim_job(video_path, output_path, start_time, end_time, reporter):
+    from moviepy.editor import VideoFileClip
+    clip = VideoFileClip(video_path).subclip(start_time, end_time)
+    clip.write_videofile(output_path, codec="libx264", logger=moviepy_logger(reporter))
+    return "Video trimmed successfully!"
+
+def filter_job(video_path, output_path, filter_type, reporter):
+    from moviepy.editor import VideoFileClip, vfx
+    clip = VideoFileClip(video_path)
+    if filter_type == "Grayscale":
+        clip = clip.fx(vfx.blackwhite)
+    elif filter_type == "Negative":
+        clip = clip.fx(vfx.invert_colors)
+    elif filter_type == "Blur":
+        clip = clip.fx(vfx.blur, 2)
+    clip.write_videofile(output_path, codec="libx264", logger=moviepy_logger(reporter))
+    return f"{filter_type} filter applied successfully!"
+
+def volume_job(video_path, output_path, volume_level, reporter):
+    from moviepy.editor import VideoFileClip
+    clip = VideoFileClip(video_path).volumex(volume_level / 100.0)
+    clip.write_videofile(output_path, codec="libx264", logger=moviepy_logger(reporter))
+    return "Audio adjusted successfully!"
+
+def subtitles_job(video_path, output_path, subtitles, reporter):
+    from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
+    clip = VideoFileClip(video_path)
+    subtitle_clip = TextClip(subtitles, fontsize=24, color='white')
+    subtitle_clip = subtitle_clip.set_position(('bottom')).set_duration(clip.duration)
+    video = CompositeVideoClip([clip, subtitle_clip])
+    video.write_videofile(output_path, codec="libx264", logger=moviepy_logger(reporter))
+    return "Subtitles added successfully!"
+
+def generate_job(script_content, output_path, reporter):
+    from moviepy.editor import TextClip
+    clip = TextClip(script_content, fontsize=24, color='white', size=(1280, 720), bg_color='black', duration=10)
+    clip.write_videofile(output_path, codec="libx264", fps=24, logger=moviepy_logger(reporter))
+    return "Video generated successfully!"
+
+def text_overlay_job(video_path, output_path, watermark_text, reporter):
+    from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
+    clip = VideoFileClip(video_path)
+    txt_clip = TextClip(watermark_text, fontsize=70, color='white')
+    txt_clip = txt_clip.set_position('center').set_duration(10)
+    video = CompositeVideoClip([clip, txt_clip])
+    video.write_videofile(output_path, codec="libx264", logger=moviepy_logger(reporter))
+    return "Watermark added successfully!"
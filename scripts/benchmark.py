@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+import multiprocessing
+from queue import Empty
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import find_ffmpeg, require_output
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def synthesize_video(path, width=1280, height=720, duration=10, fps=30, scene_length=2.0, audio=True):
+    # Moving shapes over a gradient, with a hard cut to a new palette every
+    # `scene_length` seconds so scene detection has something to find. With
+    # ffmpeg available the result is H.264 with a sine-tone audio track, like
+    # the uploads the pipeline sees.
+    frame_count = int(round(duration * fps))
+    raw_path = f"{os.path.splitext(path)[0]}.raw.mp4"
+    writer = cv2.VideoWriter(raw_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    scene = -1
+    for index in range(frame_count):
+        if int(index / (fps * scene_length)) != scene:
+            scene = int(index / (fps * scene_length))
+            low, high = rng.integers(0, 256, 3), rng.integers(0, 256, 3)
+            background = (low + (high - low) * gradient).astype(np.uint8)
+            background = np.broadcast_to(background, (height, width, 3))
+        np.copyto(frame, background)
+        t = index / fps
+        center = (int(width * (0.5 + 0.3 * np.sin(t))), int(height * (0.5 + 0.3 * np.cos(1.3 * t))))
+        cv2.circle(frame, center, max(4, height // 8), (255, 255, 255), -1)
+        cv2.rectangle(frame, (int(t * 40) % width, height // 4), (int(t * 40) % width + width // 10, height // 2), (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+    ffmpeg = find_ffmpeg()
+    if not ffmpeg:
+        os.replace(raw_path, path)
+        return path
+    command = [ffmpeg, "-y", "-loglevel", "error", "-i", raw_path]
+    if audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}", "-c:a", "aac", "-shortest"]
+    command += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", path]
+    subprocess.run(command, check=True, capture_output=True)
+    os.remove(raw_path)
+    return path
+
+
+# Each benchmark takes (video_path, work_dir, video) and returns the number of
+# frames it processed, which frames/sec is computed from. Each checks the
+# result or output file and raises when there is none, so a failure is not
+# timed as a fast success.
+def _require(result, what):
+    if not result:
+        raise RuntimeError(f"{what} returned nothing; see the log for the error")
+    return result
+
+
+def _fresh_output(path):
+    # Outputs from an earlier repeat must not satisfy the check for this one
+    if os.path.exists(path):
+        os.remove(path)
+    return path
+
+
+def _bench_metadata(video_path, work_dir, video):
+    from src.analysis import extract_video_metadata
+    metadata = _require(extract_video_metadata(video_path), "extract_video_metadata")
+    # An unreadable file still yields a dict, filled with -1
+    if metadata.get("frame_count", 0) <= 0:
+        raise RuntimeError(f"extract_video_metadata could not read {video_path}")
+    return video["frames"]
+
+
+def _bench_scene_changes(video_path, work_dir, video):
+    from src.analysis import detect_scene_changes
+    # Synthesized videos cut every scene_length seconds, so an empty result means detection failed
+    _require(detect_scene_changes(video_path), "detect_scene_changes")
+    return video["frames"]
+
+
+def _bench_structural_elements(video_path, work_dir, video):
+    from src.analysis import analyze_structural_elements
+    _require(analyze_structural_elements(video_path), "analyze_structural_elements")
+    return video["frames"]
+
+
+def _bench_smart_clip(video_path, work_dir, video):
+    from src.generation import smart_clip_video
+    end = video["duration"] / 2
+    output_path = _fresh_output(os.path.join(work_dir, "clip.mp4"))
+    smart_clip_video(video_path, 0, end, output_path)
+    require_output(output_path)
+    return int(end * video["fps"])
+
+
+def _bench_color_correction(video_path, work_dir, video):
+    from src.postproduction import apply_color_correction
+    output_path = _fresh_output(os.path.join(work_dir, "color.mp4"))
+    apply_color_correction(video_path, output_path)
+    require_output(output_path)
+    return video["frames"]
+
+
+def _bench_teasers(video_path, work_dir, video):
+    from src.optimization import generate_teasers
+    duration = min(10, video["duration"])
+    platforms = ["twitter", "instagram"]
+    prefix = os.path.join(work_dir, "teaser")
+    for platform_name in platforms:
+        _fresh_output(f"{prefix}_{platform_name}.mp4")
+    teasers = _require(generate_teasers(video_path, prefix, platforms=platforms, duration=duration), "generate_teasers")
+    for path in teasers.values():
+        require_output(path)
+    return int(duration * video["fps"])
+
+
+def _bench_transform(backend):
+    # One decoded batch transformed over and over, so the two preprocessing
+    # backends are compared on the transform alone rather than on decoding
+    def benchmark(video_path, work_dir, video):
+        from scripts.preprocess_data import BatchTransform, read_batches
+        capture = cv2.VideoCapture(video_path)
+        batch = next(read_batches(capture, 32), None)
+        capture.release()
+        if batch is None:
+            raise RuntimeError(f"read_batches could not read {video_path}")
+        config = {"width": video["width"] * 2 // 3, "height": video["height"] * 2 // 3, "augment": True, "flip": True, "rotate": False}
+        transform = BatchTransform(config, len(batch), backend)
+        frames = 0
+        while frames < video["frames"]:
+            frames += len(transform(batch))
+        return frames
+    return benchmark
+
+
+BENCHMARKS = {
+    "extract_video_metadata": _bench_metadata,
+    "detect_scene_changes": _bench_scene_changes,
+    "analyze_structural_elements": _bench_structural_elements,
+    "smart_clip_video": _bench_smart_clip,
+    "apply_color_correction": _bench_color_correction,
+    "generate_teasers": _bench_teasers,
+    "preprocess_transform_frame": _bench_transform("frame"),
+    "preprocess_transform_batch": _bench_transform("batch")
+}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name, video_path, video, repeat=3):
+    # Times `repeat` runs, then one more under tracemalloc for allocations;
+    # tracing slows Python code down, so it is kept out of the timed runs.
+    # Peak RSS covers the whole process, so run each benchmark in its own
+    # (see run_benchmarks) to keep one from inflating the next.
+    benchmark = BENCHMARKS[name]
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            frames = benchmark(video_path, work_dir, video)
+            runs.append(time.perf_counter() - started)
+        tracemalloc.start()
+        benchmark(video_path, work_dir, video)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    seconds = float(np.median(runs))
+    return {
+        "seconds": seconds,
+        "runs": runs,
+        "frames": frames,
+        "fps": frames / seconds if seconds > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "alloc_peak_mb": peak / 1024 ** 2,
+        "alloc_retained_mb": current / 1024 ** 2
+    }
+
+
+def _measure_in_child(queue, name, video_path, video, repeat):
+    try:
+        queue.put(measure(name, video_path, video, repeat))
+    except Exception as e:
+        queue.put({"error": repr(e)})
+
+
+def _wait_for_result(queue, process, poll_interval=1.0):
+    # A child that crashes or is OOM-killed never reports back; notice it exiting instead of waiting forever
+    while True:
+        try:
+            return queue.get(timeout=poll_interval)
+        except Empty:
+            if not process.is_alive():
+                try:
+                    return queue.get(timeout=poll_interval)
+                except Empty:
+                    return {"error": f"Benchmark process exited with code {process.exitcode} without a result"}
+
+
+def run_benchmarks(video_path, names=None, repeat=3, isolate=True):
+    capture = cv2.VideoCapture(video_path)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    video = {"width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+             "fps": fps, "frames": frame_count, "duration": frame_count / fps if fps else 0}
+    capture.release()
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names or BENCHMARKS:
+        logging.info(f"Benchmarking {name}")
+        if isolate:
+            queue = context.Queue()
+            process = context.Process(target=_measure_in_child, args=(queue, name, video_path, video, repeat))
+            process.start()
+            result = _wait_for_result(queue, process)
+            process.join()
+        else:
+            try:
+                result = measure(name, video_path, video, repeat)
+            except Exception as e:
+                result = {"error": repr(e)}
+        if "error" in result:
+            logging.error(f"Benchmark {name} failed: {result['error']}")
+        results[name] = result
+    return {"video": video, "environment": environment(), "results": results}
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def compare(report, baseline, threshold=0.10):
+    # (name, baseline_seconds, seconds, change) for benchmarks present in both,
+    # and the names that got more than `threshold` slower
+    if baseline.get("video") != report["video"]:
+        logging.warning(f"The baseline was measured on a different video ({baseline.get('video')}); timings may not be comparable")
+    rows = []
+    regressions = []
+    for name, result in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "seconds" not in previous or "seconds" not in result:
+            continue
+        change = result["seconds"] / previous["seconds"] - 1 if previous["seconds"] else 0.0
+        rows.append((name, previous["seconds"], result["seconds"], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_report(report, rows=None):
+    video = report["video"]
+    lines = [f"{video['width']}x{video['height']} @ {video['fps']:.0f} fps, {video['frames']} frames",
+             f"{'benchmark':<30} {'seconds':>9} {'fps':>9} {'peak RSS':>10} {'alloc peak':>11}"]
+    for name, result in report["results"].items():
+        if "error" in result:
+            lines.append(f"{name:<30} failed: {result['error']}")
+            continue
+        rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/a"
+        lines.append(f"{name:<30} {result['seconds']:>9.3f} {result['fps']:>9.1f} {rss:>10} {result['alloc_peak_mb']:>8.1f} MB")
+    if rows:
+        lines.append(f"{'compared to baseline':<30} {'before':>9} {'after':>9} {'change':>10}")
+        for name, before, after, change in rows:
+            lines.append(f"{name:<30} {before:>9.3f} {after:>9.3f} {change:>+10.1%}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analysis, clipping and postproduction hot paths")
+    parser.add_argument("--video", help="Benchmark this video instead of a synthesized one")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown that counts as a regression")
+    parser.add_argument("--no-isolate", action="store_true", help="Run every benchmark in this process")
+    args = parser.parse_args()
+
+    work_dir = None
+    video_path = args.video
+    if video_path is None:
+        work_dir = tempfile.mkdtemp(prefix="bench_video_")
+        video_path = synthesize_video(os.path.join(work_dir, "input.mp4"), args.width, args.height, args.duration, args.fps)
+    try:
+        report = run_benchmarks(video_path, args.only, args.repeat, isolate=not args.no_isolate)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    rows, regressions = [], []
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            rows, regressions = compare(report, json.load(baseline_file), args.threshold)
+    if os.path.dirname(args.output):
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(format_report(report, rows))
+    failed = [name for name, result in report["results"].items() if "error" in result]
+    if regressions:
+        logging.error(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+    if regressions or failed:
+        sys.exit(1)
@@ -1,11 +1,11 @@
 import os
+import time
 import cv2
-import threading
+import numpy as np
 import logging
+import argparse
 import yaml
-import torch
-from pyspark.sql import SparkSession
-from dask import dataframe as dd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,94 +16,443 @@ def load_preprocessing_config(config_path="config/preprocessing.yaml"):
         return yaml.safe_load(file)
 
 
+def build_stages(config, batch_size=32):
+    # (name, stage) pairs in processing order. A stage maps a batch to a batch,
+    # possibly shorter when it holds frames back; stages that hold frames back
+    # also have flush(), yielding what is left at the end of the video.
+    stages = []
+    if config['stabilize']:
+        stages.append(("stabilize", Stabilizer(config.get('stabilize_preset', 'balanced'), batch_size)))
+    if config['reduce_noise']:
+        stages.append(("denoise", TemporalDenoiser(config.get('denoise_preset', 'balanced'), batch_size)))
+    stages.append(("transform", BatchTransform(config, batch_size, config.get('transform_backend'))))
+    return stages
+
+
+def _record(stats, stage, frame_count, started):
+    entry = stats.setdefault(stage, {"frames": 0, "seconds": 0.0})
+    entry["frames"] += frame_count
+    entry["seconds"] += time.perf_counter() - started
+
+
+def format_stage_rates(stats):
+    return ", ".join(f"{stage} {entry['frames'] / max(entry['seconds'], 1e-9):.1f} fps"
+                     for stage, entry in stats.items())
+
+
 def preprocess_video(input_path, output_path, config):
+    # Writes to a temporary name and renames on success, so an interrupted run
+    # never leaves an output that looks up to date. Returns the frames and
+    # seconds spent in each stage, or False on failure.
+    root, extension = os.path.splitext(output_path)
+    partial_path = f"{root}.partial{extension}"
     try:
+        if config['use_gpu']:
+            logging.warning("use_gpu is ignored: frames are decoded and encoded on the CPU, so transforms run there too")
         video = cv2.VideoCapture(input_path)
         fourcc = cv2.VideoWriter_fourcc(*'XVID')
-        out = cv2.VideoWriter(output_path, fourcc, config['fps'], (config['width'], config['height']))
-
-        while video.isOpened():
-            ret, frame = video.read()
-            if not ret:
-                break
+        out = cv2.VideoWriter(partial_path, fourcc, config['fps'], (config['width'], config['height']))
+        batch_size = config.get('batch_size', 32)
+        stages = build_stages(config, batch_size)
+        stats = {}
 
-            if config['use_gpu']:
-                frame = torch.tensor(frame).cuda()
+        def run(batch, first_stage):
+            for name, stage in stages[first_stage:]:
+                if not len(batch):
+                    return
+                started = time.perf_counter()
+                batch = stage(batch)
+                _record(stats, name, len(batch), started)
+            started = time.perf_counter()
+            for frame in batch:
+                out.write(frame)
+            _record(stats, "encode", len(batch), started)
 
-            stabilized_frame = stabilize_frame(frame, config)
-            noise_reduced_frame = reduce_noise(stabilized_frame, config)
-            augmented_frame = augment_frame(noise_reduced_frame, config)
-            resized_frame = cv2.resize(augmented_frame, (config['width'], config['height']))
+        def drain(name, batches, next_stage):
+            while True:
+                started = time.perf_counter()
+                batch = next(batches, None)
+                if batch is None:
+                    return
+                _record(stats, name, len(batch), started)
+                run(batch, next_stage)
 
-            out.write(resized_frame)
+        drain("decode", read_batches(video, batch_size), 0)
+        # Frames held back by a stage (the stabilizer's lookahead) come out at the end
+        for position, (name, stage) in enumerate(stages):
+            if hasattr(stage, "flush"):
+                drain(name, stage.flush(), position + 1)
 
         video.release()
         out.release()
-        logging.info(f"Preprocessed {input_path} and saved to {output_path}")
+        os.replace(partial_path, output_path)
+        logging.info(f"Preprocessed {input_path} and saved to {output_path} ({format_stage_rates(stats)})")
+        return stats
     except Exception as e:
         logging.error(f"Error preprocessing video {input_path}: {e}", exc_info=True)
+        return False
 
 
-def stabilize_frame(frame, config):
-    # AI-based stabilization (using a pre-trained model, if configured)
-    if config['stabilize']:
-        # Placeholder for stabilization logic
-        pass
-    return frame
+def read_batches(video, batch_size):
+    # Yields (n, H, W, 3) views of one preallocated buffer; each batch is
+    # overwritten by the next, so consumers must be done with it first
+    buffer = None
+    count = 0
+    while video.isOpened():
+        if buffer is None:
+            ret, frame = video.read()
+            if not ret:
+                break
+            buffer = np.empty((batch_size,) + frame.shape, dtype=np.uint8)
+            buffer[0] = frame
+        else:
+            ret, _ = video.read(buffer[count])
+            if not ret:
+                break
+        count += 1
+        if count == batch_size:
+            yield buffer
+            count = 0
+    if count:
+        yield buffer[:count]
 
 
-def reduce_noise(frame, config):
-    # AI-based noise reduction
-    if config['reduce_noise']:
-        # Placeholder for noise reduction logic
-        pass
-    return frame
+class BatchTransform:
+    # Augmentation and resizing for (N, H, W, 3) uint8 batches. Frames are
+    # resized first, at the pre-rotation size, so flip and rotate work on the
+    # smaller frames. Every step writes into buffers allocated once per
+    # transform; the returned batch is a view of one of them and is only valid
+    # until the next call. Resizing is always OpenCV's bilinear kernel, frame by
+    # frame. The frame backend (the default, and the faster one) flips and rotates
+    # with OpenCV too; the batch backend does both once over the whole batch with
+    # numpy. scripts/benchmark.py compares the two.
+    def __init__(self, config, batch_size=32, backend=None):
+        if backend not in (None, "batch", "frame"):
+            raise ValueError(f"Unknown transform backend: {backend}")
+        self.width = config['width']
+        self.height = config['height']
+        self.flip = bool(config['augment'] and config['flip'])
+        self.rotate = bool(config['augment'] and config['rotate'])
+        self.batch_size = batch_size
+        self.backend = backend or "frame"
+        self.buffers = {}
 
+    def _buffer(self, name, shape):
+        if name not in self.buffers:
+            self.buffers[name] = np.empty((self.batch_size,) + shape, dtype=np.uint8)
+        return self.buffers[name]
 
-def augment_frame(frame, config):
-    # Apply data augmentation techniques
-    if config['augment']:
-        # Example: flipping, rotating, adding noise, etc.
-        if config['flip']:
-            frame = cv2.flip(frame, 1)
-        if config['rotate']:
-            frame = cv2.rotate(frame, cv2.ROTATE_90_CLOCKWISE)
-        # Placeholder for additional augmentation logic
-    return frame
+    def __call__(self, batch):
+        count = len(batch)
+        # Rotated frames are resized to the transposed size first
+        size = (self.width, self.height) if self.rotate else (self.height, self.width)
+        frames = batch
+        if batch.shape[1:3] != size:
+            frames = self._buffer("resized", size + (3,))[:count]
+            for index in range(count):
+                cv2.resize(batch[index], size[::-1], dst=frames[index])
+        if self.flip:
+            flipped = self._buffer("flipped", size + (3,))[:count]
+            if self.backend == "frame":
+                for index in range(count):
+                    cv2.flip(frames[index], 1, dst=flipped[index])
+            else:
+                np.copyto(flipped, frames[:, :, ::-1])
+            frames = flipped
+        if self.rotate:
+            rotated = self._buffer("rotated", (self.height, self.width, 3))[:count]
+            if self.backend == "frame":
+                for index in range(count):
+                    cv2.rotate(frames[index], cv2.ROTATE_90_CLOCKWISE, dst=rotated[index])
+            else:
+                np.copyto(rotated, np.rot90(frames, -1, axes=(1, 2)))
+            frames = rotated
+        return frames
 
 
-def preprocess_data(input_dir, output_dir, config):
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+# Stabilization presets: corners tracked, scale of the frames they are tracked
+# on, and frames either side averaged into the smoothed trajectory (which is
+# also how far the output lags the input)
+STABILIZE_PRESETS = {
+    "fast": {"max_corners": 100, "scale": 0.25, "radius": 15},
+    "balanced": {"max_corners": 200, "scale": 0.5, "radius": 30},
+    "quality": {"max_corners": 400, "scale": 1.0, "radius": 60}
+}
 
-    threads = []
-    for file_name in os.listdir(input_dir):
-        if file_name.endswith('.mp4'):
-            input_path = os.path.join(input_dir, file_name)
-            output_path = os.path.join(output_dir, f"preprocessed_{file_name}")
-            thread = threading.Thread(target=preprocess_video, args=(input_path, output_path, config))
-            threads.append(thread)
-            thread.start()
 
-    for thread in threads:
-        thread.join()
+class Stabilizer:
+    # Feature-tracking stabilization. Motion between consecutive frames comes
+    # from corners tracked with pyramidal Lucas-Kanade on a downscaled gray
+    # copy, fitted with a similarity transform and accumulated into a
+    # trajectory. Each frame is warped by the difference between the trajectory
+    # and its moving average over `radius` frames either side, so frames are
+    # held in a ring buffer until their lookahead window is complete.
+    def __init__(self, preset="balanced", batch_size=32):
+        options = STABILIZE_PRESETS[preset]
+        self.max_corners = options["max_corners"]
+        self.scale = options["scale"]
+        self.radius = options["radius"]
+        self.batch_size = batch_size
+        self.ring = None
+        self.output = None
+        self.previous = None
+        self.positions = []
+        self.first_position = 0
+        self.seen = 0
+        self.emitted = 0
 
+    def _gray(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _motion(self, previous, current):
+        # (dx, dy, angle) from the previous frame to this one, zero when tracking fails
+        corners = cv2.goodFeaturesToTrack(previous, self.max_corners, 0.01, max(4, 30 * self.scale), blockSize=3)
+        if corners is None or len(corners) < 4:
+            return 0.0, 0.0, 0.0
+        tracked, status, _ = cv2.calcOpticalFlowPyrLK(previous, current, corners, None)
+        found = status.ravel() == 1
+        if found.sum() < 4:
+            return 0.0, 0.0, 0.0
+        matrix, _ = cv2.estimateAffinePartial2D(corners[found], tracked[found])
+        if matrix is None:
+            return 0.0, 0.0, 0.0
+        return matrix[0, 2] / self.scale, matrix[1, 2] / self.scale, float(np.arctan2(matrix[1, 0], matrix[0, 0]))
+
+    def _track(self, frame):
+        if self.ring is None:
+            self.ring = np.empty((self.radius + 1,) + frame.shape, dtype=np.uint8)
+            self.output = np.empty((self.batch_size,) + frame.shape, dtype=np.uint8)
+        gray = self._gray(frame)
+        if self.previous is None:
+            position = (0.0, 0.0, 0.0)
+        else:
+            dx, dy, angle = self._motion(self.previous, gray)
+            x, y, a = self.positions[-1]
+            position = (x + dx, y + dy, a + angle)
+        self.previous = gray
+        self.positions.append(position)
+        self.ring[self.seen % len(self.ring)] = frame
+        self.seen += 1
+
+    def _emit(self, dst):
+        index = self.emitted
+        window = self.positions[max(0, index - self.radius - self.first_position):index + self.radius + 1 - self.first_position]
+        x, y, a = np.mean(window, axis=0) - self.positions[index - self.first_position]
+        cos, sin = np.cos(a), np.sin(a)
+        matrix = np.array([[cos, -sin, x], [sin, cos, y]])
+        frame = self.ring[index % len(self.ring)]
+        cv2.warpAffine(frame, matrix, (frame.shape[1], frame.shape[0]), dst=dst, borderMode=cv2.BORDER_REFLECT)
+        self.emitted += 1
+        # Positions older than any remaining window are no longer needed
+        drop = self.emitted - self.radius - self.first_position
+        if drop > 0:
+            del self.positions[:drop]
+            self.first_position += drop
+
+    def __call__(self, batch):
+        count = 0
+        for frame in batch:
+            self._track(frame)
+            if self.seen > self.radius:
+                self._emit(self.output[count])
+                count += 1
+        return self.output[:count]
+
+    def flush(self):
+        while self.emitted < self.seen:
+            count = min(self.seen - self.emitted, self.batch_size)
+            for index in range(count):
+                self._emit(self.output[index])
+            yield self.output[:count]
 
-def distributed_preprocessing(input_dir, output_dir, config):
-    spark = SparkSession.builder.appName("VideoPreprocessing").getOrCreate()
-    video_files = os.listdir(input_dir)
-    video_df = spark.createDataFrame(video_files, StringType())
-    video_df = video_df.repartition(4)  # Distribute across 4 nodes
 
-    def process_video_file(file_name):
+# Denoising presets: frames averaged and the per-pixel difference from that
+# average above which a pixel counts as motion and is left alone. Longer
+# windows remove more noise; lower thresholds keep more moving edges sharp.
+DENOISE_PRESETS = {
+    "fast": {"window": 3, "threshold": 24},
+    "balanced": {"window": 5, "threshold": 16},
+    "quality": {"window": 8, "threshold": 10}
+}
+
+
+class TemporalDenoiser:
+    # Averages each pixel over a ring buffer of the last `window` frames, kept
+    # as a running sum so the cost doesn't grow with the window. Pixels that
+    # differ from that average by more than `threshold` in any channel keep
+    # their current value, which avoids ghosting behind moving objects.
+    def __init__(self, preset="balanced", batch_size=32):
+        options = DENOISE_PRESETS[preset]
+        self.window = options["window"]
+        self.threshold = options["threshold"]
+        self.batch_size = batch_size
+        self.ring = None
+        self.seen = 0
+
+    def _allocate(self, shape):
+        self.ring = np.empty((self.window,) + shape, dtype=np.uint8)
+        self.total = np.zeros(shape, dtype=np.uint16)
+        self.mean = np.empty(shape, dtype=np.uint8)
+        self.difference = np.empty(shape, dtype=np.uint8)
+        self.motion = np.empty(shape[:2], dtype=np.uint8)
+        self.output = np.empty((self.batch_size,) + shape, dtype=np.uint8)
+
+    def __call__(self, batch):
+        if self.ring is None:
+            self._allocate(batch.shape[1:])
+        for index, frame in enumerate(batch):
+            slot = self.seen % self.window
+            if self.seen >= self.window:
+                np.subtract(self.total, self.ring[slot], out=self.total)
+            self.ring[slot] = frame
+            np.add(self.total, frame, out=self.total)
+            self.seen += 1
+            cv2.convertScaleAbs(self.total, dst=self.mean, alpha=1.0 / min(self.seen, self.window))
+            cv2.absdiff(frame, self.mean, dst=self.difference)
+            # Largest channel difference per pixel; reducing over the channel
+            # axis with max(axis=2) is an order of magnitude slower
+            np.maximum(self.difference[:, :, 0], self.difference[:, :, 1], out=self.motion)
+            np.maximum(self.motion, self.difference[:, :, 2], out=self.motion)
+            cv2.threshold(self.motion, self.threshold, 255, cv2.THRESH_BINARY, dst=self.motion)
+            output = self.output[index]
+            np.copyto(output, self.mean)
+            cv2.copyTo(frame, self.motion, output)
+        return self.output[:len(batch)]
+
+
+def list_jobs(input_dir, output_dir, force=False):
+    # (input, output) pairs, largest input first: with workers pulling from a
+    # shared queue, starting the long videos early keeps one of them from
+    # finishing alone at the end. Outputs newer than their input are skipped.
+    jobs = []
+    skipped = 0
+    for file_name in os.listdir(input_dir):
+        if not file_name.endswith('.mp4'):
+            continue
         input_path = os.path.join(input_dir, file_name)
         output_path = os.path.join(output_dir, f"preprocessed_{file_name}")
-        preprocess_video(input_path, output_path, config)
+        input_stat = os.stat(input_path)
+        if not force and os.path.exists(output_path):
+            output_stat = os.stat(output_path)
+            if output_stat.st_size > 0 and output_stat.st_mtime >= input_stat.st_mtime:
+                skipped += 1
+                continue
+        jobs.append((input_stat.st_size, input_path, output_path))
+    jobs.sort(reverse=True)
+    return [(input_path, output_path) for _, input_path, output_path in jobs], skipped
+
+
+def _init_worker():
+    # One OpenCV thread per process; the pool already provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def _run_preprocess(job, config):
+    return preprocess_video(job[0], job[1], config)
+
+
+class LocalExecutor:
+    # Bounded pool of worker processes. At most `max_pending` videos are
+    # submitted ahead of the workers, so a huge directory doesn't queue
+    # thousands of tasks at once.
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
 
-    video_df.foreach(process_video_file)
-    spark.stop()
+    def run(self, jobs, config):
+        results = []
+        pending = set()
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker) as pool:
+            for job in jobs:
+                if len(pending) >= self.max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in done)
+                pending.add(pool.submit(preprocess_video, job[0], job[1], config))
+            results.extend(future.result() for future in wait(pending)[0])
+        return results
+
+
+class DaskExecutor:
+    # Dask distributed scheduler; its workers steal queued tasks from busy ones
+    def __init__(self, address=None, workers=None):
+        self.address = address
+        self.workers = workers
+
+    def run(self, jobs, config):
+        from dask.distributed import Client, LocalCluster
+        cluster = None if self.address else LocalCluster(n_workers=self.workers, threads_per_worker=1)
+        client = Client(self.address or cluster)
+        try:
+            # Higher priority for larger files, matching the local ordering
+            futures = [client.submit(_run_preprocess, job, config, pure=False, priority=len(jobs) - rank)
+                       for rank, job in enumerate(jobs)]
+            return client.gather(futures)
+        finally:
+            client.close()
+            if cluster is not None:
+                cluster.close()
+
+
+class SparkExecutor:
+    def __init__(self, partitions=None):
+        self.partitions = partitions
+
+    def run(self, jobs, config):
+        from pyspark.sql import SparkSession
+        spark = SparkSession.builder.appName("VideoPreprocessing").getOrCreate()
+        try:
+            context = spark.sparkContext
+            # One video per partition by default, so the scheduler can balance uneven files
+            partitions = self.partitions or max(1, min(len(jobs), context.defaultParallelism * 4))
+            return context.parallelize(jobs, partitions).map(lambda job: _run_preprocess(job, config)).collect()
+        finally:
+            spark.stop()
+
+
+EXECUTORS = {
+    "local": LocalExecutor,
+    "dask": DaskExecutor,
+    "spark": SparkExecutor
+}
+
+
+def preprocess_data(input_dir, output_dir, config, backend="local", force=False, **executor_options):
+    os.makedirs(output_dir, exist_ok=True)
+    jobs, skipped = list_jobs(input_dir, output_dir, force)
+    logging.info(f"Preprocessing {len(jobs)} videos with the {backend} backend ({skipped} already up to date)")
+    results = EXECUTORS[backend](**executor_options).run(jobs, config) if jobs else []
+    stats = {}
+    for result in results:
+        for stage, entry in (result or {}).items():
+            total = stats.setdefault(stage, {"frames": 0, "seconds": 0.0})
+            total["frames"] += entry["frames"]
+            total["seconds"] += entry["seconds"]
+    failed = sum(1 for result in results if result is False)
+    summary = {"processed": len(results) - failed, "failed": failed, "skipped": skipped}
+    logging.info(f"Preprocessing finished: {summary}")
+    if stats:
+        # Per worker process; multiply by the worker count for the pool's throughput
+        logging.info(f"Stage throughput per worker: {format_stage_rates(stats)}")
+    return summary
+
+
+def distributed_preprocessing(input_dir, output_dir, config):
+    return preprocess_data(input_dir, output_dir, config, backend=config.get('backend', 'spark'))
 
 
 if __name__ == "__main__":
-    config = load_preprocessing_config()
-    distributed_preprocessing("input_videos", "output_videos", config)
+    parser = argparse.ArgumentParser(description="Preprocess a directory of videos")
+    parser.add_argument("input_dir", nargs="?", default="input_videos")
+    parser.add_argument("output_dir", nargs="?", default="output_videos")
+    parser.add_argument("--config", default="config/preprocessing.yaml")
+    parser.add_argument("--backend", choices=sorted(EXECUTORS), help="Defaults to the config's backend")
+    parser.add_argument("--workers", type=int, help="Worker processes for the local backend")
+    parser.add_argument("--force", action="store_true", help="Reprocess videos whose output is up to date")
+    args = parser.parse_args()
+    config = load_preprocessing_config(args.config)
+    backend = args.backend or config.get('backend', 'local')
+    options = {"workers": args.workers or config.get('workers')} if backend in ("local", "dask") else {}
+    preprocess_data(args.input_dir, args.output_dir, config, backend=backend, force=args.force, **options)
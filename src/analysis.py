@@ -1,95 +1,368 @@
 import cv2
-import mediapipe as mp
 import numpy as np
-from deepface import DeepFace
 import logging
+import multiprocessing
+import os
+from importlib import metadata
+from .lazy import lazy_import
+from concurrent.futures import ProcessPoolExecutor
+from .frames import FrameSource, SamplingPolicy, capture_metadata, iter_frames, sampled_frame_ids
+from .scene_detection import SceneDetector
+from .tracing import tracer, run_traced
+
+# MediaPipe pulls in its model graphs and DeepFace all of TensorFlow; both load on first use
+mp = lazy_import("mediapipe")
+DeepFace = lazy_import("deepface", "DeepFace")
+
+def _package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+# Bump when analyzer output changes so cached analysis results are invalidated
+# Face and scene results depend on the DeepFace models and OpenCV's decoder and optical flow too
+ANALYSIS_VERSION = (f"1:mediapipe-{_package_version('mediapipe')}:deepface-{_package_version('deepface')}"
+                    f":opencv-{cv2.__version__}")
+
+class StructuralAnalyzer:
+    def __init__(self, keep_frames=True, thumbnail_size=None):
+        self.keep_frames = keep_frames
+        self.thumbnail_size = thumbnail_size
+        self.face_detection = mp.solutions.face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
+        self.objectron = mp.solutions.objectron.Objectron(static_image_mode=False, max_num_objects=5, min_detection_confidence=0.5, model_name='Cup')
+        self.frames = []
+
+    def analyze_frame(self, frame_id, timestamp, frame):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = self.face_detection.process(rgb_frame)
+        object_results = self.objectron.process(rgb_frame)
+        record = {
+            "face_detections": results.detections if results.detections else [],
+            "object_detections": object_results.detected_objects if object_results.detected_objects else [],
+            "frame_id": frame_id,
+            "timestamp": timestamp
+        }
+        if self.thumbnail_size:
+            record["thumbnail"] = cv2.resize(frame, self.thumbnail_size, interpolation=cv2.INTER_AREA)
+        return record
+
+    def process(self, frame_id, timestamp, frame):
+        record = self.analyze_frame(frame_id, timestamp, frame)
+        if self.keep_frames:
+            record["frame"] = frame
+        self.frames.append(record)
+
+    def finish(self):
+        return self.frames
+
+class SceneChangeAnalyzer:
+    # backend="dense_flow" keeps the original full-resolution DIS optical flow;
+    # "histogram", "block" and "flow" use the downscaled, windowed SceneDetector.
+    def __init__(self, threshold=0.5, backend="dense_flow", **detector_options):
+        self.threshold = threshold
+        self.detector = None if backend == "dense_flow" else SceneDetector(backend, **detector_options)
+        self.optical_flow = cv2.DISOpticalFlow_create(cv2.OPTFLOW_FARNEBACK_GAUSSIAN) if self.detector is None else None
+        self.previous_frame = None
+        self.scene_changes = []
+
+    def process(self, frame_id, timestamp, frame):
+        if self.detector is not None:
+            self.detector.push(frame_id, frame)
+            return
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.previous_frame is not None:
+            flow = self.optical_flow.calc(self.previous_frame, gray_frame, None)
+            mag, ang = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+            if np.mean(mag) > self.threshold:
+                self.scene_changes.append(frame_id)
+        self.previous_frame = gray_frame
+
+    def finish(self):
+        if self.detector is not None:
+            self.detector.flush()
+            return self.detector.scene_changes
+        return self.scene_changes
+
+def _box_iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = inter_w * inter_h
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+def _crop_face(frame, box, crop_size, margin=0.2):
+    height, width = frame.shape[:2]
+    x, y, w, h = box
+    pad_x, pad_y = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+    x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+    return cv2.resize(frame[y0:y1, x0:x1], crop_size, interpolation=cv2.INTER_AREA)
+
+def _analyze_face_crops(crops):
+    options = {"actions": ['age', 'gender', 'emotion'], "detector_backend": "skip", "enforce_detection": False, "silent": True}
+    try:
+        # Recent DeepFace releases accept a batch of images and run each model once over it
+        results = DeepFace.analyze(list(crops), **options)
+        if len(results) == len(crops):
+            return [result[0] if isinstance(result, list) else result for result in results]
+    except (TypeError, ValueError):
+        pass
+    return [DeepFace.analyze(crop, **options)[0] for crop in crops]
+
+class FaceRecognitionAnalyzer:
+    # MediaPipe finds the faces first, so frames without faces never reach
+    # DeepFace. New faces are cropped and analyzed in batches, and a face that
+    # overlaps a face from the previous frame reuses that track's attributes.
+    def __init__(self, batch_size=16, crop_size=(224, 224), iou_threshold=0.5, min_detection_confidence=0.5):
+        self.batch_size = batch_size
+        self.crop_size = crop_size
+        self.iou_threshold = iou_threshold
+        self.face_detection = mp.solutions.face_detection.FaceDetection(model_selection=1, min_detection_confidence=min_detection_confidence)
+        self.tracks = []
+        self.next_track_id = 0
+        self.pending = []
+        self.faces = []
+
+    def process(self, frame_id, timestamp, frame):
+        results = self.face_detection.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if not results.detections:
+            self.tracks = []
+            return
+
+        height, width = frame.shape[:2]
+        tracks = []
+        frame_faces = []
+        for detection in results.detections:
+            relative_box = detection.location_data.relative_bounding_box
+            box = (int(relative_box.xmin * width), int(relative_box.ymin * height),
+                   int(relative_box.width * width), int(relative_box.height * height))
+            if box[2] <= 0 or box[3] <= 0:
+                continue
+            track = self._match_track(box)
+            if track is None:
+                track = {"track_id": self.next_track_id, "analysis": {}}
+                self.next_track_id += 1
+                self.pending.append((track["analysis"], _crop_face(frame, box, self.crop_size)))
+            track["box"] = box
+            tracks.append(track)
+            frame_faces.append({
+                "track_id": track["track_id"],
+                "region": {"x": box[0], "y": box[1], "w": box[2], "h": box[3]},
+                "confidence": detection.score[0] if detection.score else None,
+                "analysis": track["analysis"]
+            })
+        self.tracks = tracks
+        if frame_faces:
+            self.faces.append({"frame_id": frame_id, "timestamp": timestamp, "faces": frame_faces})
+        if len(self.pending) >= self.batch_size:
+            self._flush()
+
+    def _match_track(self, box):
+        best_track, best_iou = None, self.iou_threshold
+        for track in self.tracks:
+            iou = _box_iou(track["box"], box)
+            if iou >= best_iou:
+                best_track, best_iou = track, iou
+        if best_track is not None:
+            self.tracks.remove(best_track)
+        return best_track
+
+    def _flush(self):
+        if not self.pending:
+            return
+        analyses = _analyze_face_crops([crop for _, crop in self.pending])
+        for (attributes, _), analysis in zip(self.pending, analyses):
+            attributes.update({key: value for key, value in analysis.items() if key != "region"})
+        self.pending = []
+
+    def finish(self):
+        self._flush()
+        return self.faces
+
+ANALYZERS = {
+    "structure": StructuralAnalyzer,
+    "scenes": SceneChangeAnalyzer,
+    "faces": FaceRecognitionAnalyzer
+}
+
+def analyze_video(video_path, analyzers=("structure", "scenes", "faces"), analyzer_options=None, queue_size=8, sampling=None,
+                  start_frame=0, end_frame=None):
+    try:
+        analyzer_options = analyzer_options or {}
+        source = FrameSource(video_path, queue_size=queue_size, sampling=sampling, start_frame=start_frame, end_frame=end_frame)
+        for name in analyzers:
+            source.register(name, ANALYZERS[name](**analyzer_options.get(name, {})))
+        results = source.run()
+        results["metadata"] = source.metadata
+        return results
+    except Exception as e:
+        logging.error(f"Error analyzing video: {e}", exc_info=True)
+        return {}
+
+def _analyze_segment(video_path, analyzers, analyzer_options, sampling, prime_frame, start_frame, end_frame):
+    # Starting one sampled frame early lets the scene analyzer compare the
+    # segment's first frame against its real predecessor; the primer frame's
+    # own records are dropped so segments don't overlap after merging.
+    results = analyze_video(video_path, analyzers, analyzer_options, sampling=sampling,
+                            start_frame=prime_frame, end_frame=end_frame)
+    # analyze_video drops analyzers that fail; merging that would silently
+    # leave a hole in the results for this time range
+    missing = [name for name in analyzers if name not in results]
+    if missing:
+        raise RuntimeError(f"Analyzers {missing} failed on frames {start_frame}-{end_frame}")
+    results.pop("metadata", None)
+    for name, items in results.items():
+        results[name] = [item for item in items if _item_frame_id(item) >= start_frame]
+    return results
+
+def _item_frame_id(item):
+    return item["frame_id"] if isinstance(item, dict) else item
+
+def _merge_segments(segments, analyzers):
+    merged = {name: [] for name in analyzers}
+    track_offset = 0
+    for segment in segments:
+        for name, items in segment.items():
+            if name == "faces":
+                # Track ids restart in every worker, so shift them into one id space
+                max_track_id = -1
+                for record in items:
+                    for face in record["faces"]:
+                        max_track_id = max(max_track_id, face["track_id"])
+                        face["track_id"] += track_offset
+                track_offset += max_track_id + 1
+            merged[name].extend(items)
+    return merged
+
+def analyze_video_parallel(video_path, analyzers=("structure", "scenes", "faces"), analyzer_options=None, sampling=None, workers=None):
+    try:
+        metadata = extract_video_metadata(video_path)
+        frame_ids = sampled_frame_ids(video_path, sampling)
+        workers = max(1, min(workers or os.cpu_count() or 1, len(frame_ids)))
+        if workers == 1:
+            return analyze_video(video_path, analyzers, analyzer_options, sampling=sampling)
+
+        # One segment per worker, split on sampled frames so every worker
+        # builds its MediaPipe/DeepFace models exactly once.
+        positions = [len(frame_ids) * i // workers for i in range(workers)]
+        segments = []
+        for i, position in enumerate(positions):
+            start_frame = frame_ids[position]
+            end_frame = frame_ids[positions[i + 1]] if i + 1 < workers else None
+            prime_frame = frame_ids[position - 1] if position > 0 else start_frame
+            segments.append((prime_frame, start_frame, end_frame))
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(run_traced, _analyze_segment, video_path, tuple(analyzers), analyzer_options, sampling, *segment)
+                for segment in segments
+            ]
+            segment_results = []
+            errors = []
+            for future in futures:
+                # Keep the analyzer spans recorded in the workers
+                result, error, _, spans = future.result()
+                tracer.merge(spans)
+                if error is not None:
+                    errors.append(error)
+                segment_results.append(result)
+        if errors:
+            # Never merge partial segments: the gap would be cached as a complete result
+            logging.warning(f"{len(errors)} of {workers} analysis segments failed ({errors[0]}); analyzing sequentially instead")
+            return analyze_video(video_path, analyzers, analyzer_options, sampling=sampling)
+        results = _merge_segments(segment_results, analyzers)
+        results["metadata"] = metadata
+        return results
+    except Exception as e:
+        logging.error(f"Error analyzing video in parallel: {e}", exc_info=True)
+        return {}
 
 def extract_video_metadata(video_path):
     try:
         video = cv2.VideoCapture(video_path)
-        metadata = {
-            "frame_count": int(video.get(cv2.CAP_PROP_FRAME_COUNT)),
-            "frame_rate": video.get(cv2.CAP_PROP_FPS),
-            "duration": int(video.get(cv2.CAP_PROP_FRAME_COUNT)) / video.get(cv2.CAP_PROP_FPS),
-            "resolution": (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))),
-            "bitrate": int(video.get(cv2.CAP_PROP_BITRATE)) if video.get(cv2.CAP_PROP_BITRATE) != 0 else None,
-            "codec": video.get(cv2.CAP_PROP_FOURCC)
-        }
+        metadata = capture_metadata(video)
         video.release()
         return metadata
     except Exception as e:
         logging.error(f"Error extracting video metadata: {e}", exc_info=True)
         return {}
 
-def analyze_structural_elements(video_path):
+def analyze_structural_elements(video_path, sampling=None):
     try:
-        video = cv2.VideoCapture(video_path)
-        mp_face_detection = mp.solutions.face_detection.FaceDetection(model_selection=1, min_detection_confidence=0.5)
-        mp_objectron = mp.solutions.objectron.Objectron(static_image_mode=False, max_num_objects=5, min_detection_confidence=0.5, model_name='Cup')
-        frames = []
-        while video.isOpened():
-            ret, frame = video.read()
-            if not ret:
-                break
-            results = mp_face_detection.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            object_results = mp_objectron.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            frames.append({
-                "frame": frame,
-                "face_detections": results.detections if results.detections else [],
-                "object_detections": object_results.detected_objects if object_results.detected_objects else [],
-                "frame_id": video.get(cv2.CAP_PROP_POS_FRAMES)
-            })
-        video.release()
-        return frames
+        return analyze_video(video_path, analyzers=("structure",), sampling=sampling).get("structure", [])
     except Exception as e:
         logging.error(f"Error analyzing structural elements: {e}", exc_info=True)
         return []
 
-def detect_scene_changes(video_path):
+def iter_structural_elements(video_path, thumbnail_size=None, sampling=None):
+    # Yields one detection record per frame without holding on to the decoded
+    # pixels; pass thumbnail_size=(width, height) to keep a downscaled copy.
+    analyzer = StructuralAnalyzer(keep_frames=False, thumbnail_size=thumbnail_size)
+    for frame_id, timestamp, frame in iter_frames(video_path, sampling):
+        yield analyzer.analyze_frame(frame_id, timestamp, frame)
+
+def _face_box(detection):
+    box = detection.location_data.relative_bounding_box
+    return (box.xmin, box.ymin, box.width, box.height)
+
+def _object_box(detected_object):
+    xs = [landmark.x for landmark in detected_object.landmarks_2d.landmark]
+    ys = [landmark.y for landmark in detected_object.landmarks_2d.landmark]
+    return (min(xs), min(ys), max(xs) - min(xs), max(ys) - min(ys))
+
+def structural_elements_to_columns(records):
+    # Flattens detection records into one row per detection. Boxes are relative
+    # (xmin, ymin, width, height); kind is 0 for faces and 1 for objects, which
+    # carry no confidence score.
+    frame_ids, kinds, boxes, scores = [], [], [], []
+    for record in records:
+        for detection in record["face_detections"]:
+            frame_ids.append(record["frame_id"])
+            kinds.append(0)
+            boxes.append(_face_box(detection))
+            scores.append(detection.score[0] if detection.score else np.nan)
+        for detected_object in record["object_detections"]:
+            frame_ids.append(record["frame_id"])
+            kinds.append(1)
+            boxes.append(_object_box(detected_object))
+            scores.append(np.nan)
+    return {
+        "frame_id": np.asarray(frame_ids, dtype=np.int64),
+        "kind": np.asarray(kinds, dtype=np.int8),
+        "bbox": np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+        "score": np.asarray(scores, dtype=np.float32)
+    }
+
+def analyze_structural_elements_columnar(video_path, sampling=None):
     try:
-        video = cv2.VideoCapture(video_path)
-        previous_frame = None
-        scene_changes = []
-        frame_id = 0
-        optical_flow = cv2.DISOpticalFlow_create(cv2.OPTFLOW_FARNEBACK_GAUSSIAN)
-
-        while video.isOpened():
-            ret, frame = video.read()
-            if not ret:
-                break
-            gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            if previous_frame is not None:
-                flow = optical_flow.calc(previous_frame, gray_frame, None)
-                mag, ang = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-                if np.mean(mag) > 0.5:
-                    scene_changes.append(frame_id)
-            previous_frame = gray_frame
-            frame_id += 1
+        return structural_elements_to_columns(iter_structural_elements(video_path, sampling=sampling))
+    except Exception as e:
+        logging.error(f"Error analyzing structural elements: {e}", exc_info=True)
+        return structural_elements_to_columns([])
 
-        video.release()
-        return scene_changes
+def detect_scene_changes(video_path, sampling=None, backend="dense_flow", **detector_options):
+    try:
+        analyzer_options = {"scenes": dict(backend=backend, **detector_options)}
+        return analyze_video(video_path, analyzers=("scenes",), analyzer_options=analyzer_options, sampling=sampling).get("scenes", [])
     except Exception as e:
         logging.error(f"Error detecting scene changes: {e}", exc_info=True)
         return []
 
-def perform_face_recognition(video_path):
+def perform_face_recognition(video_path, sampling=None):
     try:
-        video = cv2.VideoCapture(video_path)
-        faces = []
-        while video.isOpened():
-            ret, frame = video.read()
-            if not ret:
-                break
-            face_analysis = DeepFace.analyze(frame, actions=['age', 'gender', 'emotion'])
-            faces.append(face_analysis)
-        video.release()
-        return faces
+        return analyze_video(video_path, analyzers=("faces",), sampling=sampling).get("faces", [])
     except Exception as e:
         logging.error(f"Error performing face recognition: {e}", exc_info=True)
         return []
 
-def generate_formula(channel_name):
+def generate_formula(channel_name, detected_faces=None, video_path="sample_video.mp4", sampling=None):
     try:
+        if detected_faces is None:
+            detected_faces = perform_face_recognition(video_path, sampling=sampling)
         formula = {
             "channel_name": channel_name,
             "video_style": {
@@ -99,7 +372,7 @@ def generate_formula(channel_name):
                 "narrative_style": "story-driven with B-roll"
             },
             "common_elements": ["intro logo", "outro card", "background music"],
-            "detected_faces": perform_face_recognition("sample_video.mp4")
+            "detected_faces": detected_faces
         }
         return formula
     except Exception as e:
@@ -0,0 +1,105 @@
+import shutil
+import logging
+import subprocess
+import numpy as np
+from .lazy import lazy_import
+from .utils import find_ffmpeg
+
+signal = lazy_import("scipy.signal")
+
+def _decode_command(ffmpeg, input_path, sample_rate, channels):
+    return [ffmpeg, "-loglevel", "error", "-i", input_path, "-vn", "-f", "f32le",
+            "-acodec", "pcm_f32le", "-ar", str(sample_rate), "-ac", str(channels), "pipe:1"]
+
+def iter_audio_blocks(input_path, sample_rate=44100, channels=2, block_size=65536, ffmpeg=None):
+    # Streams the soundtrack as (block_size, channels) float32 blocks; only one
+    # block is ever held in memory
+    ffmpeg = ffmpeg or find_ffmpeg()
+    process = subprocess.Popen(_decode_command(ffmpeg, input_path, sample_rate, channels),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame_bytes = 4 * channels
+    pending = b""
+    try:
+        while True:
+            data = process.stdout.read(block_size * frame_bytes)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % frame_bytes
+            pending = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+class BlockFilter:
+    # Butterworth low-pass as second-order sections; the filter state is carried
+    # from block to block so the output is identical to filtering in one go
+    def __init__(self, sample_rate, cutoff=1000, order=4, channels=2):
+        self.sos = signal.butter(order, cutoff, btype="lowpass", fs=sample_rate, output="sos")
+        self.state = np.zeros((self.sos.shape[0], 2, channels))
+
+    def process(self, block):
+        filtered, self.state = signal.sosfilt(self.sos, block, axis=0, zi=self.state)
+        return filtered.astype(np.float32)
+
+def measure_levels(input_path, sample_rate=44100, channels=2, block_size=65536, cutoff=1000, order=4):
+    # Prepass over the filtered signal: peak and RMS decide the normalization gain
+    peak = 0.0
+    squares = 0.0
+    samples = 0
+    low_pass = BlockFilter(sample_rate, cutoff, order, channels) if cutoff else None
+    for block in iter_audio_blocks(input_path, sample_rate, channels, block_size):
+        if low_pass:
+            block = low_pass.process(block)
+        peak = max(peak, float(np.abs(block).max()))
+        squares += float(np.square(block, dtype=np.float64).sum())
+        samples += block.size
+    rms = (squares / samples) ** 0.5 if samples else 0.0
+    return {"peak": peak, "rms": rms, "samples": samples // channels}
+
+def normalization_gain(levels, target_peak=1.0, target_rms=None, volume=1.0):
+    if levels["peak"] == 0:
+        return volume
+    if target_rms:
+        # RMS (loudness) target, held back so the peak doesn't exceed target_peak
+        gain = min(target_rms / levels["rms"], target_peak / levels["peak"])
+    else:
+        gain = target_peak / levels["peak"]
+    return gain * volume
+
+def enhance_audio(input_path, output_path, sample_rate=44100, channels=2, block_size=65536, cutoff=1000, order=4,
+                  target_peak=1.0, target_rms=None, volume=1.2, audio_codec="aac", audio_bitrate="192k"):
+    # Normalize, boost and low-pass the soundtrack in two streaming passes, then
+    # mux it against the original video stream, which is copied, not re-encoded
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is required for audio enhancement")
+    levels = measure_levels(input_path, sample_rate, channels, block_size, cutoff, order)
+    if levels["samples"] == 0:
+        logging.warning(f"No audio stream in {input_path}; copying it unchanged")
+        shutil.copyfile(input_path, output_path)
+        return levels
+    gain = normalization_gain(levels, target_peak, target_rms, volume)
+    logging.info(f"Audio peak {levels['peak']:.3f}, RMS {levels['rms']:.3f}; applying gain {gain:.2f}")
+
+    command = [ffmpeg, "-y", "-loglevel", "error", "-i", input_path,
+               "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0",
+               "-map", "0:v?", "-map", "1:a", "-c:v", "copy", "-c:a", audio_codec, "-b:a", audio_bitrate,
+               "-shortest", output_path]
+    muxer = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    low_pass = BlockFilter(sample_rate, cutoff, order, channels) if cutoff else None
+    try:
+        for block in iter_audio_blocks(input_path, sample_rate, channels, block_size, ffmpeg):
+            if low_pass:
+                block = low_pass.process(block)
+            block = np.clip(block * gain, -1.0, 1.0).astype(np.float32)
+            muxer.stdin.write(block.tobytes())
+    finally:
+        muxer.stdin.close()
+        errors = muxer.stderr.read().decode(errors="replace")
+        muxer.wait()
+    if muxer.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to mux enhanced audio: {errors.strip()}")
+    return levels
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import zlib
+import pickle
+import hashlib
+import logging
+
+def file_fingerprint(file_path, content_hash=False, sample_size=1024 * 1024):
+    # Either a full content hash, or size + mtime + the first and last
+    # `sample_size` bytes, which is cheap enough to run on every lookup.
+    stat = os.stat(file_path)
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        if content_hash:
+            for chunk in iter(lambda: file.read(sample_size), b""):
+                digest.update(chunk)
+        else:
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+            digest.update(file.read(sample_size))
+            if stat.st_size > 2 * sample_size:
+                file.seek(-sample_size, os.SEEK_END)
+                digest.update(file.read(sample_size))
+    return digest.hexdigest()
+
+def _encode_params(value):
+    return vars(value) if hasattr(value, "__dict__") else repr(value)
+
+class AnalysisCache:
+    def __init__(self, cache_dir=".cache/analysis", max_bytes=2 * 1024 ** 3, content_hash=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, video_path, analyzer, params=None, model_version=None):
+        payload = json.dumps({
+            "video": file_fingerprint(video_path, self.content_hash),
+            "analyzer": analyzer,
+            "params": params or {},
+            "model_version": model_version
+        }, sort_keys=True, default=_encode_params)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                value = pickle.loads(zlib.decompress(file.read()))
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except Exception as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._remove(path)
+            self.misses += 1
+            return False, None
+        # Entries are evicted least-recently-used first, tracked through mtime
+        self._touch(path)
+        self.hits += 1
+        return True, value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+        self._touch(path)
+        self.evict()
+
+    def get_or_compute(self, video_path, analyzer, compute, params=None, model_version=None, complete=bool):
+        # complete(value) decides whether a result may be stored; by default any
+        # non-empty one. Incomplete results are returned but computed again next time.
+        try:
+            key = self.key(video_path, analyzer, params, model_version)
+        except Exception as e:
+            logging.error(f"Error computing cache key: {e}", exc_info=True)
+            return compute()
+        hit, value = self.get(key)
+        if hit:
+            logging.info(f"Cache hit for {analyzer} on {video_path}")
+            return value
+        started = time.perf_counter()
+        value = compute()
+        logging.info(f"Cache miss for {analyzer} on {video_path}; computed in {time.perf_counter() - started:.1f}s")
+        # Failed analyses return empty or partial results; don't pin them in the cache
+        if complete(value):
+            try:
+                self.put(key, value)
+            except Exception as e:
+                logging.error(f"Error writing cache entry: {e}", exc_info=True)
+        return value
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".bin"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _touch(self, path):
+        # Explicit nanosecond timestamps; the filesystem's own clock is too coarse
+        # to order entries written in quick succession.
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def stats(self):
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries)
+        }
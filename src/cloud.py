@@ -1,18 +1,263 @@
-import boto3
-from boto3.s3.transfer import TransferConfig, S3Transfer
+import os
+import json
+import math
+import time
+import uuid
+import shutil
+import hashlib
 import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from .cache import file_fingerprint
 
-def upload_to_s3(file_path, bucket_name, object_name, region_name="us-west-1"):
-    try:
-        s3 = boto3.client('s3', region_name=region_name)
-        config = TransferConfig(multipart_threshold=1024 * 25, max_concurrency=10, multipart_chunksize=1024 * 25, use_threads=True)
+MIN_PART_SIZE = 8 * 1024 ** 2
+MAX_PARTS = 10000
+
+@lru_cache(maxsize=None)
+def get_s3_client(region_name="us-west-1"):
+    # One client per region for the whole process; boto3 clients are thread-safe
+    # and expensive to build. boto3 is only imported when S3 is actually used.
+    import boto3
+    from botocore.config import Config
+    return boto3.client('s3', region_name=region_name, config=Config(max_pool_connections=32))
+
+def part_size_for(file_size, min_part_size=MIN_PART_SIZE, max_parts=MAX_PARTS):
+    # Smallest whole number of MiB that keeps the upload under max_parts parts
+    part_size = max(min_part_size, math.ceil(file_size / max_parts))
+    return math.ceil(part_size / 1024 ** 2) * 1024 ** 2
+
+class S3Backend:
+    def __init__(self, bucket_name, region_name="us-west-1"):
+        self.bucket_name = bucket_name
+        self.region_name = region_name
+        self.name = f"s3://{bucket_name}"
+
+    @property
+    def client(self):
+        return get_s3_client(self.region_name)
+
+    def put_object(self, key, file_path):
+        with open(file_path, 'rb') as file:
+            self.client.put_object(Bucket=self.bucket_name, Key=key, Body=file)
+
+    def create_multipart(self, key):
+        return self.client.create_multipart_upload(Bucket=self.bucket_name, Key=key)["UploadId"]
+
+    def upload_part(self, key, upload_id, part_number, data):
+        response = self.client.upload_part(Bucket=self.bucket_name, Key=key, UploadId=upload_id, PartNumber=part_number, Body=data)
+        return response["ETag"]
+
+    def list_parts(self, key, upload_id):
+        # Parts the service already holds, or None if the upload no longer exists
+        parts = {}
+        try:
+            paginator = self.client.get_paginator("list_parts")
+            for page in paginator.paginate(Bucket=self.bucket_name, Key=key, UploadId=upload_id):
+                for part in page.get("Parts", []):
+                    parts[part["PartNumber"]] = part["ETag"]
+        except self.client.exceptions.NoSuchUpload:
+            return None
+        return parts
+
+    def complete_multipart(self, key, upload_id, parts):
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket_name, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": number, "ETag": etag} for number, etag in sorted(parts.items())]}
+        )
+
+    def abort_multipart(self, key, upload_id):
+        self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+
+class LocalBackend:
+    # Filesystem stand-in with the same multipart semantics, for tests and dry runs
+    def __init__(self, root):
+        self.root = root
+        self.name = f"file://{os.path.abspath(root)}"
+        os.makedirs(os.path.join(root, ".multipart"), exist_ok=True)
+
+    def _object_path(self, key):
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _upload_dir(self, upload_id):
+        return os.path.join(self.root, ".multipart", upload_id)
+
+    def put_object(self, key, file_path):
+        shutil.copyfile(file_path, self._object_path(key))
+
+    def create_multipart(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        return upload_id
 
-        def upload_progress(bytes_transferred):
-            logging.info(f"{bytes_transferred} bytes transferred so far...")
+    def upload_part(self, key, upload_id, part_number, data):
+        with open(os.path.join(self._upload_dir(upload_id), f"{part_number:05d}"), 'wb') as part_file:
+            part_file.write(data)
+        return hashlib.md5(data).hexdigest()
 
-        transfer = S3Transfer(s3, config)
-        transfer.upload_file(file_path, bucket_name, object_name, callback=upload_progress)
+    def list_parts(self, key, upload_id):
+        upload_dir = self._upload_dir(upload_id)
+        if not os.path.isdir(upload_dir):
+            return None
+        parts = {}
+        for name in os.listdir(upload_dir):
+            with open(os.path.join(upload_dir, name), 'rb') as part_file:
+                parts[int(name)] = hashlib.md5(part_file.read()).hexdigest()
+        return parts
 
+    def complete_multipart(self, key, upload_id, parts):
+        upload_dir = self._upload_dir(upload_id)
+        with open(self._object_path(key), 'wb') as output:
+            for number in sorted(parts):
+                with open(os.path.join(upload_dir, f"{number:05d}"), 'rb') as part_file:
+                    shutil.copyfileobj(part_file, output)
+        shutil.rmtree(upload_dir)
+
+    def abort_multipart(self, key, upload_id):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+class _Progress:
+    # Aggregates byte counts from every worker and logs at most once per interval
+    def __init__(self, total_bytes, interval=5.0, callback=None):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.callback = callback
+        self.transferred = 0
+        self.started = time.monotonic()
+        self.last_report = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, byte_count):
+        with self.lock:
+            self.transferred += byte_count
+            now = time.monotonic()
+            if now - self.last_report < self.interval and self.transferred < self.total_bytes:
+                return
+            self.last_report = now
+            rate = self.transferred / max(now - self.started, 1e-6)
+        logging.info(f"Uploaded {self.transferred}/{self.total_bytes} bytes ({rate / 1024 ** 2:.1f} MiB/s)")
+        if self.callback:
+            self.callback(self.transferred, self.total_bytes)
+
+class Uploader:
+    # Uploads many files at once over one backend. Large files go up in parts
+    # sized for the file, spread over a shared pool of `concurrency` workers, and
+    # the multipart upload id is checkpointed so an interrupted upload resumes
+    # with only the missing parts.
+    def __init__(self, backend, concurrency=8, max_files=4, checkpoint_dir=".cache/uploads",
+                 min_part_size=MIN_PART_SIZE, progress_interval=5.0, progress_callback=None):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_files = max_files
+        self.checkpoint_dir = checkpoint_dir
+        self.min_part_size = min_part_size
+        self.progress_interval = progress_interval
+        self.progress_callback = progress_callback
+        self.checkpoint_lock = threading.Lock()
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def _checkpoint_path(self, file_path, key):
+        name = hashlib.sha256(f"{self.backend.name}\0{os.path.abspath(file_path)}\0{key}".encode()).hexdigest()
+        return os.path.join(self.checkpoint_dir, f"{name}.json")
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(path, 'r') as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save_checkpoint(self, path, checkpoint):
+        with self.checkpoint_lock:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w') as checkpoint_file:
+                json.dump(checkpoint, checkpoint_file)
+            os.replace(temp_path, path)
+
+    def _remove_checkpoint(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _resume(self, checkpoint_path, fingerprint, part_size, key):
+        checkpoint = self._load_checkpoint(checkpoint_path)
+        if checkpoint and checkpoint["fingerprint"] == fingerprint and checkpoint["part_size"] == part_size:
+            parts = self.backend.list_parts(key, checkpoint["upload_id"])
+            if parts is not None:
+                logging.info(f"Resuming upload of {key} with {len(parts)} parts already uploaded")
+                return checkpoint["upload_id"], parts
+        elif checkpoint:
+            # The file changed since the interrupted upload; its parts are useless
+            try:
+                self.backend.abort_multipart(key, checkpoint["upload_id"])
+            except Exception as e:
+                logging.warning(f"Could not abort stale upload of {key}: {e}")
+        upload_id = self.backend.create_multipart(key)
+        self._save_checkpoint(checkpoint_path, {"fingerprint": fingerprint, "part_size": part_size, "upload_id": upload_id})
+        return upload_id, {}
+
+    def _upload_part(self, file_path, key, upload_id, part_number, part_size, progress):
+        with open(file_path, 'rb') as file:
+            file.seek((part_number - 1) * part_size)
+            data = file.read(part_size)
+        etag = self.backend.upload_part(key, upload_id, part_number, data)
+        progress.add(len(data))
+        return part_number, etag
+
+    def upload_file(self, file_path, key, part_pool=None):
+        file_size = os.path.getsize(file_path)
+        if file_size < self.min_part_size:
+            self.backend.put_object(key, file_path)
+            logging.info(f"Uploaded {file_path} to {self.backend.name}/{key}")
+            return key
+
+        part_size = part_size_for(file_size, self.min_part_size)
+        part_count = math.ceil(file_size / part_size)
+        checkpoint_path = self._checkpoint_path(file_path, key)
+        upload_id, parts = self._resume(checkpoint_path, file_fingerprint(file_path), part_size, key)
+
+        missing = [number for number in range(1, part_count + 1) if number not in parts]
+        progress = _Progress(file_size, self.progress_interval, self.progress_callback)
+        progress.add(file_size - sum(min(part_size, file_size - (number - 1) * part_size) for number in missing))
+        own_pool = part_pool is None
+        part_pool = part_pool or ThreadPoolExecutor(self.concurrency)
+        try:
+            futures = [part_pool.submit(self._upload_part, file_path, key, upload_id, number, part_size, progress)
+                       for number in missing]
+            for future in futures:
+                part_number, etag = future.result()
+                parts[part_number] = etag
+        finally:
+            if own_pool:
+                part_pool.shutdown()
+        self.backend.complete_multipart(key, upload_id, parts)
+        self._remove_checkpoint(checkpoint_path)
+        logging.info(f"Uploaded {file_path} to {self.backend.name}/{key} in {part_count} parts of {part_size} bytes")
+        return key
+
+    def upload_files(self, uploads):
+        # uploads: iterable of (file_path, key). Returns {key: error or None}
+        results = {}
+        with ThreadPoolExecutor(self.concurrency) as part_pool, ThreadPoolExecutor(self.max_files) as file_pool:
+            futures = {file_pool.submit(self.upload_file, file_path, key, part_pool): key for file_path, key in uploads}
+            for future, key in futures.items():
+                try:
+                    future.result()
+                    results[key] = None
+                except Exception as e:
+                    logging.error(f"Error uploading {key}: {e}", exc_info=True)
+                    results[key] = e
+        return results
+
+def upload_to_s3(file_path, bucket_name, object_name, region_name="us-west-1", concurrency=8, checkpoint_dir=".cache/uploads"):
+    try:
+        uploader = Uploader(S3Backend(bucket_name, region_name), concurrency=concurrency, checkpoint_dir=checkpoint_dir)
+        uploader.upload_file(file_path, object_name)
         logging.info(f"Uploaded {file_path} to S3 bucket {bucket_name} as {object_name} in region {region_name}")
+        return True
     except Exception as e:
         logging.error(f"Error uploading to S3: {e}", exc_info=True)
+        return False
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+
+def load_cube(file_path):
+    # Parses an Adobe/Resolve .cube 3D LUT into an (N, N, N, 3) float array
+    # indexed [r, g, b], plus its input domain.
+    size = None
+    domain_min = np.zeros(3, dtype=np.float32)
+    domain_max = np.ones(3, dtype=np.float32)
+    rows = []
+    with open(file_path, 'r') as cube_file:
+        for line in cube_file:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            keyword = line.split()[0]
+            if keyword == "LUT_3D_SIZE":
+                size = int(line.split()[1])
+            elif keyword == "LUT_1D_SIZE":
+                raise ValueError("1D .cube LUTs are not supported; use a 3D LUT")
+            elif keyword == "DOMAIN_MIN":
+                domain_min = np.array(line.split()[1:4], dtype=np.float32)
+            elif keyword == "DOMAIN_MAX":
+                domain_max = np.array(line.split()[1:4], dtype=np.float32)
+            elif keyword == "TITLE":
+                continue
+            else:
+                rows.append(line.split()[:3])
+    if size is None or len(rows) != size ** 3:
+        raise ValueError(f"Malformed .cube file {file_path}: expected {size}^3 rows, found {len(rows)}")
+    # Rows are ordered with red changing fastest
+    table = np.array(rows, dtype=np.float32).reshape(size, size, size, 3).transpose(2, 1, 0, 3)
+    return table, domain_min, domain_max
+
+def _interpolate_axis(values, positions, axis):
+    # Linear interpolation of `values` at fractional indices along one axis;
+    # doing this along each axis in turn is trilinear interpolation on a grid
+    lower = np.minimum(np.floor(positions).astype(np.int32), values.shape[axis] - 2)
+    shape = [1] * values.ndim
+    shape[axis] = -1
+    fraction = (positions - lower).astype(np.float32).reshape(shape)
+    return np.take(values, lower, axis) * (1 - fraction) + np.take(values, lower + 1, axis) * fraction
+
+class ColorEngine:
+    # Composes point-wise adjustments into a single 256-entry table applied with
+    # one cv2.LUT call per frame. A .cube LUT, together with any desaturation in
+    # front of it, is baked into a packed uint32 table with an entry for every
+    # 8-bit RGB triple (trilinearly sampled from the cube, so no banding) and
+    # looked up with one np.take. Without a cube, desaturation is a 3x3 channel
+    # mix (cv2.transform). Grading stays memory-bound instead of Python-bound.
+    def __init__(self):
+        self.curve = np.arange(256, dtype=np.float64)
+        self.saturation = 1.0
+        self.cube = None
+        self._lut = None
+        self._matrix = None
+        self._cube_table = None
+
+    def colorx(self, factor):
+        self.curve = np.floor(np.minimum(255, factor * self.curve))
+        return self._changed()
+
+    def lum_contrast(self, lum=0, contrast=0, contrast_thr=127):
+        self.curve = np.floor(np.clip(self.curve + lum + contrast * (self.curve - float(contrast_thr)), 0, 255))
+        return self._changed()
+
+    def gamma(self, gamma):
+        self.curve = np.floor(255 * (self.curve / 255) ** gamma)
+        return self._changed()
+
+    def desaturate(self, amount):
+        self.saturation *= 1.0 - amount
+        return self._changed()
+
+    def load_cube(self, file_path):
+        self.cube = load_cube(file_path)
+        return self._changed()
+
+    def _changed(self):
+        self._lut = None
+        return self
+
+    def build(self):
+        self._lut = self.curve.astype(np.uint8).reshape(256, 1)
+        self._matrix = None
+        if self.saturation != 1.0:
+            self._matrix = (np.full((3, 3), (1.0 - self.saturation) / 3) + self.saturation * np.eye(3)).astype(np.float32)
+        self._cube_table = None
+        if self.cube is not None:
+            self._cube_table = self._bake_cube(self._matrix)
+            self._matrix = None
+        return self
+
+    def _bake_cube(self, matrix, chunk=16):
+        table, domain_min, domain_max = self.cube
+        size = table.shape[0]
+        levels = np.arange(256, dtype=np.float32)
+        positions = np.clip((levels[:, None] / 255.0 - domain_min) / (domain_max - domain_min), 0, 1) * (size - 1)
+        partial = _interpolate_axis(_interpolate_axis(table, positions[:, 0], 0), positions[:, 1], 1)
+        packed = np.zeros((256, 256, 256, 4), dtype=np.uint8)
+        # A chunk of red values at a time keeps the float temporaries small
+        for red in range(0, 256, chunk):
+            graded = _interpolate_axis(partial[red:red + chunk], positions[:, 2], 2)
+            packed[red:red + chunk, ..., :3] = np.rint(np.clip(graded, 0, 1) * 255)
+        packed = packed.view(np.uint32).ravel()
+        if matrix is None:
+            return packed
+        # Desaturation runs first, so each entry takes the graded value of its mixed colour
+        mixed = np.empty_like(packed)
+        for red in range(0, 256, chunk):
+            rgb = np.stack(np.meshgrid(levels[red:red + chunk], levels, levels, indexing='ij'), axis=-1)
+            index = np.rint(np.clip(rgb @ matrix.T, 0, 255)).astype(np.uint32)
+            mixed[red * 65536:(red + chunk) * 65536] = packed.take(((index[..., 0] << 16) | (index[..., 1] << 8) | index[..., 2]).ravel())
+        return mixed
+
+    def apply(self, frame):
+        if self._lut is None:
+            self.build()
+        graded = cv2.LUT(frame, self._lut)
+        if self._matrix is not None:
+            graded = cv2.transform(graded, self._matrix)
+        if self._cube_table is not None:
+            index = graded[..., 0].astype(np.uint32)
+            index <<= 8
+            index |= graded[..., 1]
+            index <<= 8
+            index |= graded[..., 2]
+            packed = self._cube_table.take(index)
+            graded = np.ascontiguousarray(packed.view(np.uint8).reshape(frame.shape[:2] + (4,))[..., :3])
+        return graded
+
+def default_color_engine(lut_path=None):
+    # The house grade: brighten, add contrast, gamma and pull saturation down by half
+    engine = ColorEngine().colorx(1.3).lum_contrast(0, 1.5, 128).gamma(1.2).desaturate(0.5)
+    if lut_path:
+        engine.load_cube(lut_path)
+    return engine.build()
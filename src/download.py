@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class HTTPTransport:
+    # Default transport: one pooled requests session shared by every connection
+    def __init__(self, pool_size=16, timeout=30):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = timeout
+
+    def probe(self, url):
+        # (size, supports_ranges); size is None when the server doesn't say
+        response = self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout)
+        try:
+            response.raise_for_status()
+            if response.status_code == 206 and "/" in response.headers.get("Content-Range", ""):
+                return int(response.headers["Content-Range"].rsplit("/", 1)[1]), True
+            length = response.headers.get("Content-Length")
+            return (int(length) if length else None), False
+        finally:
+            response.close()
+
+    def fetch(self, url, start=None, end=None, block_size=256 * 1024):
+        # Yields the body, or bytes start..end inclusive, in blocks
+        headers = {"Range": f"bytes={start}-{end}"} if start is not None else {}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if start is not None and response.status_code != 206:
+                raise IOError(f"Server ignored the range request for {url}")
+            yield from response.iter_content(block_size)
+
+class _Meter:
+    # Bytes received across all downloads, for progress and bandwidth reporting
+    def __init__(self, window=5.0):
+        self.window = window
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def add(self, byte_count):
+        now = time.monotonic()
+        with self.lock:
+            self.samples.append((now, byte_count))
+            while self.samples and self.samples[0][0] < now - self.window:
+                self.samples.pop(0)
+
+    def rate(self):
+        with self.lock:
+            if not self.samples:
+                return 0.0
+            span = max(time.monotonic() - self.samples[0][0], 1e-3)
+            return sum(count for _, count in self.samples) / span
+
+class DownloadManager:
+    # Downloads files as byte ranges over several connections at once. Each
+    # file is written to `<path>.part` with a `<path>.part.json` sidecar listing
+    # the finished chunks, so an interrupted download resumes where it stopped.
+    # max_connections is shared by every file in flight.
+    def __init__(self, max_connections=8, connections_per_file=4, chunk_size=4 * 1024 ** 2, transport=None,
+                 progress_callback=None, progress_interval=0.5):
+        self.max_connections = max_connections
+        self.connections_per_file = connections_per_file
+        self.chunk_size = chunk_size
+        self.transport = transport or HTTPTransport(pool_size=max_connections)
+        self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.connections = threading.BoundedSemaphore(max_connections)
+        self.meter = _Meter()
+
+    def bandwidth(self):
+        return self.meter.rate()
+
+    def _load_index(self, index_path, url, size):
+        try:
+            with open(index_path, 'r') as index_file:
+                index = json.load(index_file)
+            if index["url"] == url and index["size"] == size and index["chunk_size"] == self.chunk_size:
+                return index
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return {"url": url, "size": size, "chunk_size": self.chunk_size, "done": []}
+
+    def _save_index(self, index_path, index):
+        temp_path = f"{index_path}.tmp"
+        with open(temp_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, index_path)
+
+    def _report(self, url, state):
+        callback = state["callback"]
+        if not callback:
+            return
+        now = time.monotonic()
+        if now - state["reported"] >= self.progress_interval or state["downloaded"] == state["size"]:
+            state["reported"] = now
+            callback(url, state["downloaded"], state["size"], self.bandwidth())
+
+    def _fetch_chunk(self, url, part_path, chunk, state, index, index_path, lock):
+        start = chunk * self.chunk_size
+        end = min(start + self.chunk_size, state["size"]) - 1
+        with self.connections:
+            with open(part_path, 'r+b') as part_file:
+                part_file.seek(start)
+                for block in self.transport.fetch(url, start, end):
+                    part_file.write(block)
+                    self.meter.add(len(block))
+                    with lock:
+                        state["downloaded"] += len(block)
+                        self._report(url, state)
+        with lock:
+            index["done"].append(chunk)
+            self._save_index(index_path, index)
+
+    def _download_stream(self, url, path, size, callback):
+        # Servers without range support get a single, non-resumable stream
+        state = {"downloaded": 0, "size": size, "reported": 0.0, "callback": callback}
+        with self.connections, open(f"{path}.part", 'wb') as part_file:
+            for block in self.transport.fetch(url):
+                part_file.write(block)
+                self.meter.add(len(block))
+                state["downloaded"] += len(block)
+                self._report(url, state)
+        os.replace(f"{path}.part", path)
+        return path
+
+    def download(self, url, path, progress_callback=None):
+        # progress_callback(url, downloaded, total, bytes_per_second) overrides the manager's
+        callback = progress_callback or self.progress_callback
+        size, ranges = self.transport.probe(url)
+        if not ranges or not size:
+            return self._download_stream(url, path, size, callback)
+
+        part_path, index_path = f"{path}.part", f"{path}.part.json"
+        index = self._load_index(index_path, url, size)
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            index["done"] = []
+            with open(part_path, 'wb') as part_file:
+                part_file.truncate(size)
+        chunk_count = (size + self.chunk_size - 1) // self.chunk_size
+        done = set(index["done"])
+        missing = [chunk for chunk in range(chunk_count) if chunk not in done]
+        if len(missing) < chunk_count:
+            logging.info(f"Resuming {url}: {chunk_count - len(missing)} of {chunk_count} chunks already downloaded")
+
+        downloaded = size - sum(min(self.chunk_size, size - chunk * self.chunk_size) for chunk in missing)
+        state = {"downloaded": downloaded, "size": size, "reported": 0.0, "callback": callback}
+        lock = threading.Lock()
+        with ThreadPoolExecutor(min(self.connections_per_file, max(len(missing), 1))) as pool:
+            futures = [pool.submit(self._fetch_chunk, url, part_path, chunk, state, index, index_path, lock) for chunk in missing]
+            for future in futures:
+                future.result()
+
+        os.replace(part_path, path)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        logging.info(f"Downloaded {url} to {path} ({size} bytes)")
+        return path
+
+    def download_all(self, downloads, max_files=4, progress_callback=None):
+        # downloads: iterable of (url, path). Returns {url: path or the exception}
+        results = {}
+        with ThreadPoolExecutor(max_files) as pool:
+            futures = {pool.submit(self.download, url, path, progress_callback): url for url, path in downloads}
+            for future, url in futures.items():
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    logging.error(f"Error downloading {url}: {e}", exc_info=True)
+                    results[url] = e
+        return results
@@ -1,8 +1,10 @@
 import json
-from textblob import TextBlob
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
 import logging
+from .lazy import lazy_import
+
+TextBlob = lazy_import("textblob", "TextBlob")
+TfidfVectorizer = lazy_import("sklearn.feature_extraction.text", "TfidfVectorizer")
+KMeans = lazy_import("sklearn.cluster", "KMeans")
 
 def log_feedback(user_feedback):
     try:
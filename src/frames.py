@@ -0,0 +1,190 @@
+import os
+import cv2
+import time
+import queue
+import threading
+import logging
+from .tracing import tracer
+
+_END_OF_STREAM = None
+
+
+def capture_metadata(video):
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_rate = video.get(cv2.CAP_PROP_FPS)
+    return {
+        "frame_count": frame_count,
+        "frame_rate": frame_rate,
+        "duration": frame_count / frame_rate,
+        "resolution": (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))),
+        "bitrate": int(video.get(cv2.CAP_PROP_BITRATE)) if video.get(cv2.CAP_PROP_BITRATE) != 0 else None,
+        "codec": video.get(cv2.CAP_PROP_FOURCC)
+    }
+
+
+class SamplingPolicy:
+    # Chooses which decoded frames reach the analyzers: every `stride`-th frame,
+    # roughly `target_fps` frames per second, or only the stream's keyframes.
+    def __init__(self, stride=1, target_fps=None, keyframes_only=False):
+        self.stride = max(1, int(stride))
+        self.target_fps = target_fps
+        self.keyframes_only = keyframes_only
+
+    def frame_stride(self, frame_rate):
+        # Keyframe-only sampling lands here only when keyframes can't be listed,
+        # in which case it degrades to one frame per second.
+        target_fps = self.target_fps or (1 if self.keyframes_only else None)
+        if target_fps and frame_rate:
+            return max(1, int(round(frame_rate / target_fps)))
+        return self.stride
+
+
+def keyframe_indices(video_path):
+    # Reads packets without decoding them (CAP_PROP_FORMAT=-1) and asks FFmpeg
+    # whether each one is a keyframe. Returns None when the backend can't tell.
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+    video = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    try:
+        if not video.isOpened():
+            return None
+        indices = []
+        frame_id = 0
+        while video.grab():
+            if video.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                indices.append(frame_id)
+            frame_id += 1
+        return indices
+    finally:
+        video.release()
+
+
+def sampled_frame_ids(video_path, sampling=None):
+    sampling = sampling or SamplingPolicy()
+    if sampling.keyframes_only:
+        keyframes = keyframe_indices(video_path)
+        if keyframes is not None:
+            return keyframes
+    video = cv2.VideoCapture(video_path)
+    frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    frame_rate = video.get(cv2.CAP_PROP_FPS)
+    video.release()
+    return list(range(0, frame_count, sampling.frame_stride(frame_rate)))
+
+
+def iter_frames(video_path, sampling=None, start_frame=0, end_frame=None):
+    sampling = sampling or SamplingPolicy()
+    keyframes = keyframe_indices(video_path) if sampling.keyframes_only else None
+    if sampling.keyframes_only and keyframes is None:
+        logging.warning("Keyframe detection is not supported by this OpenCV build; sampling one frame per second instead.")
+
+    video = cv2.VideoCapture(video_path)
+    try:
+        frame_rate = video.get(cv2.CAP_PROP_FPS)
+        if start_frame:
+            video.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        if keyframes is not None:
+            position = start_frame
+            for frame_id in keyframes:
+                if frame_id < start_frame:
+                    continue
+                if end_frame is not None and frame_id >= end_frame:
+                    break
+                if frame_id != position:
+                    video.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+                ret, frame = video.read()
+                if not ret:
+                    break
+                position = frame_id + 1
+                yield frame_id, frame_id / frame_rate if frame_rate else 0.0, frame
+            return
+
+        stride = sampling.frame_stride(frame_rate)
+        frame_id = start_frame
+        # grab() every frame but only retrieve() the sampled ones, so skipped
+        # frames never pay for color conversion and the copy into Python.
+        while (end_frame is None or frame_id < end_frame) and video.grab():
+            if frame_id % stride == 0:
+                ret, frame = video.retrieve()
+                if not ret:
+                    break
+                yield frame_id, frame_id / frame_rate if frame_rate else 0.0, frame
+            frame_id += 1
+    finally:
+        video.release()
+
+
+# Decodes a video once and fans every frame out to the registered analyzers.
+# Each analyzer has its own bounded queue and thread, so a slow analyzer applies
+# backpressure to the decoder. Frames are shared and must not be modified in place.
+class FrameSource:
+    def __init__(self, video_path, queue_size=8, sampling=None, start_frame=0, end_frame=None):
+        self.video_path = video_path
+        self.queue_size = queue_size
+        self.sampling = sampling
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.analyzers = {}
+        self.metadata = {}
+
+    def register(self, name, analyzer):
+        self.analyzers[name] = analyzer
+        return analyzer
+
+    def run(self):
+        video = cv2.VideoCapture(self.video_path)
+        self.metadata = capture_metadata(video)
+        video.release()
+
+        failed = set()
+        queues = {name: queue.Queue(maxsize=self.queue_size) for name in self.analyzers}
+        # Analyzer spans are recorded by their threads, under the caller's span
+        parent = tracer.current()
+        threads = [
+            threading.Thread(target=self._consume, args=(name, self.analyzers[name], queues[name], failed, parent), daemon=True)
+            for name in self.analyzers
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            with tracer.span("decode", "analyzer", video=self.video_path) as span:
+                span.add("bytes_read", os.path.getsize(self.video_path) if os.path.isfile(self.video_path) else 0)
+                for item in iter_frames(self.video_path, self.sampling, self.start_frame, self.end_frame):
+                    span.add("frames")
+                    for frame_queue in queues.values():
+                        frame_queue.put(item)
+        finally:
+            for frame_queue in queues.values():
+                frame_queue.put(_END_OF_STREAM)
+            for thread in threads:
+                thread.join()
+
+        results = {}
+        for name, analyzer in self.analyzers.items():
+            if name in failed:
+                continue
+            try:
+                results[name] = analyzer.finish()
+            except Exception as e:
+                logging.error(f"Error finishing analyzer {name}: {e}", exc_info=True)
+        return results
+
+    def _consume(self, name, analyzer, frame_queue, failed, parent=None):
+        # The span covers the thread's lifetime; busy_seconds excludes waiting on the decoder
+        with tracer.span(name, "analyzer", parent=parent, video=self.video_path) as span:
+            while True:
+                item = frame_queue.get()
+                if item is _END_OF_STREAM:
+                    return
+                if name in failed:
+                    # Keep draining so the decoder never blocks on a dead consumer.
+                    continue
+                started = time.perf_counter()
+                try:
+                    analyzer.process(*item)
+                    span.add("frames")
+                except Exception as e:
+                    logging.error(f"Error in analyzer {name}: {e}", exc_info=True)
+                    failed.add(name)
+                span.add("busy_seconds", time.perf_counter() - started)
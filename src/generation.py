@@ -1,15 +1,23 @@
-from transformers import GPT2LMHeadModel, GPT2Tokenizer
 import cv2
-import moviepy.editor as mp
 import os
-from newspaper import Article
+import bisect
+import functools
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import logging
+from .lazy import lazy_import
+from .models import get_model
+from .frames import keyframe_indices
+from .utils import find_ffmpeg
 
-def generate_script(prompt, include_sources=False):
+torch = lazy_import("torch")
+mp = lazy_import("moviepy.editor")
+StoppingCriteriaList = lazy_import("transformers", "StoppingCriteriaList")
+Article = lazy_import("newspaper", "Article")
+
+def generate_script(prompt, include_sources=False, model_name="gpt2"):
     try:
-        model_name = "gpt2"
-        model = GPT2LMHeadModel.from_pretrained(model_name)
-        tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+        model, tokenizer = get_model(model_name)
         inputs = tokenizer.encode(prompt, return_tensors="pt")
         outputs = model.generate(inputs, max_length=1000, num_return_sequences=1, temperature=0.7)
         script = tokenizer.decode(outputs[0], skip_special_tokens=True)
@@ -23,6 +31,139 @@ def generate_script(prompt, include_sources=False):
         logging.error(f"Error generating script: {e}", exc_info=True)
         return ""
 
+class _StopSequences:
+    # Per-prompt stop strings; returns one flag per row so finished prompts stop
+    # while the rest of the batch keeps generating.
+    def __init__(self, tokenizer, prompt_length, stop_sequences):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_sequences = stop_sequences
+        self.done = [False] * len(stop_sequences)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        for row, stops in enumerate(self.stop_sequences):
+            if self.done[row] or not stops:
+                continue
+            text = self.tokenizer.decode(input_ids[row, self.prompt_length:], skip_special_tokens=True)
+            self.done[row] = any(stop in text for stop in stops)
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+class _BatchStreamer:
+    # Receives every generated token column from model.generate and forwards
+    # newly decoded text per prompt as callback(index, text). Streamed text is
+    # cut at the stop strings like the returned scripts; a tail that could be
+    # the start of one is held back until the next token decides it.
+    def __init__(self, tokenizer, callback, stop_criteria):
+        self.tokenizer = tokenizer
+        self.callback = callback
+        self.stop_criteria = stop_criteria
+        self.prompt_seen = False
+        self.tokens = None
+        self.emitted = None
+        self.finished = None
+
+    def put(self, value):
+        if not self.prompt_seen:
+            # The first call carries the (padded) prompts themselves
+            self.prompt_seen = True
+            self.tokens = [[] for _ in range(value.shape[0])]
+            self.emitted = [0] * value.shape[0]
+            self.finished = [False] * value.shape[0]
+            return
+        for row, token in enumerate(value.tolist()):
+            if self.finished[row]:
+                continue
+            if token == self.tokenizer.eos_token_id:
+                self._finish(row)
+                continue
+            self.tokens[row].append(token)
+            text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+            stops = self.stop_criteria.stop_sequences[row]
+            truncated = _truncate_at_stop(text, stops)
+            if truncated != text:
+                self._emit(row, truncated)
+                self.finished[row] = True
+                continue
+            self._emit(row, text[:len(text) - _partial_stop_length(text, stops)])
+
+    def _emit(self, row, text):
+        if len(text) > self.emitted[row]:
+            self.callback(row, text[self.emitted[row]:])
+            self.emitted[row] = len(text)
+
+    def _finish(self, row):
+        # No stop string came, so whatever was held back is part of the script
+        self._emit(row, self.tokenizer.decode(self.tokens[row], skip_special_tokens=True))
+        self.finished[row] = True
+
+    def end(self):
+        for row, finished in enumerate(self.finished or []):
+            if not finished:
+                self._finish(row)
+
+def _truncate_at_stop(text, stops):
+    positions = [text.find(stop) for stop in stops if stop in text]
+    return text[:min(positions)] if positions else text
+
+def _partial_stop_length(text, stops):
+    # Length of the longest ending of text that is the start of a stop string
+    return max((length for stop in stops for length in range(1, min(len(stop), len(text) + 1))
+                if text.endswith(stop[:length])), default=0)
+
+def generate_scripts(prompts, include_sources=False, model_name="gpt2", max_new_tokens=200, stop_sequences=None,
+                     stream_callback=None, temperature=0.7, do_sample=False):
+    # Generates all prompts in one padded model.generate call with the KV cache
+    # enabled. stop_sequences is a list of stop strings, or one list per prompt.
+    source_pool = None
+    try:
+        prompts = list(prompts)
+        if stop_sequences and isinstance(stop_sequences[0], str):
+            stop_sequences = [stop_sequences] * len(prompts)
+        stop_sequences = stop_sequences or [[] for _ in prompts]
+
+        sources = None
+        if include_sources:
+            # Article lookups are network-bound, so run them while the model generates
+            source_pool = ThreadPoolExecutor(max_workers=min(8, len(prompts)) or 1)
+            sources = source_pool.map(fetch_relevant_articles, prompts)
+
+        model, tokenizer = get_model(model_name)
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+        prompt_length = inputs["input_ids"].shape[1]
+        stop_criteria = _StopSequences(tokenizer, prompt_length, stop_sequences)
+        streamer = _BatchStreamer(tokenizer, stream_callback, stop_criteria) if stream_callback else None
+
+        with torch.inference_mode():
+            outputs = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=do_sample,
+                temperature=temperature if do_sample else None,
+                use_cache=True,
+                pad_token_id=tokenizer.pad_token_id,
+                stopping_criteria=StoppingCriteriaList([stop_criteria]),
+                streamer=streamer
+            )
+
+        scripts = []
+        for prompt, row, stops in zip(prompts, outputs, stop_sequences):
+            generated = tokenizer.decode(row[prompt_length:], skip_special_tokens=True)
+            scripts.append(prompt + _truncate_at_stop(generated, stops))
+
+        if sources is not None:
+            scripts = [f"{script}\n\nSources:\n{source}" for script, source in zip(scripts, sources)]
+        return scripts
+    except Exception as e:
+        logging.error(f"Error generating scripts: {e}", exc_info=True)
+        return [""] * len(prompts)
+    finally:
+        # Don't wait on lookups nobody will read when generation failed
+        if source_pool is not None:
+            source_pool.shutdown(wait=False, cancel_futures=True)
+
 def fetch_relevant_articles(topic):
     try:
         article = Article(f'https://www.google.com/search?q={topic.replace(" ", "+")}&tbm=nws')
@@ -33,37 +174,152 @@ def fetch_relevant_articles(topic):
         logging.error(f"Error fetching articles: {e}", exc_info=True)
         return "No sources available."
 
-def smart_clip_video(video_path, start_time, end_time, output_path, format="mp4"):
+@functools.lru_cache(maxsize=32)
+def _cached_keyframes(video_path, modified, size):
+    return keyframe_indices(video_path)
+
+def _keyframes(video_path):
+    # Listing keyframes demuxes the whole file, so it is done once per file version
+    stat = os.stat(video_path)
+    return _cached_keyframes(os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+
+def _frame_count(path):
+    video = cv2.VideoCapture(path)
+    count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    video.release()
+    return count
+
+def _stream_copy_clip(ffmpeg, video_path, start_frame, frame_count, fps, output_path):
+    # -t bounds the audio; -frames:v keeps the video to exactly frame_count
+    # frames, since a copied cut can otherwise run a frame or two long
+    command = [
+        ffmpeg, "-y", "-loglevel", "error", "-ss", f"{start_frame / fps:.6f}", "-i", video_path,
+        "-t", f"{frame_count / fps:.6f}", "-frames:v", str(frame_count), "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy", "-avoid_negative_ts", "make_zero", output_path
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+    if _frame_count(output_path) != frame_count:
+        raise ValueError(f"stream copy produced {_frame_count(output_path)} frames instead of {frame_count}")
+
+def _mux_source_audio(ffmpeg, video_only_path, video_path, start_frame, frame_count, fps, output_path):
+    # Re-encoded clips get the source's audio for the same range, copied like
+    # the stream-copy path does, so both paths produce the same streams
+    command = [
+        ffmpeg, "-y", "-loglevel", "error", "-i", video_only_path, "-ss", f"{start_frame / fps:.6f}",
+        "-t", f"{frame_count / fps:.6f}", "-i", video_path, "-map", "0:v:0", "-map", "1:a?", "-c", "copy", output_path
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+
+def clip_video_ranges(video_path, ranges, output_paths, format="mp4", stream_copy=True):
+    # Extracts several (start_time, end_time) ranges in one pass over the file.
+    # Ranges that start on a keyframe and end just before one (or at the end of
+    # the video) are remuxed without re-encoding; the rest are decoded from the
+    # nearest keyframe instead of from frame 0. With ffmpeg available both kinds
+    # keep the source's audio; without it neither does. Returns one entry per
+    # range: its output path, or None when nothing was written for it.
     try:
+        produced = set()
         video = cv2.VideoCapture(video_path)
         fps = video.get(cv2.CAP_PROP_FPS)
-        start_frame = int(start_time * fps)
-        end_frame = int(end_time * fps)
+        frame_count = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        size = (int(video.get(3)), int(video.get(4)))
+        ffmpeg = find_ffmpeg()
+        # None when the backend can't list keyframes: then nothing is stream-copied
+        keyframes = _keyframes(video_path) if ffmpeg and stream_copy else None
+        keyframe_set = set(keyframes or ())
+
+        jobs = []
+        for (start_time, end_time), output_path in zip(ranges, output_paths):
+            start_frame = int(start_time * fps)
+            end_frame = min(int(end_time * fps), frame_count - 1)
+            on_keyframes = start_frame in keyframe_set and (end_frame + 1 in keyframe_set or end_frame >= frame_count - 1)
+            if on_keyframes:
+                try:
+                    _stream_copy_clip(ffmpeg, video_path, start_frame, end_frame - start_frame + 1, fps, output_path)
+                    logging.info(f"Stream-copied frames {start_frame}-{end_frame} to {output_path}")
+                    produced.add(output_path)
+                    continue
+                except (subprocess.CalledProcessError, ValueError) as e:
+                    logging.warning(f"Stream copy failed for {output_path}, re-encoding instead: {getattr(e, 'stderr', None) or e}")
+            jobs.append((start_frame, end_frame, output_path))
 
         fourcc = cv2.VideoWriter_fourcc(*'XVID')
         if format == "mp4":
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (int(video.get(3)), int(video.get(4))))
 
-        current_frame = 0
-        while video.isOpened():
-            ret, frame = video.read()
-            if not ret or current_frame > end_frame:
+        def video_only_path(output_path):
+            root, extension = os.path.splitext(output_path)
+            return f"{root}.video{extension}" if ffmpeg else output_path
+
+        jobs.sort()
+        written = set()
+        pending = 0
+        active = []
+        position = 0
+        while pending < len(jobs) or active:
+            if not active:
+                start_frame = jobs[pending][0]
+                # Skip whole GOPs by seeking; within the current GOP decoding forward is cheaper
+                if keyframes is None:
+                    seek = start_frame > position
+                else:
+                    seek = keyframes[max(bisect.bisect_right(keyframes, start_frame) - 1, 0)] > position
+                if seek:
+                    video.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+                    position = start_frame
+            while pending < len(jobs) and jobs[pending][0] <= position:
+                start_frame, end_frame, output_path = jobs[pending]
+                active.append((end_frame, cv2.VideoWriter(video_only_path(output_path), fourcc, fps, size), output_path))
+                pending += 1
+
+            if active:
+                ret, frame = video.read()
+            else:
+                ret, frame = video.grab(), None
+            if not ret:
                 break
-            if start_frame <= current_frame <= end_frame:
+            for end_frame, out, output_path in active:
                 out.write(frame)
-            current_frame += 1
+                written.add(output_path)
+            for job in [job for job in active if job[0] <= position]:
+                job[1].release()
+                active.remove(job)
+            position += 1
 
+        for _, out, _ in active:
+            out.release()
         video.release()
-        out.release()
+
+        for start_frame, end_frame, output_path in jobs:
+            if output_path not in written:
+                # The range starts past the end of the video, or decoding stopped first
+                logging.error(f"No frames written for {output_path} (frames {start_frame}-{end_frame})")
+                if os.path.exists(video_only_path(output_path)):
+                    os.remove(video_only_path(output_path))
+                continue
+            if ffmpeg:
+                try:
+                    _mux_source_audio(ffmpeg, video_only_path(output_path), video_path, start_frame,
+                                      end_frame - start_frame + 1, fps, output_path)
+                    os.remove(video_only_path(output_path))
+                except subprocess.CalledProcessError as e:
+                    logging.warning(f"Could not add audio to {output_path}, keeping the video only: {e.stderr}")
+                    os.replace(video_only_path(output_path), output_path)
+            produced.add(output_path)
+        return [output_path if output_path in produced else None for output_path in output_paths]
     except Exception as e:
         logging.error(f"Error clipping video: {e}", exc_info=True)
+        return [None] * len(output_paths)
+
+def smart_clip_video(video_path, start_time, end_time, output_path, format="mp4", stream_copy=True):
+    return clip_video_ranges(video_path, [(start_time, end_time)], [output_path], format=format, stream_copy=stream_copy)[0]
 
 def auto_generate_video(title, sections, output_path, background_music_path=None):
     try:
         clips = []
-        for section in sections:
-            script = generate_script(f"{section} for a video titled {title}", include_sources=True)
+        prompts = [f"{section} for a video titled {title}" for section in sections]
+        scripts = generate_scripts(prompts, include_sources=True)
+        for section, script in zip(sections, scripts):
             logging.info(f"Generated Script for {section}: {script}")
 
             clip = mp.TextClip(script, fontsize=70, color='white', size=(1920, 1080))
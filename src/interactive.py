@@ -1,6 +1,8 @@
-import moviepy.editor as mp
 import os
 import logging
+from .lazy import lazy_import
+
+mp = lazy_import("moviepy.editor")
 
 def add_interactive_elements(input_video_path, output_video_path):
     try:
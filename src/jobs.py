@@ -0,0 +1,278 @@
+import os
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .state import StateStore, input_key
+from .tracing import tracer, file_bytes, run_traced, run_timed
+from .utils import load_yaml, require_output
+
+class StageFailed(Exception):
+    pass
+
+class Stage:
+    # One step of a job. `kind` picks the executor: "cpu" stages run in the
+    # process pool, "io" stages are awaited on the event loop (coroutine
+    # functions) or run in the thread pool. func(context) returns a dict of
+    # artifacts that is merged into the context of later stages, so for cpu
+    # stages both must be picklable. `inputs` names the context keys whose
+    # values (file paths by fingerprint) decide whether a checkpoint is reused.
+    def __init__(self, name, func, depends=(), kind="cpu", inputs=None):
+        if kind not in ("cpu", "io"):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.depends = tuple(depends)
+        self.kind = kind
+        self.inputs = tuple(inputs) if inputs is not None else None
+
+def analyze_stage(context):
+    from .analysis import analyze_video, SamplingPolicy
+    options = context.get("analysis", {})
+    analysis = analyze_video(context["video_path"], analyzers=("structure", "scenes"),
+                             analyzer_options={"structure": {"keep_frames": False}, "scenes": options.get("scenes", {})},
+                             sampling=SamplingPolicy(**options.get("sampling", {})))
+    if not analysis.get("metadata"):
+        raise StageFailed(f"Could not analyze {context['video_path']}")
+    return {"metadata": analysis["metadata"], "scene_changes": analysis.get("scenes", [])}
+
+def clip_stage(context):
+    from .generation import smart_clip_video
+    start_time, end_time = context.get("clip", (10, 20))
+    output_path = os.path.join(context["output_dir"], "clipped_video.mp4")
+    smart_clip_video(context["video_path"], start_time, end_time, output_path, format="mp4")
+    return {"clipped_video": require_output(output_path, StageFailed)}
+
+def color_stage(context):
+    from .postproduction import apply_color_correction
+    output_path = os.path.join(context["output_dir"], "color_video.mp4")
+    apply_color_correction(context["clipped_video"], output_path, lut_path=context.get("lut_path"))
+    return {"color_video": require_output(output_path, StageFailed)}
+
+def audio_stage(context):
+    from .postproduction import apply_audio_enhancement
+    output_path = os.path.join(context["output_dir"], "final_video.mp4")
+    apply_audio_enhancement(context["color_video"], output_path)
+    return {"final_video": require_output(output_path, StageFailed)}
+
+def teaser_stage(context):
+    from .optimization import generate_teasers
+    teasers = generate_teasers(context["final_video"], os.path.join(context["output_dir"], "teaser"),
+                               context.get("teaser_platforms", ["twitter", "instagram"]))
+    if not teasers:
+        raise StageFailed(f"No teasers generated for {context['final_video']}")
+    return {"teasers": teasers}
+
+def upload_stage(context):
+    from .cloud import Uploader, S3Backend, LocalBackend
+    upload = context.get("upload", {})
+    backend = LocalBackend(upload["local_root"]) if upload.get("local_root") else S3Backend(upload["bucket"], upload.get("region", "us-west-1"))
+    prefix = upload.get("prefix", context["name"])
+    files = [context["final_video"]] + list(context.get("teasers", {}).values())
+    results = Uploader(backend, concurrency=upload.get("concurrency", 8)).upload_files(
+        [(path, f"{prefix}/{os.path.basename(path)}") for path in files])
+    failed = [key for key, error in results.items() if error is not None]
+    if failed:
+        raise StageFailed(f"Failed to upload {failed}")
+    return {"uploaded": sorted(results)}
+
+DEFAULT_STAGES = [
+    Stage("analyze", analyze_stage, inputs=["video_path", "analysis"]),
+    Stage("clip", clip_stage, inputs=["video_path", "clip", "output_dir"]),
+    Stage("color", color_stage, depends=["clip"], inputs=["clipped_video", "lut_path"]),
+    Stage("audio", audio_stage, depends=["color"], inputs=["color_video"]),
+    Stage("teaser", teaser_stage, depends=["audio"], inputs=["final_video", "teaser_platforms"]),
+    Stage("upload", upload_stage, depends=["audio", "teaser"], kind="io", inputs=["final_video", "teasers", "upload"])
+]
+
+class StageStats:
+    def __init__(self):
+        self.completed = 0
+        self.cached = 0
+        self.failed = 0
+        self.skipped = 0
+        self.busy_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, started, ended, ok):
+        self.completed += ok
+        self.failed += not ok
+        self.busy_seconds += ended - started
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    def summary(self):
+        span = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        runs = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "cached": self.cached,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "mean_seconds": self.busy_seconds / runs if runs else 0.0,
+            "jobs_per_minute": 60 * self.completed / span if span else 0.0
+        }
+
+class JobRunner:
+    # Runs every job of a manifest through a DAG of stages. Up to
+    # max_active_jobs jobs are in flight; their CPU stages share one process
+    # pool and their I/O stages share the event loop and a thread pool, so one
+    # video's upload overlaps another's encode. With a StateStore, stages whose
+    # inputs are unchanged since a previous run are skipped.
+    def __init__(self, stages=None, cpu_workers=None, io_workers=8, max_active_jobs=None, state=None):
+        self.stages = {stage.name: stage for stage in (stages or DEFAULT_STAGES)}
+        for stage in self.stages.values():
+            missing = [name for name in stage.depends if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+        self.order = self._topological_order()
+        self.cpu_workers = cpu_workers or os.cpu_count() or 1
+        self.io_workers = io_workers
+        self.max_active_jobs = max_active_jobs or 2 * self.cpu_workers
+        self.state = state
+        self.stats = {name: StageStats() for name in self.order}
+
+    def _topological_order(self):
+        order, visiting = [], set()
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].depends:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+        for name in self.stages:
+            visit(name)
+        return order
+
+    async def _run_stage(self, stage, context, cpu_pool, io_pool, span):
+        # CPU time is measured where the stage runs and added to its span; spans
+        # recorded inside a worker process are merged into this process's tracer
+        loop = asyncio.get_running_loop()
+        if stage.kind == "cpu":
+            result, error, cpu_seconds, spans = await loop.run_in_executor(cpu_pool, run_traced, stage.func, context)
+            tracer.merge(spans)
+        elif asyncio.iscoroutinefunction(stage.func):
+            return await stage.func(context)
+        else:
+            result, error, cpu_seconds = await loop.run_in_executor(io_pool, run_timed, stage.func, context)
+        span.add_cpu(cpu_seconds)
+        if error is not None:
+            raise error
+        return result
+
+    async def _run_job(self, job, semaphore, cpu_pool, io_pool):
+        async with semaphore:
+            context = dict(job)
+            status = {}
+            done = {name: asyncio.Event() for name in self.order}
+
+            async def run(name):
+                stage = self.stages[name]
+                for dependency in stage.depends:
+                    await done[dependency].wait()
+                try:
+                    if any(status[dependency] not in ("completed", "cached") for dependency in stage.depends):
+                        status[name] = "skipped"
+                        self.stats[name].skipped += 1
+                        return
+                    inputs = {key: context.get(key) for key in stage.inputs} if stage.inputs is not None else context
+                    if self.state is not None:
+                        key = input_key(name, inputs)
+                        cached = self.state.lookup(job["name"], name, key)
+                        if cached is not None:
+                            context.update(cached)
+                            status[name] = "cached"
+                            self.stats[name].cached += 1
+                            logging.info(f"{job['name']}: {name} reused from the last run")
+                            return
+                    started = time.perf_counter()
+                    # The event loop thread is shared by every job, so its CPU time isn't the stage's
+                    with tracer.span(name, "stage", measure_cpu=False, job=job["name"]) as span:
+                        span.add("bytes_read", file_bytes(inputs))
+                        try:
+                            artifacts = await self._run_stage(stage, dict(context), cpu_pool, io_pool, span)
+                            context.update(artifacts or {})
+                            status[name] = "completed"
+                            span.add("bytes_written", file_bytes(artifacts or {}))
+                            if self.state is not None:
+                                self.state.record(job["name"], name, key, artifacts or {})
+                        except Exception as e:
+                            logging.error(f"Stage {name} failed for {job['name']}: {e}", exc_info=not isinstance(e, StageFailed))
+                            context.setdefault("errors", {})[name] = str(e)
+                            status[name] = "failed"
+                            span.error = str(e)
+                    self.stats[name].record(started, time.perf_counter(), status[name] == "completed")
+                    logging.info(f"{job['name']}: {name} {status[name]} in {time.perf_counter() - started:.1f}s")
+                finally:
+                    done[name].set()
+
+            await asyncio.gather(*(run(name) for name in self.order))
+            context["status"] = status
+            return context
+
+    async def run_async(self, jobs):
+        semaphore = asyncio.Semaphore(self.max_active_jobs)
+        # Spawned, not forked: this process already runs the event loop and the thread pool
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.cpu_workers, mp_context=context) as cpu_pool, ThreadPoolExecutor(self.io_workers) as io_pool:
+            return await asyncio.gather(*(self._run_job(job, semaphore, cpu_pool, io_pool) for job in jobs))
+
+    def run(self, jobs):
+        started = time.perf_counter()
+        results = asyncio.run(self.run_async(jobs))
+        logging.info(f"Ran {len(jobs)} jobs in {time.perf_counter() - started:.1f}s")
+        for name, summary in self.report().items():
+            logging.info(f"Stage {name}: {summary['completed']} completed, {summary['cached']} cached, {summary['failed']} failed, {summary['skipped']} skipped, "
+                         f"{summary['mean_seconds']:.1f}s mean, {summary['jobs_per_minute']:.1f} jobs/min")
+        return results
+
+    def report(self):
+        return {name: self.stats[name].summary() for name in self.order}
+
+def load_manifest(manifest_path, output_root="output"):
+    # Manifest: `defaults` shared by every job and a `videos` list of paths or
+    # mappings with at least `path`; each job writes into its own output_dir.
+    manifest = load_yaml(manifest_path)
+    if not manifest or not manifest.get("videos"):
+        raise ValueError(f"No videos listed in manifest {manifest_path}")
+    defaults = manifest.get("defaults", {})
+    jobs = []
+    for entry in manifest["videos"]:
+        entry = {"path": entry} if isinstance(entry, str) else entry
+        name = entry.get("name", os.path.splitext(os.path.basename(entry["path"]))[0])
+        job = {**defaults, **entry, "name": name, "video_path": entry["path"]}
+        job.setdefault("output_dir", os.path.join(manifest.get("output_root", output_root), name))
+        os.makedirs(job["output_dir"], exist_ok=True)
+        jobs.append(job)
+    return jobs
+
+def run_manifest(manifest_path, config=None, stages=None, resume=True):
+    try:
+        jobs_config = (config or {}).get("jobs", {})
+        jobs = load_manifest(manifest_path, jobs_config.get("output_root", "output"))
+        for job in jobs:
+            job.setdefault("analysis", (config or {}).get("analysis", {}))
+        selected = [stage for stage in DEFAULT_STAGES if stages is None or stage.name in stages]
+        # Dependencies on stages that were left out are dropped; their artifacts must come from the manifest
+        selected = [Stage(stage.name, stage.func, [name for name in stage.depends if stages is None or name in stages], stage.kind, stage.inputs)
+                    for stage in selected]
+        state = StateStore(**(config or {}).get("state", {}))
+        if not resume:
+            # Re-run every stage, but keep checkpointing so the next run can resume
+            for job in jobs:
+                state.invalidate(job["name"])
+        runner = JobRunner(selected, cpu_workers=jobs_config.get("cpu_workers"), io_workers=jobs_config.get("io_workers", 8),
+                           max_active_jobs=jobs_config.get("max_active_jobs"), state=state)
+        try:
+            return runner.run(jobs), runner.report()
+        finally:
+            state.close()
+    except Exception as e:
+        logging.error(f"Error running manifest {manifest_path}: {e}", exc_info=True)
+        return [], {}
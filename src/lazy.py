@@ -0,0 +1,76 @@
+import re
+import sys
+import time
+import logging
+import importlib
+import threading
+import subprocess
+
+# Seconds spent importing each lazily loaded module, in load order
+IMPORT_TIMES = {}
+_lock = threading.RLock()
+
+class LazyModule:
+    # Stands in for a module (or one attribute of it) until first use; the real
+    # import happens on the first attribute access or call.
+    def __init__(self, name, attribute=None, package=None):
+        self._name = name
+        self._attribute = attribute
+        self._package = package
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            with _lock:
+                if self._target is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name, self._package)
+                    full_name = module.__name__
+                    if full_name not in IMPORT_TIMES:
+                        IMPORT_TIMES[full_name] = time.perf_counter() - started
+                        logging.debug(f"Imported {full_name} on first use in {IMPORT_TIMES[full_name]:.2f}s")
+                    self._target = getattr(module, self._attribute) if self._attribute else module
+        return self._target
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        target = f"{self._name}.{self._attribute}" if self._attribute else self._name
+        return f"<lazy {target} ({'loaded' if self._target is not None else 'not loaded'})>"
+
+def lazy_import(name, attribute=None, package=None):
+    # lazy_import("mediapipe") for `import mediapipe`, lazy_import("deepface", "DeepFace")
+    # for `from deepface import DeepFace`; relative names need `package`
+    return LazyModule(name, attribute, package)
+
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+def profile_imports(module="src.main", top=20):
+    # Imports `module` in a fresh interpreter under -X importtime. Returns the
+    # total and the `top` most expensive packages, subpackages and project modules
+    # as (name, self_seconds, cumulative_seconds).
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    project = module.split(".")[0] + "."
+    entries = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if not indent:
+            total += int(cumulative_us) / 1e6
+        if name.count(".") <= 1 or name.startswith(project):
+            entries.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    entries.sort(key=lambda entry: entry[2], reverse=True)
+    return total, entries[:top]
+
+def format_import_profile(total, entries):
+    lines = [f"Startup import time: {total:.2f}s", f"{'module':<40} {'self':>8} {'cumulative':>11}"]
+    for name, self_s, cumulative in entries:
+        lines.append(f"{name:<40} {self_s:>7.3f}s {cumulative:>10.3f}s")
+    return "\n".join(lines)
@@ -1,14 +1,25 @@
 import logging
 import os
-from .analysis import extract_video_metadata, analyze_structural_elements, detect_scene_changes, generate_formula
+import argparse
+from .analysis import analyze_video, analyze_video_parallel, generate_formula, SamplingPolicy, ANALYSIS_VERSION
+from .cache import AnalysisCache
+from .models import registry as model_registry
 from .generation import generate_script, smart_clip_video, auto_generate_video, dynamic_music_generation
-from .postproduction import apply_color_correction, apply_audio_enhancement, add_transitions_to_video
+from .postproduction import RenderGraph
 from .cloud import upload_to_s3
 from .interactive import add_interactive_elements
 from .optimization import optimize_seo, generate_teasers
 from .reuse import manage_asset_library
-from .auth import authenticate_user
-from .utils import load_yaml
+from .jobs import run_manifest
+from .state import StateStore
+from .lazy import lazy_import, profile_imports, format_import_profile
+from .tracing import tracer, file_bytes
+from .utils import load_yaml, require_output
+
+# Heavy backends (MediaPipe, DeepFace, transformers, torch, moviepy, sklearn,
+# boto3) are imported on first use by the modules above, so subcommands only
+# pay for what they touch
+authenticate_user = lazy_import(".auth", "authenticate_user", __package__)
 
 # Configure logging with more detailed logging levels and output to file
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s',
@@ -17,80 +28,168 @@ logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %
 # Load configuration settings
 config = load_yaml('config/config.yaml')
 
-def main():
+def _run_stage(state, job, stage, inputs, compute):
+    # A checkpointed stage under a tracing span; bytes count the files named in its inputs and outputs
+    with tracer.span(stage, job=job) as span:
+        span.add("bytes_read", file_bytes(inputs))
+        outputs = state.run_stage(job, stage, inputs, compute)
+        span.add("bytes_written", file_bytes(outputs))
+        return outputs
+
+def main(resume=True):
     try:
         # User Authentication
         if not authenticate_user(config['user_credentials']):
             logging.error("Authentication failed. Exiting.")
             return
 
+        # Load the script generation model in the background while the video is analyzed
+        model_registry.max_loaded = config.get('models', {}).get('max_loaded', model_registry.max_loaded)
+        model_registry.warm_up(config.get('models', {}).get('warm_up', ["gpt2"]), background=True)
+
         video_path = "sample_video.mp4"
-        logging.info("Starting video metadata extraction.")
-        metadata = extract_video_metadata(video_path)
+        # Decode the video once and share the frames between all analyzers
+        logging.info("Starting shared video analysis.")
+        analysis_config = config.get('analysis', {})
+        sampling = SamplingPolicy(**analysis_config.get('sampling', {}))
+        analyzers = ("structure", "scenes", "faces")
+        analyzer_options = {"structure": {"keep_frames": False}, "scenes": analysis_config.get('scenes', {})}
+
+        def run_analysis():
+            if analysis_config.get('workers', 1) > 1:
+                return analyze_video_parallel(video_path, analyzers, analyzer_options=analyzer_options, sampling=sampling,
+                                              workers=analysis_config['workers'])
+            return analyze_video(video_path, analyzers, analyzer_options=analyzer_options, sampling=sampling)
+
+        # Reuse earlier results for the same video and analyzer settings
+        cache = AnalysisCache(**config.get('cache', {}))
+        with tracer.span("analysis", job=video_path) as span:
+            span.add("bytes_read", file_bytes(video_path))
+            analysis = cache.get_or_compute(video_path, "shared_analysis", run_analysis,
+                                            params={"analyzer_options": analyzer_options, "sampling": sampling},
+                                            model_version=ANALYSIS_VERSION,
+                                            # A failed analyzer is dropped from the results; only cache complete ones
+                                            complete=lambda result: all(name in result for name in analyzers))
+            span.add("frames", len(analysis.get("structure", [])))
+        logging.debug(f"Analysis cache stats: {cache.stats()}")
+        metadata = analysis.get("metadata", {})
         logging.info(f"Metadata extracted: {metadata}")
-
-        logging.info("Starting structural element analysis.")
-        frames = analyze_structural_elements(video_path)
+        frames = analysis.get("structure", [])
         logging.debug(f"Number of frames analyzed: {len(frames)}")
-
-        logging.info("Detecting scene changes.")
-        scenes = detect_scene_changes(video_path)
+        scenes = analysis.get("scenes", [])
         logging.debug(f"Number of scene changes detected: {len(scenes)}")
 
         logging.info("Generating channel formula.")
-        formula = generate_formula("My YouTube Channel")
+        with tracer.span("formula", job=video_path):
+            formula = generate_formula("My YouTube Channel", detected_faces=analysis.get("faces", []))
         logging.debug(f"Generated formula: {formula}")
 
         logging.info("Generating script.")
-        script = generate_script("Introduction to AI in video editing", include_sources=True)
+        with tracer.span("script", job=video_path):
+            script = generate_script("Introduction to AI in video editing", include_sources=True)
         logging.debug(f"Generated script: {script}")
 
+        # Stages below are checkpointed: on a re-run, a stage whose inputs and
+        # output files are unchanged is skipped instead of re-encoded
+        state = StateStore(**config.get('state', {}))
+        if not resume:
+            state.invalidate(video_path)
+
+        def clip():
+            smart_clip_video(video_path, 10, 20, "clipped_video.mp4", format="mp4")
+            return {"clipped_video": require_output("clipped_video.mp4")}
+
         logging.info("Creating smart clip.")
-        smart_clip_video(video_path, 10, 20, "clipped_video.mp4", format="mp4")
+        clipped = _run_stage(state, video_path, "clip", {"video": video_path, "range": [10, 20]}, clip)
         logging.info("Smart clip created.")
 
-        logging.info("Applying color correction.")
-        apply_color_correction("clipped_video.mp4", "final_video.mp4")
-        logging.info("Color correction applied.")
+        def postproduction():
+            # Color, audio and transitions are fused into a single decode/encode pass
+            RenderGraph(clipped["clipped_video"]).color_correction().audio_enhancement().transitions("crossfade", 1.0).render("final_video.mp4")
+            return {"final_video": require_output("final_video.mp4")}
+
+        logging.info("Rendering postproduction.")
+        _run_stage(state, video_path, "postproduction", clipped, postproduction)
+        logging.info("Postproduction rendered.")
 
-        logging.info("Enhancing audio.")
-        apply_audio_enhancement("final_video.mp4", "enhanced_audio_video.mp4")
-        logging.info("Audio enhancement applied.")
+        sections = ["Introduction", "AI Basics", "Advanced AI Techniques"]
 
-        logging.info("Adding transitions.")
-        add_transitions_to_video(["final_video.mp4"], "transitions_applied.mp4", transition_type="crossfade", duration=1.0)
-        logging.info("Transitions applied.")
+        def auto_generate():
+            auto_generate_video("Introduction to AI", sections, "auto_generated_video.mp4", background_music_path="background_music.mp3")
+            return {"auto_generated_video": require_output("auto_generated_video.mp4")}
 
         logging.info("Auto-generating video.")
-        auto_generate_video("Introduction to AI", ["Introduction", "AI Basics", "Advanced AI Techniques"], "auto_generated_video.mp4", background_music_path="background_music.mp3")
+        generated = _run_stage(state, video_path, "auto_generate", {"topic": "Introduction to AI", "sections": sections, "music": "background_music.mp3"}, auto_generate)
         logging.info("Auto-generated video created.")
 
         logging.info("Generating dynamic music track.")
-        dynamic_music_generation("auto_generated_video.mp4", "music_track.mp3")
+        with tracer.span("music", job=video_path):
+            dynamic_music_generation(generated["auto_generated_video"], "music_track.mp3")
         logging.info("Dynamic music track generated.")
 
+        def interactive():
+            add_interactive_elements(generated["auto_generated_video"], "interactive_video.mp4")
+            return {"interactive_video": require_output("interactive_video.mp4")}
+
         logging.info("Adding interactive elements.")
-        add_interactive_elements("auto_generated_video.mp4", "interactive_video.mp4")
+        interactive_video = _run_stage(state, video_path, "interactive", generated, interactive)["interactive_video"]
         logging.info("Interactive elements added.")
 
+        def upload():
+            if not upload_to_s3(interactive_video, "my-video-bucket", "interactive_video.mp4", region_name=config['aws_region']):
+                raise RuntimeError("Upload to S3 failed")
+            return {"bucket": "my-video-bucket", "key": "interactive_video.mp4"}
+
         logging.info("Uploading video to S3.")
-        upload_to_s3("interactive_video.mp4", "my-video-bucket", "interactive_video.mp4", region_name=config['aws_region'])
+        _run_stage(state, video_path, "upload", {"video": interactive_video, "bucket": "my-video-bucket"}, upload)
         logging.info("Uploaded video to S3.")
 
         logging.info("Optimizing SEO for video.")
-        optimize_seo("interactive_video.mp4", "Optimized Title", "Description", ["tag1", "tag2"])
+        with tracer.span("seo", job=video_path):
+            optimize_seo("interactive_video.mp4", "Optimized Title", "Description", ["tag1", "tag2"])
         logging.info("SEO optimized.")
 
         logging.info("Generating social media teaser.")
-        generate_teasers("interactive_video.mp4", "teaser_video.mp4")
+        with tracer.span("teaser", job=video_path) as span:
+            span.add("bytes_read", file_bytes("interactive_video.mp4"))
+            span.add("bytes_written", file_bytes(generate_teasers("interactive_video.mp4", "teaser_video.mp4")))
         logging.info("Social media teaser generated.")
 
         logging.info("Managing asset library.")
-        manage_asset_library("assets/")
+        with tracer.span("asset_library", job=video_path):
+            manage_asset_library("assets/")
         logging.info("Asset library managed.")
 
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
 
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="YouTube video tool")
+    parser.add_argument("--manifest", help="YAML manifest of videos to run through the batch pipeline")
+    parser.add_argument("--stages", nargs="+", help="Only run these pipeline stages (with --manifest)")
+    parser.add_argument("--no-resume", action="store_true", help="Re-run every stage instead of reusing checkpointed outputs")
+    parser.add_argument("--profile-startup", action="store_true", help="Report import time per module and exit")
+    parser.add_argument("--trace", help="Write a Chrome trace (chrome://tracing, Perfetto) of the run to this path")
+    parser.add_argument("--metrics-port", type=int, help="Serve per-stage metrics in Prometheus text format on this port")
+    args = parser.parse_args(argv)
+    if args.profile_startup:
+        print(format_import_profile(*profile_imports("src.main")))
+        return
+    tracing_config = config.get('tracing', {})
+    metrics_port = args.metrics_port or tracing_config.get('metrics_port')
+    server = tracer.serve_metrics(metrics_port, tracing_config.get('metrics_host', "127.0.0.1")) if metrics_port else None
+    try:
+        if args.manifest:
+            run_manifest(args.manifest, config, stages=args.stages, resume=not args.no_resume)
+        else:
+            main(resume=not args.no_resume)
+    finally:
+        logging.info(f"Time per stage:\n{tracer.format_summary()}")
+        trace_path = args.trace or tracing_config.get('chrome_trace')
+        if trace_path:
+            tracer.write_chrome_trace(trace_path)
+        if server is not None:
+            server.shutdown()
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,87 @@
+import gc
+import time
+import logging
+import threading
+from collections import OrderedDict
+from .lazy import lazy_import
+from .tracing import tracer
+
+GPT2LMHeadModel = lazy_import("transformers", "GPT2LMHeadModel")
+GPT2Tokenizer = lazy_import("transformers", "GPT2Tokenizer")
+
+def load_gpt2(model_name="gpt2", use_safetensors=True):
+    # safetensors weights are memory-mapped instead of unpickled into fresh
+    # buffers; fall back to the regular checkpoint when a model doesn't ship them.
+    try:
+        model = GPT2LMHeadModel.from_pretrained(model_name, use_safetensors=use_safetensors, low_cpu_mem_usage=True)
+    except OSError:
+        if not use_safetensors:
+            raise
+        logging.warning(f"No safetensors weights for {model_name}; loading the default checkpoint.")
+        model = GPT2LMHeadModel.from_pretrained(model_name, low_cpu_mem_usage=True)
+    model.eval()
+    tokenizer = GPT2Tokenizer.from_pretrained(model_name)
+    return model, tokenizer
+
+class ModelRegistry:
+    # Process-wide cache of loaded models. Models load lazily on first use, or
+    # up front through warm_up(); past max_loaded the least recently used one
+    # is dropped.
+    def __init__(self, max_loaded=2):
+        self.max_loaded = max_loaded
+        self.loaders = {}
+        self.loaded = OrderedDict()
+        self.load_times = {}
+        self.lock = threading.RLock()
+
+    def register(self, name, loader):
+        with self.lock:
+            self.loaders[name] = loader
+
+    def get(self, name):
+        with self.lock:
+            if name in self.loaded:
+                self.loaded.move_to_end(name)
+                return self.loaded[name]
+            if name not in self.loaders:
+                raise KeyError(f"No model registered as {name}")
+            started = time.perf_counter()
+            with tracer.span(name, "model_load") as span:
+                model = self.loaders[name]()
+                self.load_times[name] = time.perf_counter() - started
+                span.add("model_load_seconds", self.load_times[name])
+                # Charged to the stage that needed the model as well
+                if span.parent is not None:
+                    span.parent.add("model_load_seconds", self.load_times[name])
+            logging.info(f"Loaded model {name} in {self.load_times[name]:.2f}s")
+            self.loaded[name] = model
+            while len(self.loaded) > self.max_loaded:
+                self.evict(next(iter(self.loaded)))
+            return model
+
+    def evict(self, name):
+        with self.lock:
+            if self.loaded.pop(name, None) is not None:
+                gc.collect()
+                logging.info(f"Evicted model {name}")
+
+    def warm_up(self, names=None, background=False):
+        names = list(names or self.loaders)
+        if background:
+            thread = threading.Thread(target=self.warm_up, args=(names,), daemon=True)
+            thread.start()
+            return thread
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logging.error(f"Error warming up model {name}: {e}", exc_info=True)
+
+registry = ModelRegistry()
+registry.register("gpt2", lambda: load_gpt2("gpt2"))
+
+def get_model(name):
+    return registry.get(name)
+
+def warm_up(names=None, background=False):
+    return registry.warm_up(names, background)
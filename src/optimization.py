@@ -1,7 +1,24 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-import moviepy.editor as mp
+import cv2
+import shutil
 import logging
+import subprocess
+from .lazy import lazy_import
+from .utils import find_ffmpeg
+
+TfidfVectorizer = lazy_import("sklearn.feature_extraction.text", "TfidfVectorizer")
+LogisticRegression = lazy_import("sklearn.linear_model", "LogisticRegression")
+
+# Output profile per platform: aspect ratio of the centre crop, output size and
+# bitrates. Platforms with identical profiles share a single encode.
+PLATFORM_PROFILES = {
+    "twitter": {"aspect": (16, 9), "size": (1280, 720), "video_bitrate": "5000k", "audio_bitrate": "128k"},
+    "youtube": {"aspect": (16, 9), "size": (1920, 1080), "video_bitrate": "8000k", "audio_bitrate": "192k"},
+    "facebook": {"aspect": (16, 9), "size": (1280, 720), "video_bitrate": "5000k", "audio_bitrate": "128k"},
+    "linkedin": {"aspect": (16, 9), "size": (1280, 720), "video_bitrate": "5000k", "audio_bitrate": "128k"},
+    "instagram": {"aspect": (9, 16), "size": (1080, 1920), "video_bitrate": "3500k", "audio_bitrate": "128k"},
+    "tiktok": {"aspect": (9, 16), "size": (1080, 1920), "video_bitrate": "3500k", "audio_bitrate": "128k"},
+    "youtube_shorts": {"aspect": (9, 16), "size": (1080, 1920), "video_bitrate": "3500k", "audio_bitrate": "128k"}
+}
 
 def optimize_seo(video_path, title, description, tags):
     try:
@@ -18,19 +35,67 @@ def optimize_seo(video_path, title, description, tags):
     except Exception as e:
         logging.error(f"Error optimizing SEO: {e}", exc_info=True)
 
-def generate_teasers(input_video_path, teaser_output_path, platforms=["twitter", "instagram"]):
+def _profile_key(profile):
+    return (tuple(profile["aspect"]), tuple(profile["size"]), profile["video_bitrate"], profile["audio_bitrate"])
+
+def _crop_size(resolution, aspect):
+    # Largest centred crop of the source with the target aspect ratio, in even pixels
+    width, height = resolution
+    aspect_width, aspect_height = aspect
+    crop_width = min(width, height * aspect_width // aspect_height)
+    crop_height = min(height, width * aspect_height // aspect_width)
+    return crop_width - crop_width % 2, crop_height - crop_height % 2
+
+def fan_out_command(ffmpeg, input_path, resolution, outputs, start=0, duration=10):
+    # One decode of the input, split into a crop/scale branch per output; every
+    # branch is encoded by the same ffmpeg process, in parallel
+    filters = [f"[0:v]split={len(outputs)}" + "".join(f"[v{index}]" for index in range(len(outputs)))]
+    for index, (profile, _) in enumerate(outputs):
+        crop_width, crop_height = _crop_size(resolution, profile["aspect"])
+        width, height = profile["size"]
+        filters.append(f"[v{index}]crop={crop_width}:{crop_height},scale={width}:{height},setsar=1[out{index}]")
+    command = [ffmpeg, "-y", "-loglevel", "error", "-ss", str(start), "-t", str(duration), "-i", input_path,
+               "-filter_complex", ";".join(filters)]
+    for index, (profile, output_path) in enumerate(outputs):
+        command += ["-map", f"[out{index}]", "-map", "0:a?", "-c:v", "libx264", "-b:v", profile["video_bitrate"],
+                    "-c:a", "aac", "-b:a", profile["audio_bitrate"], output_path]
+    return command
+
+def generate_teasers(input_video_path, teaser_output_path, platforms=["twitter", "instagram"], profiles=None,
+                     start=0, duration=10):
     try:
-        video = mp.VideoFileClip(input_video_path)
-        teaser = video.subclip(0, 10)
+        profiles = {**PLATFORM_PROFILES, **(profiles or {})}
+        ffmpeg = find_ffmpeg()
+        video = cv2.VideoCapture(input_video_path)
+        resolution = (int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        video.release()
 
+        encodes = {}
         for platform in platforms:
-            teaser_path = f"{teaser_output_path}_{platform}.mp4"
-            teaser.write_videofile(teaser_path, codec="libx264")
-            logging.info(f"Generated teaser for {platform}: {teaser_path}")
+            if platform not in profiles:
+                logging.warning(f"No teaser profile for {platform}; using the youtube profile")
+                profiles[platform] = profiles["youtube"]
+            encodes.setdefault(_profile_key(profiles[platform]), []).append(platform)
+        outputs = [(profiles[shared[0]], f"{teaser_output_path}_{shared[0]}.mp4") for shared in encodes.values()]
+        subprocess.run(fan_out_command(ffmpeg, input_video_path, resolution, outputs, start, duration),
+                       check=True, capture_output=True)
+        logging.info(f"Encoded {len(outputs)} teaser profiles for {len(platforms)} platforms in one pass")
 
-            generate_social_media_post(platform, teaser_path)
+        teaser_paths = {}
+        for shared in encodes.values():
+            encoded_path = f"{teaser_output_path}_{shared[0]}.mp4"
+            for platform in shared:
+                teaser_path = f"{teaser_output_path}_{platform}.mp4"
+                if teaser_path != encoded_path:
+                    shutil.copyfile(encoded_path, teaser_path)
+                teaser_paths[platform] = teaser_path
+        for platform in platforms:
+            logging.info(f"Generated teaser for {platform}: {teaser_paths[platform]}")
+            generate_social_media_post(platform, teaser_paths[platform])
+        return teaser_paths
     except Exception as e:
         logging.error(f"Error generating teasers: {e}", exc_info=True)
+        return {}
 
 def generate_social_media_post(platform, video_path):
     try:
@@ -1,26 +1,87 @@
-import moviepy.editor as mp
 import numpy as np
 import logging
+import os
+from .lazy import lazy_import
+from .color import default_color_engine
+from .audio import enhance_audio
 
-def apply_color_correction(input_video_path, output_video_path):
+mp = lazy_import("moviepy.editor")
+
+def color_correction_fx(clip, engine=None, lut_path=None):
+    # The whole grade (curves, desaturation, optional .cube LUT) runs as one
+    # table lookup per frame instead of a chain of per-pixel float effects
+    engine = engine or default_color_engine(lut_path)
+    return clip.fl_image(engine.apply)
+
+def transition_fx(clip, transition_type="crossfade", duration=1.0):
+    if transition_type == "crossfade":
+        return clip.fx(mp.vfx.fadein, duration).fx(mp.vfx.fadeout, duration)
+    elif transition_type == "slide":
+        return mp.CompositeVideoClip([clip.fx(mp.transitions.slide_in, duration, "left")])
+    return clip
+
+class RenderGraph:
+    # Postproduction steps are declared as nodes and only run in render(): the
+    # input is decoded once, every node's effect is chained onto the same lazy
+    # clip, and the result is encoded once. Intermediate files are written only
+    # for nodes given a materialize_path. Audio enhancement streams the rendered
+    # soundtrack afterwards and remuxes it without touching the video stream.
+    def __init__(self, input_path):
+        self.input_path = input_path
+        self.nodes = []
+        self.audio_options = None
+
+    def add(self, name, effect, materialize_path=None):
+        self.nodes.append((name, effect, materialize_path))
+        return self
+
+    def color_correction(self, lut_path=None, materialize_path=None):
+        return self.add("color_correction", lambda clip: color_correction_fx(clip, lut_path=lut_path), materialize_path)
+
+    def audio_enhancement(self, **options):
+        self.audio_options = options
+        return self
+
+    def transitions(self, transition_type="crossfade", duration=1.0, materialize_path=None):
+        return self.add("transitions", lambda clip: transition_fx(clip, transition_type, duration), materialize_path)
+
+    def render(self, output_path, codec="libx264", **write_options):
+        video = None
+        try:
+            video = mp.VideoFileClip(self.input_path)
+            clip = video
+            for name, effect, materialize_path in self.nodes:
+                clip = effect(clip)
+                if materialize_path:
+                    logging.info(f"Materializing {name} output to {materialize_path}")
+                    clip.write_videofile(materialize_path, codec=codec, **write_options)
+            if self.audio_options is not None and clip.audio is not None:
+                # Keep the soundtrack lossless (PCM in Matroska) until enhance_audio
+                # does the one and only AAC encode
+                video_path = f"{output_path}.video.mkv"
+                clip.write_videofile(video_path, codec=codec, **{**write_options, "audio_codec": "pcm_s16le"})
+                enhance_audio(video_path, output_path, **self.audio_options)
+                os.remove(video_path)
+            else:
+                clip.write_videofile(output_path, codec=codec, **write_options)
+            logging.info(f"Rendered {len(self.nodes)} postproduction steps in a single pass to {output_path}")
+        except Exception as e:
+            logging.error(f"Error rendering postproduction graph: {e}", exc_info=True)
+        finally:
+            if video is not None:
+                video.close()
+
+def apply_color_correction(input_video_path, output_video_path, lut_path=None):
     try:
         video = mp.VideoFileClip(input_video_path)
-        corrected_video = video.fx(mp.vfx.colorx, 1.3)
-        corrected_video = corrected_video.fx(mp.vfx.lum_contrast, 0, 1.5, 128)
-        corrected_video = corrected_video.fx(mp.vfx.gamma_corr, 1.2)
-        corrected_video = corrected_video.fx(mp.vfx.blackwhite, 0.5)
+        corrected_video = color_correction_fx(video, lut_path=lut_path)
         corrected_video.write_videofile(output_video_path, codec="libx264")
     except Exception as e:
         logging.error(f"Error applying color correction: {e}", exc_info=True)
 
-def apply_audio_enhancement(input_video_path, output_video_path):
+def apply_audio_enhancement(input_video_path, output_video_path, **options):
     try:
-        video = mp.VideoFileClip(input_video_path)
-        audio = video.audio.fx(mp.audio.fx.all.audio_normalize)
-        audio = audio.volumex(1.2)
-        audio = audio.fx(mp.audio.fx.all.audio_low_pass_filter, frequency=1000)
-        final_video = video.set_audio(audio)
-        final_video.write_videofile(output_video_path, codec="libx264")
+        enhance_audio(input_video_path, output_video_path, **options)
     except Exception as e:
         logging.error(f"Error enhancing audio: {e}", exc_info=True)
 
@@ -1,8 +1,10 @@
 import os
 import json
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
 import logging
+from .lazy import lazy_import
+
+TfidfVectorizer = lazy_import("sklearn.feature_extraction.text", "TfidfVectorizer")
+KMeans = lazy_import("sklearn.cluster", "KMeans")
 
 
 def manage_asset_library(asset_dir):
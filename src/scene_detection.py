@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+import logging
+
+# Lower bound on the per-frame distance that can count as a cut, per backend.
+# The adaptive threshold only ever raises it.
+DEFAULT_MIN_THRESHOLDS = {
+    "histogram": 0.2,
+    "block": 0.04,
+    "flow": 1.5
+}
+
+def histogram_features(hsv_frames, bins=(16, 4, 4)):
+    # Joint HSV histograms for a whole (N, H, W, 3) window with one bincount
+    h_bins, s_bins, v_bins = bins
+    count = hsv_frames.shape[0]
+    hsv = hsv_frames.reshape(count, -1, 3).astype(np.int32)
+    index = ((hsv[..., 0] * h_bins // 180) * s_bins + hsv[..., 1] * s_bins // 256) * v_bins + hsv[..., 2] * v_bins // 256
+    index += (np.arange(count, dtype=np.int32) * (h_bins * s_bins * v_bins))[:, None]
+    histograms = np.bincount(index.ravel(), minlength=count * h_bins * s_bins * v_bins)
+    return histograms.reshape(count, -1).astype(np.float32) / hsv.shape[1]
+
+def histogram_distances(features):
+    # Total variation distance between consecutive histograms, in [0, 1]
+    return 0.5 * np.abs(np.diff(features, axis=0)).sum(axis=1)
+
+def block_features(gray_frames, grid=(4, 4)):
+    count, height, width = gray_frames.shape
+    rows, cols = grid
+    height, width = height - height % rows, width - width % cols
+    blocks = gray_frames[:, :height, :width].reshape(count, rows, height // rows, cols, width // cols)
+    return blocks.mean(axis=(2, 4), dtype=np.float32).reshape(count, -1) / 255.0
+
+def block_distances(features):
+    return np.abs(np.diff(features, axis=0)).mean(axis=1)
+
+def adaptive_threshold(distances, min_threshold, sensitivity):
+    # Median + k * MAD: ordinary motion sets the baseline, cuts are the outliers
+    if len(distances) == 0:
+        return min_threshold
+    median = np.median(distances)
+    mad = 1.4826 * np.median(np.abs(distances - median))
+    return max(min_threshold, float(median + sensitivity * mad))
+
+class SceneDetector:
+    # Buffers small downscaled frames and scores a whole window at a time with
+    # NumPy. `history` distances from earlier windows feed the adaptive threshold.
+    def __init__(self, backend="histogram", window=32, min_threshold=None, sensitivity=4.0, history=256,
+                 min_scene_length=0, downscale=(64, 36)):
+        if backend not in DEFAULT_MIN_THRESHOLDS:
+            raise ValueError(f"Unknown scene detection backend: {backend}")
+        self.backend = backend
+        self.window = window
+        self.min_threshold = DEFAULT_MIN_THRESHOLDS[backend] if min_threshold is None else min_threshold
+        self.sensitivity = sensitivity
+        self.history = history
+        self.min_scene_length = min_scene_length
+        self.downscale = downscale
+        self.optical_flow = cv2.DISOpticalFlow_create(cv2.DISOPTICAL_FLOW_PRESET_ULTRAFAST) if backend == "flow" else None
+        self.frame_ids = []
+        self.frames = []
+        self.previous = None
+        self.recent_distances = np.zeros(0, dtype=np.float32)
+        self.last_cut = None
+        self.scene_changes = []
+
+    def push(self, frame_id, frame):
+        small = cv2.resize(frame, self.downscale, interpolation=cv2.INTER_AREA)
+        code = cv2.COLOR_BGR2HSV if self.backend == "histogram" else cv2.COLOR_BGR2GRAY
+        self.frame_ids.append(frame_id)
+        self.frames.append(cv2.cvtColor(small, code))
+        if len(self.frames) >= self.window:
+            return self._score_window()
+        return []
+
+    def flush(self):
+        return self._score_window() if self.frames else []
+
+    def _distances(self, frames):
+        if self.backend == "histogram":
+            return histogram_distances(histogram_features(frames))
+        if self.backend == "block":
+            return block_distances(block_features(frames))
+        magnitudes = []
+        for previous, current in zip(frames[:-1], frames[1:]):
+            flow = self.optical_flow.calc(previous, current, None)
+            magnitudes.append(np.sqrt((flow ** 2).sum(axis=2)).mean())
+        return np.asarray(magnitudes, dtype=np.float32)
+
+    def _score_window(self):
+        frame_ids = self.frame_ids
+        frames = self.frames if self.previous is None else [self.previous] + self.frames
+        distances = self._distances(np.stack(frames))
+        # Without a previous frame the window's first frame has nothing to compare to
+        scored_ids = frame_ids if self.previous is not None else frame_ids[1:]
+
+        threshold = adaptive_threshold(np.concatenate([self.recent_distances, distances]), self.min_threshold, self.sensitivity)
+        cuts = []
+        for frame_id, distance in zip(scored_ids, distances):
+            if distance <= threshold:
+                continue
+            if self.last_cut is not None and frame_id - self.last_cut < self.min_scene_length:
+                continue
+            cuts.append(frame_id)
+            self.last_cut = frame_id
+
+        self.recent_distances = np.concatenate([self.recent_distances, distances])[-self.history:]
+        self.previous = self.frames[-1]
+        self.frame_ids = []
+        self.frames = []
+        self.scene_changes.extend(cuts)
+        return cuts
+
+def detect_cuts(frames, backend="histogram", **options):
+    # Convenience wrapper over an iterable of (frame_id, frame) pairs
+    try:
+        detector = SceneDetector(backend, **options)
+        for frame_id, frame in frames:
+            detector.push(frame_id, frame)
+        detector.flush()
+        return detector.scene_changes
+    except Exception as e:
+        logging.error(f"Error detecting cuts: {e}", exc_info=True)
+        return []
@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from .cache import file_fingerprint
+
+def _fingerprint_value(value):
+    # Paths to existing files are replaced by their fingerprint, so a stage's
+    # key changes when an input file is rewritten even if its name doesn't
+    if isinstance(value, str) and os.path.isfile(value):
+        return {"file": value, "fingerprint": file_fingerprint(value)}
+    if isinstance(value, dict):
+        return {key: _fingerprint_value(item) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_fingerprint_value(item) for item in value]
+    return value
+
+def input_key(stage, inputs):
+    payload = json.dumps({"stage": stage, "inputs": _fingerprint_value(inputs)}, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _artifact_paths(outputs):
+    if isinstance(outputs, str):
+        return [outputs] if os.path.isfile(outputs) else []
+    if isinstance(outputs, dict):
+        outputs = list(outputs.values())
+    if isinstance(outputs, (list, tuple)):
+        return [path for item in outputs for path in _artifact_paths(item)]
+    return []
+
+class StateStore:
+    # Per-stage checkpoints in SQLite. A stage is recorded with a key over its
+    # inputs (file inputs by fingerprint) and its outputs; files among the
+    # outputs are tracked as artifacts. A later run with the same key reuses
+    # the outputs as long as every artifact is still on disk, unmodified.
+    def __init__(self, db_path=".cache/state.db"):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS stages (
+                job TEXT, stage TEXT, input_key TEXT, outputs TEXT, finished_at REAL, PRIMARY KEY (job, stage))""")
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY, job TEXT, stage TEXT, fingerprint TEXT, created_at REAL)""")
+
+    def lookup(self, job, stage, key):
+        with self.lock:
+            row = self.connection.execute("SELECT input_key, outputs FROM stages WHERE job = ? AND stage = ?", (job, stage)).fetchone()
+            if row is None or row[0] != key:
+                return None
+            artifacts = self.connection.execute("SELECT path, fingerprint FROM artifacts WHERE job = ? AND stage = ?", (job, stage)).fetchall()
+        for path, fingerprint in artifacts:
+            if not os.path.isfile(path) or file_fingerprint(path) != fingerprint:
+                logging.info(f"Artifact {path} of {job}/{stage} is missing or changed; re-running the stage")
+                return None
+        return json.loads(row[1])
+
+    def record(self, job, stage, key, outputs):
+        now = time.time()
+        artifacts = [(path, job, stage, file_fingerprint(path), now) for path in _artifact_paths(outputs)]
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)", (job, stage, key, json.dumps(outputs), now))
+            self.connection.execute("DELETE FROM artifacts WHERE job = ? AND stage = ?", (job, stage))
+            self.connection.executemany("INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?)", artifacts)
+
+    def invalidate(self, job, stage=None):
+        with self.lock, self.connection:
+            if stage is None:
+                self.connection.execute("DELETE FROM stages WHERE job = ?", (job,))
+                self.connection.execute("DELETE FROM artifacts WHERE job = ?", (job,))
+            else:
+                self.connection.execute("DELETE FROM stages WHERE job = ? AND stage = ?", (job, stage))
+                self.connection.execute("DELETE FROM artifacts WHERE job = ? AND stage = ?", (job, stage))
+
+    def artifacts(self, job=None):
+        with self.lock:
+            if job is None:
+                rows = self.connection.execute("SELECT path, job, stage FROM artifacts ORDER BY created_at").fetchall()
+            else:
+                rows = self.connection.execute("SELECT path, job, stage FROM artifacts WHERE job = ? ORDER BY created_at", (job,)).fetchall()
+        return [{"path": path, "job": job_name, "stage": stage} for path, job_name, stage in rows]
+
+    def run_stage(self, job, stage, inputs, compute):
+        # Returns the recorded outputs when the inputs are unchanged, otherwise
+        # runs compute() and records what it returns
+        key = input_key(stage, inputs)
+        outputs = self.lookup(job, stage, key)
+        if outputs is not None:
+            logging.info(f"Skipping {job}/{stage}: inputs unchanged since the last run")
+            return outputs
+        outputs = compute()
+        self.record(job, stage, key, outputs)
+        return outputs
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import logging
+import itertools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# Counters every span exports, even when zero; spans may add others
+COUNTERS = ("frames", "bytes_read", "bytes_written", "model_load_seconds")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+
+def file_bytes(value):
+    # Total size of the existing files named anywhere in a path, list or dict of them
+    if isinstance(value, str):
+        return os.path.getsize(value) if os.path.isfile(value) else 0
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(file_bytes(item) for item in value)
+    return 0
+
+class Span:
+    # One timed piece of work. Wall time runs from creation to finish(); CPU
+    # time is the creating thread's, plus whatever add_cpu() reports for work
+    # done elsewhere (a worker process, a pool thread).
+    def __init__(self, name, category, attributes=None, parent=None, measure_cpu=True):
+        self.id = f"{os.getpid()}-{next(_span_ids)}"
+        self.name = name
+        self.category = category
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.counters = {}
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.thread_name = threading.current_thread().name
+        self.start = time.time()
+        self.duration = None
+        self.cpu_seconds = 0.0
+        self.error = None
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time() if measure_cpu else None
+
+    def add(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def add_cpu(self, seconds):
+        self.cpu_seconds += seconds
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+        if self._cpu_started is not None:
+            self.cpu_seconds += time.thread_time() - self._cpu_started
+
+    def to_dict(self):
+        return {
+            "id": self.id, "name": self.name, "category": self.category, "attributes": self.attributes,
+            "parent": self.parent.id if self.parent is not None else None, "counters": self.counters,
+            "pid": self.pid, "tid": self.tid, "thread_name": self.thread_name, "start": self.start,
+            "duration": self.duration, "cpu_seconds": self.cpu_seconds, "error": self.error
+        }
+
+class Tracer:
+    # Collects finished spans in this process. Totals per (category, name) are
+    # kept for the metrics export; the spans themselves, for the Chrome trace,
+    # are capped at max_spans with the oldest dropped first.
+    def __init__(self, max_spans=100000):
+        self.spans = deque(maxlen=max_spans)
+        self.totals = {}
+        self.captures = []
+        self.lock = threading.Lock()
+
+    def current(self):
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name, category="stage", parent=None, measure_cpu=True, **attributes):
+        # Nests under the enclosing span of this thread or task unless `parent` is
+        # given, which is how threads started inside a span attach to it
+        span = Span(name, category, attributes, parent or _current_span.get(), measure_cpu)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            self.add(span.to_dict())
+
+    def add(self, span):
+        # Records a finished span, given as a dict
+        with self.lock:
+            self.spans.append(span)
+            for capture in self.captures:
+                capture.append(span)
+            totals = self.totals.setdefault((span["category"], span["name"]), {"count": 0, "errors": 0, "seconds": 0.0,
+                                                                              "cpu_seconds": 0.0, **dict.fromkeys(COUNTERS, 0)})
+            totals["count"] += 1
+            totals["errors"] += span["error"] is not None
+            totals["seconds"] += span["duration"]
+            totals["cpu_seconds"] += span["cpu_seconds"]
+            for counter, value in span["counters"].items():
+                totals[counter] = totals.get(counter, 0) + value
+
+    def merge(self, spans):
+        for span in spans:
+            self.add(span)
+
+    @contextmanager
+    def capture(self):
+        # Collects the spans finished in this process while the block runs
+        captured = []
+        with self.lock:
+            self.captures.append(captured)
+        try:
+            yield captured
+        finally:
+            with self.lock:
+                self.captures.remove(captured)
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+            self.totals.clear()
+
+    def metrics(self):
+        with self.lock:
+            return {key: dict(totals) for key, totals in self.totals.items()}
+
+    def format_summary(self, category="stage"):
+        # Spans of one category by total wall time, with their share of it
+        rows = sorted(((name, totals) for (span_category, name), totals in self.metrics().items() if span_category == category),
+                      key=lambda row: row[1]["seconds"], reverse=True)
+        total = sum(totals["seconds"] for _, totals in rows) or 1.0
+        lines = [f"{'name':<24} {'runs':>5} {'wall':>9} {'cpu':>9} {'share':>6}"]
+        for name, totals in rows:
+            lines.append(f"{name:<24} {totals['count']:>5} {totals['seconds']:>8.2f}s {totals['cpu_seconds']:>8.2f}s {totals['seconds'] / total:>6.1%}")
+        return "\n".join(lines)
+
+    def prometheus_text(self, prefix="pipeline_span"):
+        # Prometheus text exposition format, one counter family per measure
+        metrics = self.metrics()
+        measures = ["count", "errors", "seconds", "cpu_seconds"]
+        measures += sorted({counter for totals in metrics.values() for counter in totals} - set(measures))
+        lines = []
+        for measure in measures:
+            family = f"{prefix}_{measure}_total"
+            lines.append(f"# TYPE {family} counter")
+            for (category, name), totals in sorted(metrics.items()):
+                if measure in totals:
+                    labels = f'category="{_escape_label(category)}",name="{_escape_label(name)}"'
+                    lines.append(f"{family}{{{labels}}} {totals[measure]}")
+        return "\n".join(lines) + "\n"
+
+    def chrome_trace(self):
+        # Trace Event Format, as loaded by chrome://tracing and Perfetto
+        with self.lock:
+            spans = list(self.spans)
+        events = []
+        threads = {}
+        for span in spans:
+            threads[(span["pid"], span["tid"])] = span["thread_name"]
+            args = {**span["attributes"], **span["counters"], "cpu_seconds": span["cpu_seconds"]}
+            if span["error"] is not None:
+                args["error"] = span["error"]
+            events.append({"name": span["name"], "cat": span["category"], "ph": "X", "ts": span["start"] * 1e6,
+                           "dur": span["duration"] * 1e6, "pid": span["pid"], "tid": span["tid"],
+                           "args": {key: value if isinstance(value, (int, float, bool)) else str(value) for key, value in args.items()}})
+        for (pid, tid), thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as trace_file:
+                json.dump(self.chrome_trace(), trace_file)
+            logging.info(f"Wrote Chrome trace to {path}")
+        except Exception as e:
+            logging.error(f"Error writing Chrome trace: {e}", exc_info=True)
+
+    def serve_metrics(self, port=9464, host="127.0.0.1"):
+        # Serves prometheus_text() at /metrics from a daemon thread; call
+        # shutdown() on the returned server to stop it
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Metrics request: {format % args}")
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        logging.info(f"Serving pipeline metrics at http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Process-wide tracer used by the pipeline
+tracer = Tracer()
+
+def span(name, category="stage", **attributes):
+    return tracer.span(name, category, **attributes)
+
+def run_traced(func, *args, **kwargs):
+    # For work submitted to a process pool. Returns (result, error, cpu_seconds,
+    # spans) instead of raising, so the spans recorded in the worker can be
+    # merged into the parent's tracer whether or not the call succeeded.
+    started = time.process_time()
+    with tracer.capture() as spans:
+        try:
+            result, error = func(*args, **kwargs), None
+        except Exception as e:
+            result, error = None, e
+    return result, error, time.process_time() - started, spans
+
+def run_timed(func, *args, **kwargs):
+    # For work submitted to a thread pool: (result, error, cpu_seconds) of the pool thread
+    started = time.thread_time()
+    try:
+        result, error = func(*args, **kwargs), None
+    except Exception as e:
+        result, error = None, e
+    return result, error, time.thread_time() - started
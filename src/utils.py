@@ -60,3 +60,21 @@ def copy_files(src_directory, dest_directory, extensions=None):
             shutil.copy(file, dest_directory)
     except Exception as e:
         logging.error(f"Error copying files: {e}", exc_info=True)
+
+def require_output(path, error=RuntimeError):
+    # Pipeline functions log and swallow their own errors, so a missing or empty
+    # output file is how a failure shows up; raise before anything consumes it
+    if not os.path.isfile(path) or not os.path.getsize(path):
+        raise error(f"Expected output {path} was not produced")
+    return path
+
+def find_ffmpeg():
+    # Prefer a system ffmpeg, then the binary bundled with moviepy's imageio-ffmpeg
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
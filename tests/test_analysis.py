@@ -1,4 +1,5 @@
 import unittest
+from types import SimpleNamespace
 from src import analysis
 
 class TestAnalysis(unittest.TestCase):
@@ -11,10 +12,47 @@ class TestAnalysis(unittest.TestCase):
         frames = analysis.analyze_structural_elements("sample_video.mp4")
         self.assertTrue(len(frames) > 0)
 
+    def test_iter_structural_elements(self):
+        records = list(analysis.iter_structural_elements("sample_video.mp4", thumbnail_size=(64, 36)))
+        self.assertTrue(len(records) > 0)
+        self.assertNotIn("frame", records[0])
+        self.assertEqual(records[0]["thumbnail"].shape, (36, 64, 3))
+
+    def test_structural_elements_to_columns(self):
+        box = SimpleNamespace(xmin=0.1, ymin=0.2, width=0.3, height=0.4)
+        face = SimpleNamespace(location_data=SimpleNamespace(relative_bounding_box=box), score=[0.9])
+        landmarks = [SimpleNamespace(x=0.5, y=0.5), SimpleNamespace(x=0.7, y=0.9)]
+        cup = SimpleNamespace(landmarks_2d=SimpleNamespace(landmark=landmarks))
+        records = [
+            {"frame_id": 0, "face_detections": [face], "object_detections": []},
+            {"frame_id": 1, "face_detections": [], "object_detections": [cup]}
+        ]
+        columns = analysis.structural_elements_to_columns(records)
+        self.assertEqual(columns["frame_id"].tolist(), [0, 1])
+        self.assertEqual(columns["kind"].tolist(), [0, 1])
+        self.assertEqual(columns["bbox"].shape, (2, 4))
+        self.assertAlmostEqual(float(columns["bbox"][1][3]), 0.4, places=5)
+        self.assertAlmostEqual(float(columns["score"][0]), 0.9, places=5)
+
+    def test_failed_segment_is_not_merged(self):
+        original = analysis.analyze_video
+        analysis.analyze_video = lambda *args, **kwargs: {"metadata": {}, "structure": []}
+        try:
+            with self.assertRaises(RuntimeError):
+                analysis._analyze_segment("sample_video.mp4", ("structure", "faces"), None, None, 0, 0, 10)
+        finally:
+            analysis.analyze_video = original
+
     def test_detect_scene_changes(self):
         scenes = analysis.detect_scene_changes("sample_video.mp4")
         self.assertTrue(len(scenes) > 0)
 
+    def test_perform_face_recognition(self):
+        faces = analysis.perform_face_recognition("sample_video.mp4")
+        for record in faces:
+            self.assertIn("frame_id", record)
+            self.assertTrue(len(record["faces"]) > 0)
+
     def test_generate_formula(self):
         formula = analysis.generate_formula("My Channel")
         self.assertIn("channel_name", formula)
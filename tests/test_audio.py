@@ -0,0 +1,56 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+import numpy as np
+from scipy import signal
+from src import audio
+from src.utils import find_ffmpeg
+
+def write_test_video(path, duration=2):
+    # Test pattern with a 440 Hz tone plus a 5 kHz tone the low-pass should remove
+    subprocess.run([find_ffmpeg(), "-y", "-loglevel", "error",
+                    "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=25:duration={duration}",
+                    "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                    "-f", "lavfi", "-i", f"sine=frequency=5000:duration={duration}",
+                    "-filter_complex", "[1:a][2:a]amix=inputs=2[a]", "-map", "0:v", "-map", "[a]",
+                    "-c:v", "mpeg4", "-c:a", "aac", path], check=True)
+
+class TestAudio(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.tmp_dir, "input.mp4")
+        write_test_video(self.video_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_block_filter_matches_single_pass(self):
+        samples = np.random.default_rng(0).standard_normal((10000, 2)).astype(np.float32)
+        block_filter = audio.BlockFilter(44100, cutoff=1000, channels=2)
+        blocks = [block_filter.process(samples[start:start + 999]) for start in range(0, len(samples), 999)]
+        expected = signal.sosfilt(block_filter.sos, samples, axis=0)
+        np.testing.assert_allclose(np.concatenate(blocks), expected, atol=1e-5)
+
+    def test_iter_audio_blocks(self):
+        blocks = list(audio.iter_audio_blocks(self.video_path, sample_rate=8000, channels=1, block_size=1000))
+        self.assertTrue(all(block.shape[1] == 1 for block in blocks))
+        self.assertAlmostEqual(sum(len(block) for block in blocks) / 8000, 2.0, delta=0.1)
+
+    def test_enhance_audio_copies_video(self):
+        output_path = os.path.join(self.tmp_dir, "output.mp4")
+        audio.enhance_audio(self.video_path, output_path, volume=1.0, target_peak=0.5)
+        self.assertTrue(os.path.exists(output_path))
+        levels = audio.measure_levels(output_path, cutoff=None)
+        self.assertAlmostEqual(levels["peak"], 0.5, delta=0.1)
+        # The 5 kHz component is filtered out
+        samples = np.concatenate(list(audio.iter_audio_blocks(output_path, channels=1)))[:, 0]
+        spectrum = np.abs(np.fft.rfft(samples))
+        frequencies = np.fft.rfftfreq(len(samples), 1 / 44100)
+        low = spectrum[np.argmin(np.abs(frequencies - 440))]
+        high = spectrum[np.argmin(np.abs(frequencies - 5000))]
+        self.assertLess(high, low / 100)
+
+if __name__ == "__main__":
+    unittest.main()
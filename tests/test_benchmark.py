@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+import cv2
+from scripts import benchmark
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_synthesize_video(self):
+        path = benchmark.synthesize_video(os.path.join(self.work_dir, "input.mp4"), 160, 90, duration=1, fps=12)
+        video = cv2.VideoCapture(path)
+        self.assertEqual(int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), 160)
+        self.assertEqual(int(video.get(cv2.CAP_PROP_FRAME_COUNT)), 12)
+        video.release()
+        self.assertEqual(os.listdir(self.work_dir), ["input.mp4"])
+
+    def test_run_and_compare(self):
+        path = benchmark.synthesize_video(os.path.join(self.work_dir, "input.mp4"), 160, 90, duration=1, fps=12)
+        report = benchmark.run_benchmarks(path, ["extract_video_metadata"], repeat=2, isolate=False)
+        result = report["results"]["extract_video_metadata"]
+        self.assertEqual(len(result["runs"]), 2)
+        self.assertEqual(result["frames"], 12)
+        self.assertGreater(result["fps"], 0)
+        self.assertIn("alloc_peak_mb", result)
+
+        baseline = {"video": report["video"], "results": {"extract_video_metadata": dict(result, seconds=result["seconds"] / 2)}}
+        rows, regressions = benchmark.compare(report, baseline, threshold=0.5)
+        self.assertEqual(regressions, ["extract_video_metadata"])
+        self.assertAlmostEqual(rows[0][3], 1.0)
+        self.assertIn("extract_video_metadata", benchmark.format_report(report, rows))
+
+    def test_failed_call_is_an_error(self):
+        # The pipeline functions swallow their errors; an empty result must not be timed
+        video = {"width": 160, "height": 90, "fps": 12, "frames": 12, "duration": 1.0}
+        report_video = os.path.join(self.work_dir, "missing.mp4")
+        with self.assertRaises(RuntimeError):
+            benchmark.measure("extract_video_metadata", report_video, video, repeat=1)
+
+    def test_dead_child_is_reported(self):
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(target=os._exit, args=(3,))
+        process.start()
+        result = benchmark._wait_for_result(queue, process, poll_interval=0.1)
+        process.join()
+        self.assertIn("code 3", result["error"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import cv2
+import numpy as np
+from src import analysis, cache
+
+class TestAnalysisCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.tmp_dir, "video.mp4")
+        with open(self.video_path, 'wb') as f:
+            f.write(os.urandom(4096))
+        self.cache = cache.AnalysisCache(os.path.join(self.tmp_dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_or_compute_hits_after_first_run(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"scenes": [1, 5, 9]}
+
+        first = self.cache.get_or_compute(self.video_path, "scenes", compute, params={"threshold": 0.5})
+        second = self.cache.get_or_compute(self.video_path, "scenes", compute, params={"threshold": 0.5})
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    def test_partial_analysis_is_not_cached(self):
+        video_path = os.path.join(self.tmp_dir, "frames.mp4")
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (32, 24))
+        for index in range(5):
+            writer.write(np.full((24, 32, 3), index * 40, dtype=np.uint8))
+        writer.release()
+
+        class Counter:
+            def __init__(self):
+                self.frames = 0
+            def process(self, frame_id, timestamp, frame):
+                self.frames += 1
+            def finish(self):
+                return [self.frames]
+
+        class Failing(Counter):
+            def process(self, frame_id, timestamp, frame):
+                raise RuntimeError("analyzer failed")
+
+        analyzers = ("scenes", "faces")
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return analysis.analyze_video(video_path, analyzers)
+
+        def get():
+            return self.cache.get_or_compute(video_path, "shared_analysis", compute,
+                                             complete=lambda result: all(name in result for name in analyzers))
+
+        with mock.patch.dict(analysis.ANALYZERS, {"scenes": Counter, "faces": Failing}):
+            first = get()
+            self.assertIn("scenes", first)
+            self.assertNotIn("faces", first)
+            get()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+        with mock.patch.dict(analysis.ANALYZERS, {"scenes": Counter, "faces": Counter}):
+            self.assertIn("faces", get())
+            get()
+        self.assertEqual(len(calls), 3)
+
+    def test_key_depends_on_params_and_content(self):
+        key = self.cache.key(self.video_path, "scenes", {"threshold": 0.5}, "v1")
+        self.assertNotEqual(key, self.cache.key(self.video_path, "scenes", {"threshold": 0.6}, "v1"))
+        self.assertNotEqual(key, self.cache.key(self.video_path, "scenes", {"threshold": 0.5}, "v2"))
+        with open(self.video_path, 'ab') as f:
+            f.write(b"more")
+        self.assertNotEqual(key, self.cache.key(self.video_path, "scenes", {"threshold": 0.5}, "v1"))
+
+    def test_evicts_least_recently_used(self):
+        small_cache = cache.AnalysisCache(os.path.join(self.tmp_dir, "small"), max_bytes=3000)
+        small_cache.put("aa01", os.urandom(1200))
+        small_cache.put("aa02", os.urandom(1200))
+        small_cache.get("aa01")
+        small_cache.put("aa03", os.urandom(1200))
+        self.assertTrue(small_cache.get("aa01")[0])
+        self.assertFalse(small_cache.get("aa02")[0])
+        self.assertEqual(small_cache.evictions, 1)
@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src import cloud
+
+MiB = 1024 ** 2
+
+class FailingBackend(cloud.LocalBackend):
+    # Fails every upload of one part number, like a dropped connection
+    def __init__(self, root, fail_part=None):
+        super().__init__(root)
+        self.fail_part = fail_part
+        self.uploaded_parts = []
+
+    def upload_part(self, key, upload_id, part_number, data):
+        if part_number == self.fail_part:
+            raise ConnectionError("connection reset")
+        self.uploaded_parts.append(part_number)
+        return super().upload_part(key, upload_id, part_number, data)
+
+class TestCloud(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_dir = os.path.join(self.tmp_dir, "checkpoints")
+        self.bucket_dir = os.path.join(self.tmp_dir, "bucket")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_file(self, name, size):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as file:
+            file.write(os.urandom(size))
+        return path
+
+    def read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_part_size_for(self):
+        self.assertEqual(cloud.part_size_for(10 * MiB), cloud.MIN_PART_SIZE)
+        part_size = cloud.part_size_for(200 * 1024 ** 3)
+        self.assertLessEqual(200 * 1024 ** 3 / part_size, cloud.MAX_PARTS)
+        self.assertEqual(part_size % MiB, 0)
+
+    def test_upload_files(self):
+        small = self.write_file("small.bin", 1000)
+        large = self.write_file("large.bin", 5 * MiB + 123)
+        uploader = cloud.Uploader(cloud.LocalBackend(self.bucket_dir), checkpoint_dir=self.checkpoint_dir, min_part_size=MiB)
+        results = uploader.upload_files([(small, "videos/small.bin"), (large, "videos/large.bin")])
+        self.assertEqual(results, {"videos/small.bin": None, "videos/large.bin": None})
+        self.assertEqual(self.read(os.path.join(self.bucket_dir, "videos/small.bin")), self.read(small))
+        self.assertEqual(self.read(os.path.join(self.bucket_dir, "videos/large.bin")), self.read(large))
+        self.assertEqual(os.listdir(self.checkpoint_dir), [])
+
+    def test_resume_interrupted_upload(self):
+        large = self.write_file("large.bin", 5 * MiB)
+        backend = FailingBackend(self.bucket_dir, fail_part=4)
+        uploader = cloud.Uploader(backend, concurrency=1, checkpoint_dir=self.checkpoint_dir, min_part_size=MiB)
+        with self.assertRaises(ConnectionError):
+            uploader.upload_file(large, "large.bin")
+        self.assertEqual(len(os.listdir(self.checkpoint_dir)), 1)
+
+        backend.fail_part = None
+        backend.uploaded_parts = []
+        uploader.upload_file(large, "large.bin")
+        # Only the parts missing after the failure are sent again
+        self.assertNotIn(1, backend.uploaded_parts)
+        self.assertIn(4, backend.uploaded_parts)
+        self.assertEqual(self.read(os.path.join(self.bucket_dir, "large.bin")), self.read(large))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from src import color
+
+def write_cube(path, size, transform):
+    with open(path, 'w') as cube_file:
+        cube_file.write(f"LUT_3D_SIZE {size}\n")
+        # Red changes fastest
+        for b in range(size):
+            for g in range(size):
+                for r in range(size):
+                    rgb = transform(np.array([r, g, b], dtype=np.float32) / (size - 1))
+                    cube_file.write(" ".join(f"{value:.6f}" for value in rgb) + "\n")
+
+class TestColor(unittest.TestCase):
+    def setUp(self):
+        self.frame = np.random.default_rng(0).integers(0, 256, (32, 48, 3), dtype=np.uint8)
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_curve_matches_effect_chain(self):
+        # Same arithmetic as moviepy's colorx -> lum_contrast -> gamma_corr
+        expected = np.minimum(255, 1.3 * self.frame).astype(np.uint8).astype(np.float64)
+        expected = np.clip(expected + 1.5 * (expected - 128.0), 0, 255).astype(np.uint8)
+        expected = (255 * (expected / 255.0) ** 1.2).astype(np.uint8)
+        engine = color.ColorEngine().colorx(1.3).lum_contrast(0, 1.5, 128).gamma(1.2)
+        np.testing.assert_array_equal(engine.apply(self.frame), expected)
+
+    def test_desaturate(self):
+        graded = color.ColorEngine().desaturate(1.0).apply(self.frame).astype(np.int32)
+        self.assertLessEqual(np.abs(graded - graded[..., :1]).max(), 1)
+        untouched = color.ColorEngine().desaturate(0.0).apply(self.frame)
+        np.testing.assert_array_equal(untouched, self.frame)
+
+    def test_identity_cube(self):
+        path = os.path.join(self.tmp_dir, "identity.cube")
+        write_cube(path, 17, lambda rgb: rgb)
+        graded = color.ColorEngine().load_cube(path).apply(self.frame).astype(np.int32)
+        self.assertLessEqual(np.abs(graded - self.frame).max(), 2)
+
+    def test_cube_channel_order(self):
+        path = os.path.join(self.tmp_dir, "first_channel.cube")
+        write_cube(path, 2, lambda rgb: np.array([rgb[0], 0, 0]))
+        frame = np.array([[[200, 100, 50]]], dtype=np.uint8)
+        graded = color.ColorEngine().load_cube(path).apply(frame)
+        self.assertAlmostEqual(int(graded[0, 0, 0]), 200, delta=2)
+        self.assertEqual(graded[0, 0, 1:].tolist(), [0, 0])
+
+    def test_cube_does_not_band(self):
+        path = os.path.join(self.tmp_dir, "identity.cube")
+        write_cube(path, 17, lambda rgb: rgb)
+        ramp = np.repeat(np.arange(256, dtype=np.uint8)[None, :, None], 3, axis=2)
+        graded = color.ColorEngine().load_cube(path).apply(ramp)
+        np.testing.assert_array_equal(graded, ramp)
+
+    def test_desaturate_is_baked_into_cube(self):
+        path = os.path.join(self.tmp_dir, "identity.cube")
+        write_cube(path, 17, lambda rgb: rgb)
+        engine = color.ColorEngine().desaturate(1.0).load_cube(path).build()
+        self.assertIsNone(engine._matrix)
+        graded = engine.apply(self.frame).astype(np.int32)
+        self.assertLessEqual(np.abs(graded - graded[..., :1]).max(), 1)
+
+    def test_malformed_cube(self):
+        path = os.path.join(self.tmp_dir, "broken.cube")
+        with open(path, 'w') as cube_file:
+            cube_file.write("LUT_3D_SIZE 2\n0 0 0\n")
+        with self.assertRaises(ValueError):
+            color.load_cube(path)
+
+if __name__ == "__main__":
+    unittest.main()
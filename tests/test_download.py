@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src import download
+
+PAYLOAD = os.urandom(300 * 1024 + 17)
+
+class RangeHandler(BaseHTTPRequestHandler):
+    # Minimal static file server; /plain ignores Range headers
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        if range_header and self.path != "/plain":
+            start, end = (int(value) for value in range_header.split("=")[1].split("-"))
+            body = PAYLOAD[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FlakyTransport(download.HTTPTransport):
+    # Drops every range request after the first `limit`
+    def __init__(self, limit=None):
+        super().__init__()
+        self.limit = limit
+        self.ranges = []
+
+    def fetch(self, url, start=None, end=None, block_size=256 * 1024):
+        if start is not None:
+            if self.limit is not None and len(self.ranges) >= self.limit:
+                raise ConnectionError("connection dropped")
+            self.ranges.append(start)
+        yield from super().fetch(url, start, end, block_size)
+
+class TestDownload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_parallel_ranges(self):
+        progress = []
+        manager = download.DownloadManager(chunk_size=64 * 1024, progress_callback=lambda *args: progress.append(args), progress_interval=0)
+        path = manager.download(f"{self.base_url}/video.mp4", os.path.join(self.tmp_dir, "video.mp4"))
+        self.assertEqual(self.read(path), PAYLOAD)
+        self.assertEqual(progress[-1][1:3], (len(PAYLOAD), len(PAYLOAD)))
+        self.assertFalse(os.path.exists(f"{path}.part.json"))
+
+    def test_resume(self):
+        path = os.path.join(self.tmp_dir, "video.mp4")
+        transport = FlakyTransport(limit=2)
+        manager = download.DownloadManager(connections_per_file=1, chunk_size=64 * 1024, transport=transport)
+        with self.assertRaises(ConnectionError):
+            manager.download(f"{self.base_url}/video.mp4", path)
+        self.assertTrue(os.path.exists(f"{path}.part.json"))
+
+        transport.limit = None
+        transport.ranges = []
+        manager.download(f"{self.base_url}/video.mp4", path)
+        # The two chunks finished before the failure are not fetched again
+        self.assertNotIn(0, transport.ranges)
+        self.assertEqual(len(transport.ranges), 3)
+        self.assertEqual(self.read(path), PAYLOAD)
+
+    def test_download_all_without_range_support(self):
+        manager = download.DownloadManager(max_connections=2, chunk_size=64 * 1024)
+        downloads = [(f"{self.base_url}/plain", os.path.join(self.tmp_dir, "plain.mp4")),
+                     (f"{self.base_url}/ranged", os.path.join(self.tmp_dir, "ranged.mp4"))]
+        results = manager.download_all(downloads)
+        for url, path in downloads:
+            self.assertEqual(results[url], path)
+            self.assertEqual(self.read(path), PAYLOAD)
+
+if __name__ == "__main__":
+    unittest.main()
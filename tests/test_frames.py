@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from src import frames
+
+class RecordingAnalyzer:
+    def __init__(self):
+        self.frame_ids = []
+
+    def process(self, frame_id, timestamp, frame):
+        self.frame_ids.append(frame_id)
+
+    def finish(self):
+        return self.frame_ids
+
+class FailingAnalyzer:
+    def process(self, frame_id, timestamp, frame):
+        raise ValueError("broken analyzer")
+
+    def finish(self):
+        return []
+
+class TestFrameSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_path = os.path.join(self.tmp_dir, "synthetic.avi")
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for i in range(20):
+            writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fan_out_to_all_analyzers(self):
+        source = frames.FrameSource(self.video_path, queue_size=2)
+        source.register("first", RecordingAnalyzer())
+        source.register("second", RecordingAnalyzer())
+        results = source.run()
+        self.assertEqual(results["first"], list(range(20)))
+        self.assertEqual(results["second"], list(range(20)))
+        self.assertEqual(source.metadata["resolution"], (64, 48))
+
+    def test_failing_analyzer_does_not_block_others(self):
+        source = frames.FrameSource(self.video_path, queue_size=1)
+        source.register("broken", FailingAnalyzer())
+        source.register("ok", RecordingAnalyzer())
+        results = source.run()
+        self.assertNotIn("broken", results)
+        self.assertEqual(len(results["ok"]), 20)
+
+    def test_stride_sampling_keeps_original_frame_ids(self):
+        sampled = list(frames.iter_frames(self.video_path, frames.SamplingPolicy(stride=5)))
+        self.assertEqual([frame_id for frame_id, _, _ in sampled], [0, 5, 10, 15])
+        self.assertAlmostEqual(sampled[1][1], 0.5)
+
+    def test_target_fps_sampling(self):
+        policy = frames.SamplingPolicy(target_fps=2)
+        self.assertEqual(policy.frame_stride(10), 5)
+        self.assertEqual(policy.frame_stride(30), 15)
+
+    def test_keyframe_sampling(self):
+        keyframes = frames.keyframe_indices(self.video_path)
+        sampled = list(frames.iter_frames(self.video_path, frames.SamplingPolicy(keyframes_only=True)))
+        if keyframes is None:
+            self.assertEqual([frame_id for frame_id, _, _ in sampled], [0, 10])
+        else:
+            self.assertEqual([frame_id for frame_id, _, _ in sampled], keyframes)
+
+    def test_segment_bounds(self):
+        segment = list(frames.iter_frames(self.video_path, frames.SamplingPolicy(stride=2), start_frame=6, end_frame=12))
+        self.assertEqual([frame_id for frame_id, _, _ in segment], [6, 8, 10])
+        self.assertEqual(frames.sampled_frame_ids(self.video_path, frames.SamplingPolicy(stride=5)), [0, 5, 10, 15])
@@ -1,15 +1,104 @@
+import os
+import tempfile
 import unittest
+import subprocess
+import cv2
+import numpy as np
+from types import SimpleNamespace
 from src import generation
+from src.utils import find_ffmpeg
 
 class TestGeneration(unittest.TestCase):
     def test_generate_script(self):
         script = generation.generate_script("Write an intro for a video.")
         self.assertTrue(len(script) > 0)
 
+    def test_generate_scripts(self):
+        streamed = {}
+        scripts = generation.generate_scripts(
+            ["Write an intro for a video.", "Write an outro."],
+            max_new_tokens=20,
+            stop_sequences=["\n\n"],
+            stream_callback=lambda index, text: streamed.setdefault(index, []).append(text)
+        )
+        self.assertEqual(len(scripts), 2)
+        self.assertTrue(scripts[1].startswith("Write an outro."))
+        self.assertTrue(len(streamed) > 0)
+
+    def test_streamed_text_stops_at_stop_string(self):
+        class CharTokenizer:
+            eos_token_id = 0
+            def decode(self, tokens, skip_special_tokens=True):
+                return "".join(chr(token) for token in tokens)
+
+        streamed = {}
+        stop_criteria = SimpleNamespace(stop_sequences=[["\n\n"], ["END"]])
+        streamer = generation._BatchStreamer(CharTokenizer(), lambda index, text: streamed.setdefault(index, []).append(text),
+                                             stop_criteria)
+        streamer.put(np.zeros((2, 1), dtype=np.int64))
+        for first, second in zip("Hi\nyo\n\nmore", "abc defg EN"):
+            streamer.put(np.array([ord(first), ord(second)]))
+        streamer.end()
+        self.assertEqual("".join(streamed[0]), "Hi\nyo")
+        self.assertEqual("".join(streamed[1]), "abc defg EN")
+
     def test_smart_clip_video(self):
         generation.smart_clip_video("sample_video.mp4", 10, 20, "clipped_video.mp4")
         # Additional checks can be added to verify the output
 
+    def test_clip_video_ranges(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "source.mp4")
+            writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (160, 120))
+            for i in range(100):
+                writer.write(np.full((120, 160, 3), i * 2, dtype=np.uint8))
+            writer.release()
+
+            outputs = [os.path.join(tmp_dir, "first.mp4"), os.path.join(tmp_dir, "second.mp4"), os.path.join(tmp_dir, "past_end.mp4")]
+            clipped = generation.clip_video_ranges(video_path, [(2.0, 2.4), (0.2, 0.6), (10.0, 11.0)], outputs)
+            # A range past the end of the video produces nothing and isn't reported as written
+            self.assertEqual(clipped, outputs[:2] + [None])
+            self.assertFalse(os.path.exists(outputs[2]))
+            frame_counts = [int(cv2.VideoCapture(path).get(cv2.CAP_PROP_FRAME_COUNT)) for path in outputs[:2]]
+            self.assertEqual(frame_counts, [11, 11])
+
+    def test_clip_video_ranges_stream_copy_is_frame_accurate(self):
+        ffmpeg = find_ffmpeg()
+        if not ffmpeg:
+            self.skipTest("ffmpeg not available")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            raw_path = os.path.join(tmp_dir, "raw.mp4")
+            writer = cv2.VideoWriter(raw_path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (160, 120))
+            for i in range(100):
+                writer.write(np.full((120, 160, 3), i * 2, dtype=np.uint8))
+            writer.release()
+            # A keyframe every 25 frames, with an audio track
+            video_path = os.path.join(tmp_dir, "source.mp4")
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-i", raw_path, "-f", "lavfi", "-i", "sine=duration=4",
+                            "-c:v", "libx264", "-g", "25", "-keyint_min", "25", "-sc_threshold", "0", "-c:a", "aac", "-shortest",
+                            video_path], check=True)
+
+            def decoded(path):
+                video = cv2.VideoCapture(path)
+                frames = []
+                while True:
+                    ret, frame = video.read()
+                    if not ret:
+                        break
+                    frames.append(int(frame.mean()))
+                video.release()
+                return frames
+
+            def has_audio(path):
+                return "Audio:" in subprocess.run([ffmpeg, "-i", path], capture_output=True, text=True).stderr
+
+            outputs = [os.path.join(tmp_dir, "copied.mp4"), os.path.join(tmp_dir, "encoded.mp4")]
+            generation.clip_video_ranges(video_path, [(1.0, 1.96), (0.2, 0.6)], outputs)
+            self.assertEqual(decoded(outputs[0]), decoded(video_path)[25:50])
+            self.assertEqual(len(decoded(outputs[1])), 11)
+            self.assertTrue(all(has_audio(path) for path in outputs))
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["copied.mp4", "encoded.mp4", "raw.mp4", "source.mp4"])
+
     def test_auto_generate_video(self):
         generation.auto_generate_video("AI in Video Editing", ["Introduction", "AI Basics", "Advanced Techniques"], "auto_generated_video.mp4")
         # Additional checks can be added to verify the output
@@ -0,0 +1,90 @@
+import os
+import asyncio
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from src import jobs
+from src.state import StateStore
+
+def double_stage(context):
+    return {"doubled": context["value"] * 2}
+
+def add_stage(context):
+    if context["value"] < 0:
+        raise jobs.StageFailed("negative input")
+    return {"total": context["doubled"] + context["value"], "pid": os.getpid()}
+
+async def publish_stage(context):
+    await asyncio.sleep(0.01)
+    return {"published": context["total"]}
+
+class TestJobs(unittest.TestCase):
+    def make_runner(self):
+        return jobs.JobRunner([
+            jobs.Stage("publish", publish_stage, depends=["add"], kind="io"),
+            jobs.Stage("add", add_stage, depends=["double"]),
+            jobs.Stage("double", double_stage)
+        ], cpu_workers=2)
+
+    def test_stage_dag(self):
+        runner = self.make_runner()
+        self.assertEqual(runner.order, ["double", "add", "publish"])
+        results = runner.run([{"name": f"job{value}", "value": value} for value in (1, 2, -3)])
+
+        self.assertEqual([result.get("published") for result in results], [3, 6, None])
+        self.assertNotEqual(results[0]["pid"], os.getpid())
+        self.assertEqual(results[2]["status"], {"double": "completed", "add": "failed", "publish": "skipped"})
+        report = runner.report()
+        self.assertEqual(report["double"]["completed"], 3)
+        self.assertEqual((report["add"]["completed"], report["add"]["failed"]), (2, 1))
+        self.assertEqual(report["publish"]["skipped"], 1)
+
+    def test_resume_from_state(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = StateStore(os.path.join(tmp_dir, "state.db"))
+            job = {"name": "job", "value": 2}
+            jobs.JobRunner([jobs.Stage("double", double_stage, inputs=["value"])], cpu_workers=1, state=store).run([job])
+            runner = jobs.JobRunner([jobs.Stage("double", double_stage, inputs=["value"]),
+                                     jobs.Stage("add", add_stage, depends=["double"])], cpu_workers=1, state=store)
+            result = runner.run([job])[0]
+            self.assertEqual(result["status"], {"double": "cached", "add": "completed"})
+            self.assertEqual(result["total"], 6)
+            store.close()
+
+    def test_no_resume_still_records_checkpoints(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            video_path = os.path.join(tmp_dir, "video.mp4")
+            writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (64, 48))
+            for index in range(20):
+                writer.write(np.full((48, 64, 3), index * 10, dtype=np.uint8))
+            writer.release()
+            manifest_path = os.path.join(tmp_dir, "manifest.yaml")
+            with open(manifest_path, 'w') as manifest:
+                manifest.write(f"output_root: {tmp_dir}/out\ndefaults:\n  clip: [0, 1]\nvideos:\n  - {video_path}\n")
+            config = {"state": {"db_path": os.path.join(tmp_dir, "state.db")}, "jobs": {"cpu_workers": 1}}
+
+            first, _ = jobs.run_manifest(manifest_path, config, stages=["clip"], resume=False)
+            self.assertEqual(first[0]["status"], {"clip": "completed"})
+            second, _ = jobs.run_manifest(manifest_path, config, stages=["clip"])
+            self.assertEqual(second[0]["status"], {"clip": "cached"})
+            third, _ = jobs.run_manifest(manifest_path, config, stages=["clip"], resume=False)
+            self.assertEqual(third[0]["status"], {"clip": "completed"})
+
+    def test_dependency_cycle(self):
+        with self.assertRaises(ValueError):
+            jobs.JobRunner([jobs.Stage("a", double_stage, depends=["b"]), jobs.Stage("b", double_stage, depends=["a"])])
+
+    def test_load_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            manifest_path = os.path.join(tmp_dir, "manifest.yaml")
+            with open(manifest_path, 'w') as manifest:
+                manifest.write(f"output_root: {tmp_dir}/out\ndefaults:\n  clip: [0, 5]\nvideos:\n  - a.mp4\n  - path: b.mp4\n    clip: [1, 2]\n")
+            loaded = jobs.load_manifest(manifest_path)
+            self.assertEqual([job["name"] for job in loaded], ["a", "b"])
+            self.assertEqual(loaded[0]["clip"], [0, 5])
+            self.assertEqual(loaded[1]["clip"], [1, 2])
+            self.assertTrue(os.path.isdir(loaded[1]["output_dir"]))
+
+if __name__ == "__main__":
+    unittest.main()
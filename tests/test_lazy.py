@@ -0,0 +1,27 @@
+import sys
+import unittest
+from src import lazy
+
+class TestLazy(unittest.TestCase):
+    def test_imports_on_first_use(self):
+        sys.modules.pop("colorsys", None)
+        colorsys = lazy.lazy_import("colorsys")
+        self.assertNotIn("colorsys", sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertIn("colorsys", sys.modules)
+        self.assertIn("colorsys", lazy.IMPORT_TIMES)
+
+    def test_attribute_proxy(self):
+        rgb_to_hsv = lazy.lazy_import("colorsys", "rgb_to_hsv")
+        self.assertEqual(rgb_to_hsv(0.0, 0.0, 1.0)[0], 2 / 3)
+        file_fingerprint = lazy.lazy_import(".cache", "file_fingerprint", "src")
+        self.assertTrue(callable(file_fingerprint._load()))
+
+    def test_profile_imports(self):
+        total, entries = lazy.profile_imports("src.cache", top=50)
+        self.assertGreater(total, 0)
+        self.assertIn("src.cache", [name for name, _, _ in entries])
+        self.assertIn("Startup import time", lazy.format_import_profile(total, entries))
+
+if __name__ == "__main__":
+    unittest.main()
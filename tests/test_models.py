@@ -0,0 +1,28 @@
+import unittest
+from src import models
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+        self.registry = models.ModelRegistry(max_loaded=1)
+        for name in ("first", "second"):
+            self.registry.register(name, lambda name=name: self.loads.append(name) or name.upper())
+
+    def test_loads_lazily_once(self):
+        self.assertEqual(self.loads, [])
+        self.assertEqual(self.registry.get("first"), "FIRST")
+        self.assertEqual(self.registry.get("first"), "FIRST")
+        self.assertEqual(self.loads, ["first"])
+        self.assertIn("first", self.registry.load_times)
+
+    def test_evicts_least_recently_used(self):
+        self.registry.get("first")
+        self.registry.get("second")
+        self.assertEqual(list(self.registry.loaded), ["second"])
+        self.registry.get("first")
+        self.assertEqual(self.loads, ["first", "second", "first"])
+
+    def test_warm_up(self):
+        self.registry.max_loaded = 2
+        self.registry.warm_up()
+        self.assertEqual(sorted(self.registry.loaded), ["first", "second"])
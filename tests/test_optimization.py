@@ -0,0 +1,35 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+import cv2
+from src import optimization
+from src.utils import find_ffmpeg
+
+class TestOptimization(unittest.TestCase):
+    def test_generate_teasers_fan_out(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "input.mp4")
+            subprocess.run([find_ffmpeg(), "-y", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=25:duration=3",
+                            "-f", "lavfi", "-i", "sine=duration=3", "-c:v", "mpeg4", "-c:a", "aac", "-shortest", input_path], check=True)
+            profiles = {
+                "wide": {"aspect": (16, 9), "size": (160, 90), "video_bitrate": "200k", "audio_bitrate": "64k"},
+                "tall": {"aspect": (9, 16), "size": (90, 160), "video_bitrate": "200k", "audio_bitrate": "64k"},
+                "tall_copy": {"aspect": (9, 16), "size": (90, 160), "video_bitrate": "200k", "audio_bitrate": "64k"}
+            }
+            with mock.patch.object(optimization.subprocess, "run", wraps=subprocess.run) as run:
+                paths = optimization.generate_teasers(input_path, os.path.join(tmp_dir, "teaser"), ["wide", "tall", "tall_copy"],
+                                                      profiles=profiles, duration=2)
+
+            # One decode for every output, and identical profiles are encoded once
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(run.call_args[0][0].count("-b:v"), 2)
+            for platform, size in (("wide", (160, 90)), ("tall", (90, 160)), ("tall_copy", (90, 160))):
+                video = cv2.VideoCapture(paths[platform])
+                self.assertEqual((int(video.get(cv2.CAP_PROP_FRAME_WIDTH)), int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))), size)
+                self.assertAlmostEqual(video.get(cv2.CAP_PROP_FRAME_COUNT), 50, delta=2)
+                video.release()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,8 @@
+import os
+import tempfile
 import unittest
+import cv2
+import numpy as np
 from src import postproduction
 
 class TestPostProduction(unittest.TestCase):
@@ -9,3 +13,22 @@ class TestPostProduction(unittest.TestCase):
     def test_apply_audio_enhancement(self):
         postproduction.apply_audio_enhancement("final_video.mp4", "enhanced_audio_video.mp4")
         # Additional checks can be added to verify the output
+
+    def test_render_graph_single_pass(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            input_path = os.path.join(tmp_dir, "input.mp4")
+            writer = cv2.VideoWriter(input_path, cv2.VideoWriter_fourcc(*'mp4v'), 25, (160, 120))
+            for _ in range(50):
+                writer.write(np.full((120, 160, 3), 100, dtype=np.uint8))
+            writer.release()
+
+            processed = []
+            def invert(clip):
+                return clip.fl_image(lambda frame: processed.append(1) or 255 - frame)
+
+            output_path = os.path.join(tmp_dir, "output.mp4")
+            graph = postproduction.RenderGraph(input_path).add("invert", invert).transitions("crossfade", 0.2)
+            graph.render(output_path, logger=None)
+            self.assertTrue(os.path.exists(output_path))
+            # Every frame is decoded and filtered once, not once per step
+            self.assertLess(len(processed), 60)
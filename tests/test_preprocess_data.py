@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from scripts import preprocess_data
+
+CONFIG = {"fps": 10, "width": 64, "height": 48, "use_gpu": False, "stabilize": False, "reduce_noise": False,
+          "augment": False, "flip": False, "rotate": False}
+
+def write_video(path, frame_count):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (96, 72))
+    for index in range(frame_count):
+        writer.write(np.full((72, 96, 3), index * 5 % 256, dtype=np.uint8))
+    writer.release()
+
+class TestPreprocessData(unittest.TestCase):
+    def setUp(self):
+        self.input_dir = tempfile.mkdtemp()
+        self.output_dir = tempfile.mkdtemp()
+        for name, frame_count in (("short.mp4", 5), ("long.mp4", 40), ("medium.mp4", 20)):
+            write_video(os.path.join(self.input_dir, name), frame_count)
+
+    def tearDown(self):
+        shutil.rmtree(self.input_dir)
+        shutil.rmtree(self.output_dir)
+
+    def test_list_jobs_largest_first(self):
+        jobs, skipped = preprocess_data.list_jobs(self.input_dir, self.output_dir)
+        self.assertEqual([os.path.basename(input_path) for input_path, _ in jobs], ["long.mp4", "medium.mp4", "short.mp4"])
+        self.assertEqual(skipped, 0)
+
+    def test_local_backend_skips_up_to_date_outputs(self):
+        summary = preprocess_data.preprocess_data(self.input_dir, self.output_dir, CONFIG, workers=2)
+        self.assertEqual(summary, {"processed": 3, "failed": 0, "skipped": 0})
+        video = cv2.VideoCapture(os.path.join(self.output_dir, "preprocessed_long.mp4"))
+        self.assertEqual(int(video.get(cv2.CAP_PROP_FRAME_COUNT)), 40)
+        video.release()
+        self.assertFalse(any(".partial" in name for name in os.listdir(self.output_dir)))
+
+        summary = preprocess_data.preprocess_data(self.input_dir, self.output_dir, CONFIG, workers=2)
+        self.assertEqual(summary, {"processed": 0, "failed": 0, "skipped": 3})
+
+    def test_batch_transform_matches_per_frame(self):
+        config = dict(CONFIG, augment=True, flip=True, rotate=True, width=48, height=64)
+        batch = np.random.default_rng(0).integers(0, 256, (5, 72, 96, 3), dtype=np.uint8)
+        transform = preprocess_data.BatchTransform(config, batch_size=8)
+        output = transform(batch)
+        self.assertEqual(output.shape, (5, 64, 48, 3))
+        for frame, result in zip(batch, output):
+            expected = cv2.resize(cv2.rotate(cv2.flip(frame, 1), cv2.ROTATE_90_CLOCKWISE), (48, 64))
+            self.assertLessEqual(int(np.abs(expected.astype(int) - result).max()), 1)
+        # The output buffer is reused between batches
+        self.assertTrue(np.shares_memory(transform(batch[:2]), output))
+        batch_output = preprocess_data.BatchTransform(config, batch_size=8, backend="batch")(batch)
+        np.testing.assert_array_equal(batch_output, output)
+
+    def test_batch_backend_and_partial_batches(self):
+        video_path = os.path.join(self.input_dir, "medium.mp4")
+        video = cv2.VideoCapture(video_path)
+        sizes = [len(batch) for batch in preprocess_data.read_batches(video, 8)]
+        video.release()
+        self.assertEqual(sizes, [8, 8, 4])
+
+        transform = preprocess_data.BatchTransform(CONFIG, batch_size=4, backend="batch")
+        output = transform(np.full((3, 72, 96, 3), 7, dtype=np.uint8))
+        self.assertEqual(output.shape, (3, 48, 64, 3))
+        self.assertTrue((output == 7).all())
+
+    def test_stabilizer_removes_jitter(self):
+        rng = np.random.default_rng(1)
+        scene = cv2.GaussianBlur(rng.integers(0, 256, (200, 260, 3), dtype=np.uint8), (5, 5), 0)
+        offsets = rng.integers(-6, 7, (40, 2))
+        frames = np.stack([scene[30 + dy:150 + dy, 30 + dx:190 + dx] for dx, dy in offsets])
+
+        def jitter(batch):
+            shifts = []
+            for previous, current in zip(batch, batch[1:]):
+                (dx, dy), _ = cv2.phaseCorrelate(cv2.cvtColor(previous, cv2.COLOR_BGR2GRAY).astype(np.float32),
+                                                 cv2.cvtColor(current, cv2.COLOR_BGR2GRAY).astype(np.float32))
+                shifts.append(np.hypot(dx, dy))
+            return np.mean(shifts)
+
+        stabilizer = preprocess_data.Stabilizer("balanced", batch_size=16)
+        output = [frame.copy() for batch in np.split(frames, 4) for frame in stabilizer(batch)]
+        output += [frame.copy() for batch in stabilizer.flush() for frame in batch]
+        self.assertEqual(len(output), 40)
+        self.assertLess(jitter(np.stack(output)[5:-5]), jitter(frames[5:-5]) / 2)
+
+    def test_temporal_denoiser(self):
+        rng = np.random.default_rng(2)
+        clean = np.full((12, 32, 32, 3), 128, dtype=np.uint8)
+        noisy = np.clip(clean + rng.normal(0, 6, clean.shape), 0, 255).astype(np.uint8)
+        output = preprocess_data.TemporalDenoiser("balanced", batch_size=12)(noisy)
+        self.assertLess(np.abs(output[6:].astype(int) - 128).mean(), np.abs(noisy[6:].astype(int) - 128).mean() / 1.5)
+        # A large change is motion, not noise, and passes through untouched
+        moved = noisy.copy()
+        moved[-1] = 255
+        self.assertTrue((preprocess_data.TemporalDenoiser("balanced", 12)(moved)[-1] == 255).all())
+
+    def test_preprocess_video_reports_stage_rates(self):
+        config = dict(CONFIG, stabilize=True, reduce_noise=True, stabilize_preset="fast", batch_size=8)
+        output_path = os.path.join(self.output_dir, "medium.mp4")
+        stats = preprocess_data.preprocess_video(os.path.join(self.input_dir, "medium.mp4"), output_path, config)
+        self.assertEqual(set(stats), {"decode", "stabilize", "denoise", "transform", "encode"})
+        self.assertTrue(all(entry["frames"] == 20 for entry in stats.values()))
+        video = cv2.VideoCapture(output_path)
+        self.assertEqual(int(video.get(cv2.CAP_PROP_FRAME_COUNT)), 20)
+        video.release()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import time
+import unittest
+from gui import processing
+
+def counting_job(steps, delay, reporter):
+    for step in range(steps):
+        time.sleep(delay)
+        reporter.update((step + 1) / steps)
+    return f"counted to {steps}"
+
+def failing_job(reporter):
+    raise ValueError("bad input")
+
+class TestProcessing(unittest.TestCase):
+    def setUp(self):
+        self.pool = processing.ProcessingPool(max_workers=1)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def wait(self, timeout=30):
+        events = []
+        deadline = time.monotonic() + timeout
+        while self.pool.pending() and time.monotonic() < deadline:
+            events.extend(self.pool.poll())
+            time.sleep(0.05)
+        return events + self.pool.poll()
+
+    def test_progress_and_results(self):
+        first = self.pool.submit("count", counting_job, 4, 0.3)
+        second = self.pool.submit("fail", failing_job)
+        events = self.wait()
+
+        progress = [event for event in events if event[0] == "progress" and event[1] == first]
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(progress[-1][2], 100)
+        finished = {event[1]: event[2:] for event in events if event[0] == "finished"}
+        self.assertEqual(finished[first], (True, "counted to 4"))
+        self.assertFalse(finished[second][0])
+        self.assertIn("bad input", finished[second][1])
+
+    def test_cancel(self):
+        running = self.pool.submit("long", counting_job, 100, 0.05)
+        queued = self.pool.submit("queued", counting_job, 1, 0.0)
+        # Wait until the first job reports progress, then cancel both
+        deadline = time.monotonic() + 30
+        while not any(event[0] == "progress" for event in self.pool.poll()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.pool.cancel(running)
+        self.pool.cancel(queued)
+        finished = {event[1]: event[2:] for event in self.wait() if event[0] == "finished"}
+        self.assertEqual(finished[running], (False, "long cancelled"))
+        self.assertEqual(finished[queued], (False, "queued cancelled"))
+
+if __name__ == "__main__":
+    unittest.main()
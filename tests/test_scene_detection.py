@@ -0,0 +1,31 @@
+import unittest
+import numpy as np
+from src import scene_detection
+
+def synthetic_frames(scene_length=20, scenes=4):
+    rng = np.random.default_rng(7)
+    frames = []
+    for scene in range(scenes):
+        base = np.repeat(np.repeat(rng.integers(0, 255, (9, 16, 3), dtype=np.uint8), 20, axis=0), 20, axis=1)
+        for i in range(scene_length):
+            frames.append((scene * scene_length + i, np.roll(base, i * 2, axis=1)))
+    return frames
+
+class TestSceneDetection(unittest.TestCase):
+    def test_histogram_backend_finds_cuts(self):
+        cuts = scene_detection.detect_cuts(synthetic_frames(), backend="histogram", window=8)
+        self.assertEqual(cuts, [20, 40, 60])
+
+    def test_block_backend_finds_cuts(self):
+        cuts = scene_detection.detect_cuts(synthetic_frames(), backend="block", window=8)
+        self.assertEqual(cuts, [20, 40, 60])
+
+    def test_min_scene_length_suppresses_flashes(self):
+        cuts = scene_detection.detect_cuts(synthetic_frames(scene_length=3), backend="block", min_scene_length=5)
+        self.assertEqual(cuts, [3, 9])
+
+    def test_adaptive_threshold_respects_floor(self):
+        distances = np.full(50, 0.01, dtype=np.float32)
+        self.assertEqual(scene_detection.adaptive_threshold(distances, 0.2, 4.0), 0.2)
+        noisy = np.concatenate([distances, np.full(50, 0.5, dtype=np.float32)])
+        self.assertGreater(scene_detection.adaptive_threshold(noisy, 0.2, 4.0), 0.2)
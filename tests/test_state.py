@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src import state
+
+class TestState(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = state.StateStore(os.path.join(self.tmp_dir, "state.db"))
+        self.input_path = self.write("input.txt", "input")
+        self.calls = 0
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def compute(self):
+        self.calls += 1
+        return {"output": self.write("output.txt", f"output {self.calls}")}
+
+    def test_skips_unchanged_stage(self):
+        first = self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        second = self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        self.assertEqual(first, second)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([artifact["path"] for artifact in self.store.artifacts("job")], [first["output"]])
+
+    def test_reruns_when_input_changes(self):
+        self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        self.write("input.txt", "changed input")
+        self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_reruns_when_artifact_missing(self):
+        outputs = self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        os.remove(outputs["output"])
+        self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidate(self):
+        self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        self.store.invalidate("job")
+        self.store.run_stage("job", "convert", {"video": self.input_path}, self.compute)
+        self.assertEqual(self.calls, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from src import frames, models, tracing
+
+class CountingAnalyzer:
+    def process(self, frame_id, timestamp, frame):
+        pass
+
+    def finish(self):
+        return []
+
+def traced_work(frame_count):
+    with tracing.span("worker", "analyzer") as span:
+        span.add("frames", frame_count)
+    return frame_count * 2
+
+def failing_work():
+    raise ValueError("broken stage")
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        tracing.tracer.reset()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_nested_spans_and_metrics(self):
+        with tracing.span("clip", job="video") as outer:
+            with tracing.span("decode", "analyzer") as inner:
+                inner.add("frames", 10)
+                self.assertIs(tracing.tracer.current(), inner)
+            outer.add("bytes_written", 100)
+        with self.assertRaises(ValueError):
+            with tracing.span("clip", job="video"):
+                raise ValueError("failed")
+
+        self.assertIs(inner.parent, outer)
+        self.assertIsNone(tracing.tracer.current())
+        metrics = tracing.tracer.metrics()
+        self.assertEqual(metrics[("stage", "clip")]["count"], 2)
+        self.assertEqual(metrics[("stage", "clip")]["errors"], 1)
+        self.assertEqual(metrics[("stage", "clip")]["bytes_written"], 100)
+        self.assertEqual(metrics[("analyzer", "decode")]["frames"], 10)
+
+        text = tracing.tracer.prometheus_text()
+        self.assertIn('pipeline_span_frames_total{category="analyzer",name="decode"} 10', text)
+        self.assertIn('pipeline_span_count_total{category="stage",name="clip"} 2', text)
+        self.assertIn("clip", tracing.tracer.format_summary())
+
+    def test_chrome_trace(self):
+        with tracing.span("teaser", job="video") as span:
+            span.add("frames", 3)
+        path = os.path.join(self.tmp_dir, "trace", "trace.json")
+        tracing.tracer.write_chrome_trace(path)
+        with open(path) as trace_file:
+            events = json.load(trace_file)["traceEvents"]
+        complete = [event for event in events if event["ph"] == "X"]
+        self.assertEqual(complete[0]["name"], "teaser")
+        self.assertEqual(complete[0]["args"]["frames"], 3)
+        self.assertEqual(complete[0]["args"]["job"], "video")
+        self.assertTrue(any(event["ph"] == "M" for event in events))
+
+    def test_frame_source_spans(self):
+        video_path = os.path.join(self.tmp_dir, "synthetic.avi")
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+        for index in range(12):
+            writer.write(np.full((48, 64, 3), index * 20, dtype=np.uint8))
+        writer.release()
+
+        with tracing.span("analyze") as stage:
+            source = frames.FrameSource(video_path)
+            source.register("counting", CountingAnalyzer())
+            source.run()
+        spans = {span["name"]: span for span in tracing.tracer.spans}
+        self.assertEqual(spans["decode"]["counters"]["frames"], 12)
+        self.assertEqual(spans["decode"]["counters"]["bytes_read"], os.path.getsize(video_path))
+        self.assertEqual(spans["counting"]["counters"]["frames"], 12)
+        self.assertEqual(spans["counting"]["parent"], stage.id)
+
+    def test_model_load_charged_to_stage(self):
+        registry = models.ModelRegistry()
+        registry.register("tiny", lambda: "model")
+        with tracing.span("script"):
+            registry.get("tiny")
+        metrics = tracing.tracer.metrics()
+        self.assertEqual(metrics[("model_load", "tiny")]["count"], 1)
+        self.assertGreater(metrics[("stage", "script")]["model_load_seconds"], 0)
+
+    def test_run_traced_in_worker_process(self):
+        with ProcessPoolExecutor(1) as pool:
+            result, error, cpu_seconds, spans = pool.submit(tracing.run_traced, traced_work, 5).result()
+            _, failure, _, _ = pool.submit(tracing.run_traced, failing_work).result()
+        self.assertEqual((result, error), (10, None))
+        self.assertIsInstance(failure, ValueError)
+        self.assertGreaterEqual(cpu_seconds, 0)
+        tracing.tracer.merge(spans)
+        self.assertEqual(tracing.tracer.metrics()[("analyzer", "worker")]["frames"], 5)
+        self.assertNotEqual(spans[0]["pid"], os.getpid())
+
+    def test_metrics_endpoint(self):
+        with tracing.span("upload"):
+            pass
+        server = tracing.tracer.serve_metrics(port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            body = urllib.request.urlopen(url, timeout=5).read().decode()
+        finally:
+            server.shutdown()
+        self.assertIn('pipeline_span_count_total{category="stage",name="upload"} 1', body)
+
+    def test_file_bytes(self):
+        path = os.path.join(self.tmp_dir, "artifact.bin")
+        with open(path, 'wb') as artifact:
+            artifact.write(b"x" * 42)
+        self.assertEqual(tracing.file_bytes({"video": path, "others": [path, "missing.mp4", 3]}), 84)
+
+if __name__ == "__main__":
+    unittest.main()
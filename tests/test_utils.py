@@ -1,4 +1,5 @@
 import unittest
+import tempfile
 from src import utils
 import os
 
@@ -22,3 +23,15 @@ class TestUtils(unittest.TestCase):
         utils.save_yaml(test_data, "test_data.yaml")
         loaded_data = utils.load_yaml("test_data.yaml")
         self.assertEqual(test_data, loaded_data)
+
+    def test_require_output(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "output.mp4")
+            with self.assertRaises(RuntimeError):
+                utils.require_output(path)
+            open(path, 'wb').close()
+            with self.assertRaises(ValueError):
+                utils.require_output(path, ValueError)
+            with open(path, 'wb') as output:
+                output.write(b"data")
+            self.assertEqual(utils.require_output(path), path)